@@ -0,0 +1 @@
+"""Performance benchmarks for the stock analytics warehouse"""
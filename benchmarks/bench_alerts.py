@@ -0,0 +1,45 @@
+"""Alert engine benchmark: one new day of bars against 10k rules over 5k symbols"""
+
+from .datasets import Dataset
+from .harness import Counters, benchmark
+
+ALERT_SYMBOLS = 5000
+ALERT_RULES = 10000
+# Enough history behind the new day for 52-week highs
+ALERT_DAYS = 260
+
+RULE_MIX = [
+    ('cross_above_sma', 50, None),
+    ('cross_below_sma', 200, None),
+    ('gap_up', None, 3.0),
+    ('gap_down', None, 3.0),
+    ('new_high', 252, None),
+]
+
+
+def alert_warehouse(ctx):
+    """5k symbols with 10k rules, evaluated up to the day before the last, built once"""
+    if not hasattr(ctx, '_alerts'):
+        dataset = Dataset(ALERT_SYMBOLS, ALERT_DAYS)
+        warehouse = dataset.load(ctx.fresh_warehouse('alerts.db'))
+        symbols = dataset.symbols
+        for i in range(ALERT_RULES):
+            # Each symbol gets two different rule types
+            rule_type, lookback, threshold = RULE_MIX[(i + i // len(symbols)) % len(RULE_MIX)]
+            warehouse.add_alert_rule(symbols[i % len(symbols)], rule_type, lookback, threshold)
+        ctx._alerts = (warehouse, int(dataset.dates[-2].strftime('%Y%m%d')))
+    return ctx._alerts
+
+
+@benchmark('alerts.evaluate_new_day', repeat=5)
+def evaluate_new_day(ctx):
+    from src.database.alerts import evaluate_alerts
+    warehouse, previous_day = alert_warehouse(ctx)
+    # Rewind so the last day is new again
+    warehouse.conn.execute('UPDATE alert_watermarks SET date_key = ?', (previous_day,))
+    warehouse.conn.execute('DELETE FROM fact_alerts')
+    warehouse.conn.commit()
+
+    def run():
+        return Counters(alerts=len(evaluate_alerts(warehouse)))
+    return run
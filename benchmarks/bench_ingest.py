@@ -0,0 +1,117 @@
+"""Ingest benchmarks: bulk load, per-row inserts and the date dimension"""
+
+import os
+from datetime import datetime
+from .harness import Counters, benchmark
+
+
+@benchmark('ingest.bulk_load', repeat=3)
+def bulk_load(ctx):
+    rows = ctx.prepared_rows()
+    warehouse = ctx.fresh_warehouse()
+    dataset = ctx.dataset
+
+    def run():
+        warehouse.populate_date_dimension(dataset.start_date, dataset.end_date)
+        for symbol, symbol_rows in rows:
+            warehouse.add_stock(symbol, f'{symbol} Corp')
+            warehouse.insert_stock_prices(symbol_rows)
+        warehouse.close()
+    return run
+
+
+@benchmark('ingest.insert_stock_price_row', repeat=3)
+def insert_stock_price_rows(ctx):
+    symbol, rows = ctx.prepared_rows()[0]
+    warehouse = ctx.fresh_warehouse()
+    warehouse.add_stock(symbol, f'{symbol} Corp')
+
+    def run():
+        for row in rows:
+            warehouse.insert_stock_price(*row)
+        warehouse.close()
+    return run
+
+
+@benchmark('ingest.populate_date_dimension', repeat=3)
+def populate_date_dimension(ctx):
+    warehouse = ctx.fresh_warehouse()
+
+    def run():
+        warehouse.populate_date_dimension(datetime(2000, 1, 1), datetime(2024, 12, 31))
+        warehouse.close()
+    return run
+
+
+@benchmark('ingest.populate_date_dimension_warm', repeat=5)
+def populate_date_dimension_warm(ctx):
+    warehouse = ctx.warehouse
+    dataset = ctx.dataset
+    return lambda: warehouse.populate_date_dimension(dataset.start_date, dataset.end_date)
+
+
+def _backfill(workers):
+    def setup(ctx):
+        from src.data.backfill import backfill
+        from src.data.sources import SyntheticSource
+        warehouse = ctx.fresh_warehouse()
+        dataset = ctx.dataset
+        days = (dataset.end_date - dataset.start_date).days
+        n_workers = workers or os.cpu_count()
+
+        def run():
+            backfill(warehouse, dataset.symbols, SyntheticSource(), days=days,
+                     end_date=dataset.end_date, workers=n_workers)
+            warehouse.close()
+        return run
+    return setup
+
+
+# Fetch + validate + normalize + merge through the offline synthetic source
+benchmark('ingest.backfill_serial', repeat=2)(_backfill(1))
+benchmark('ingest.backfill_parallel', repeat=2)(_backfill(None))
+
+
+@benchmark('ingest.import_dump', repeat=2)
+def import_dump(ctx):
+    import pandas as pd
+    from src.data.bulk_import import import_dumps
+    path = ctx.path('dump.csv')
+    if not os.path.exists(path):
+        # Vendor dumps are date-major: every symbol's bar for a day, then the next day
+        frames = [df.assign(symbol=symbol) for symbol, df in ctx.dataset.frames()]
+        dump = pd.concat(frames).rename_axis('date').reset_index()
+        dump.sort_values(['date', 'symbol'], kind='stable').to_csv(path, index=False)
+    warehouse = ctx.fresh_warehouse()
+
+    def run():
+        stats = import_dumps(warehouse, [path])
+        warehouse.close()
+        return Counters(rows_per_s=stats['rows_per_s'])
+    return run
+
+
+def _batched_load(shards):
+    # Multi-symbol batches, as the bulk importer and journal replays write them
+    def setup(ctx):
+        from src.database.sharding import open_warehouse
+        rows = [row for _, symbol_rows in ctx.prepared_rows() for row in symbol_rows]
+        path = ctx.path(f'batched_{shards}.db')
+        for name in os.listdir(ctx.workdir):
+            if name.startswith(f'batched_{shards}.'):
+                os.remove(ctx.path(name))
+        warehouse = open_warehouse(path, shards=shards)
+        for symbol in ctx.dataset.symbols:
+            warehouse.add_stock(symbol, f'{symbol} Corp')
+        batch = 50_000
+
+        def run():
+            for start in range(0, len(rows), batch):
+                warehouse.insert_stock_prices(rows[start:start + batch])
+            warehouse.close()
+        return run
+    return setup
+
+
+benchmark('ingest.batched_load_1_file', repeat=3)(_batched_load(1))
+benchmark('ingest.batched_load_4_shards', repeat=3)(_batched_load(4))
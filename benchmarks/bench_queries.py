@@ -0,0 +1,221 @@
+"""Query benchmarks against a warehouse loaded with the synthetic dataset"""
+
+from .harness import Counters, benchmark
+
+WATCHLIST_SIZE = 50
+
+
+@benchmark('query.analytics_single', number=20)
+def analytics_single(ctx):
+    warehouse = ctx.warehouse
+    symbol = ctx.dataset.symbols[-1]
+    return lambda: warehouse.get_stock_analytics(symbol, 90)
+
+
+@benchmark('query.analytics_multi', number=3)
+def analytics_multi(ctx):
+    warehouse = ctx.warehouse
+    symbols = ctx.dataset.symbols[:WATCHLIST_SIZE]
+
+    def run():
+        for symbol in symbols:
+            warehouse.get_stock_analytics(symbol, 90)
+    return run
+
+
+@benchmark('query.analytics_batch', number=3)
+def analytics_batch(ctx):
+    warehouse = ctx.warehouse
+    symbols = ctx.dataset.symbols[:WATCHLIST_SIZE]
+    return lambda: warehouse.get_stock_analytics_many(symbols, 90)
+
+
+@benchmark('query.get_all_stocks', number=5)
+def get_all_stocks(ctx):
+    warehouse = ctx.warehouse
+    return warehouse.get_all_stocks
+
+
+def long_history_warehouse(ctx, n_days=10000):
+    """One symbol with `n_days` bars, built once per context"""
+    if not hasattr(ctx, '_long_history'):
+        from .datasets import Dataset
+        dataset = Dataset(1, n_days)
+        ctx._long_history = dataset.load(ctx.fresh_warehouse('long_history.db'))
+    return ctx._long_history
+
+
+def _analytics_rows(rows):
+    def setup(ctx):
+        warehouse = long_history_warehouse(ctx)
+        return lambda: warehouse.get_stock_analytics('S00000', rows)
+    return setup
+
+
+for _rows in (90, 1000, 10000):
+    benchmark(f'query.analytics_rows_{_rows}', number=20)(_analytics_rows(_rows))
+
+
+def _analytics_since(rows):
+    # A dashboard refresh that already has every bar but the newest
+    def setup(ctx):
+        warehouse = long_history_warehouse(ctx)
+        since = warehouse.conn.execute(
+            'SELECT date_key FROM fact_stock_prices ORDER BY date_key DESC LIMIT 1 OFFSET 1'
+        ).fetchone()[0]
+
+        def run():
+            warehouse.get_stock_analytics('S00000', rows, since=since)
+        return run
+    return setup
+
+
+for _rows in (90, 10000):
+    benchmark(f'query.analytics_since_rows_{_rows}', number=20)(_analytics_since(_rows))
+
+
+def _history_page(offset):
+    def setup(ctx):
+        warehouse = long_history_warehouse(ctx)
+        cursor = warehouse.conn.execute(
+            'SELECT date_key FROM fact_stock_prices ORDER BY date_key LIMIT 1 OFFSET ?', (offset,)
+        ).fetchone()[0] if offset else None
+        return lambda: warehouse.get_price_history('S00000', cursor=cursor, limit=1000)
+    return setup
+
+
+# Keyset pages cost the same at the start and the end of a long history
+benchmark('query.history_page_first', number=20)(_history_page(0))
+benchmark('query.history_page_deep', number=20)(_history_page(8999))
+
+
+def portfolio_of_everything(ctx):
+    """A portfolio holding every dataset symbol, bought in two lots, built once per context"""
+    if not hasattr(ctx, '_portfolio'):
+        warehouse = ctx.warehouse
+        dates = ctx.dataset.dates
+        portfolio_key = warehouse.add_portfolio('benchmark')
+        for i, symbol in enumerate(ctx.dataset.symbols):
+            warehouse.add_transaction(portfolio_key, symbol, dates[i % 20], 100, 10.0)
+            warehouse.add_transaction(portfolio_key, symbol, dates[len(dates) // 2], 50, 10.0)
+        ctx._portfolio = portfolio_key
+    return ctx._portfolio
+
+
+@benchmark('portfolio.nav_full', repeat=3)
+def portfolio_nav_full(ctx):
+    from src.database.portfolio import update_nav
+    portfolio_key = portfolio_of_everything(ctx)
+    return lambda: Counters(days=update_nav(ctx.warehouse, [portfolio_key], full=True)[portfolio_key])
+
+
+# After a load only the last stored day and any new ones are revalued
+@benchmark('portfolio.nav_incremental', number=5)
+def portfolio_nav_incremental(ctx):
+    from src.database.portfolio import update_nav
+    portfolio_key = portfolio_of_everything(ctx)
+    update_nav(ctx.warehouse, [portfolio_key])
+    return lambda: Counters(days=update_nav(ctx.warehouse, [portfolio_key])[portfolio_key])
+
+
+# Every symbol in the dataset, benchmarked against the first
+@benchmark('risk.universe', repeat=3)
+def risk_universe(ctx):
+    from src.database.risk import compute_risk
+    warehouse = ctx.warehouse
+    benchmark_symbol = ctx.dataset.symbols[0]
+    return lambda: Counters(symbols=len(compute_risk(warehouse, benchmark=benchmark_symbol)))
+
+
+@benchmark('risk.universe_cached', number=20)
+def risk_universe_cached(ctx):
+    from src.database.risk import RiskCache, compute_risk
+    warehouse = ctx.warehouse
+    cache = RiskCache()
+
+    def run():
+        cache.get(warehouse.get_ingest_version(), 'universe', lambda: compute_risk(warehouse))
+    run()
+    return run
+
+
+@benchmark('portfolio.get', number=20)
+def portfolio_get(ctx):
+    from src.database.portfolio import update_nav
+    portfolio_key = portfolio_of_everything(ctx)
+    update_nav(ctx.warehouse, [portfolio_key])
+    warehouse = ctx.warehouse
+
+    def run():
+        warehouse.get_portfolio(portfolio_key, 90)
+    return run
+
+
+def _reload_forever(path, rows, stop):
+    """Rewrite the same rows in large transactions until `stop` is set, like a backfill"""
+    from src.database import StockDataWarehouse
+    warehouse = StockDataWarehouse(path)
+    while not stop.is_set():
+        warehouse.insert_stock_prices(rows)
+    warehouse.close()
+
+
+class ReloadProcess:
+    """A writer process reloading history into a warehouse file for the with-block"""
+
+    def __init__(self, path, rows):
+        import multiprocessing
+        self.stop = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_reload_forever, args=(path, rows, self.stop),
+                                               daemon=True)
+
+    def __enter__(self):
+        import time
+        self.process.start()
+        # Let the writer reach its steady state before reads are timed
+        time.sleep(0.2)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.process.join()
+
+    def stop_later(self):
+        """Ask the writer to stop without waiting for its current transaction"""
+        self.stop.set()
+
+
+def _analytics_under_load(snapshot):
+    def setup(ctx):
+        from src.database import StockDataWarehouse
+        from src.database.snapshot import SnapshotPublisher, SnapshotReader
+
+        # The previous round's writer must be gone before its file is replaced
+        if getattr(ctx, '_reload', None):
+            ctx._reload.__exit__()
+        # The writer works on a copy so the shared loaded warehouse stays untouched
+        path = ctx.path('under_load.db')
+        writer = ctx.fresh_warehouse('under_load.db')
+        ctx.warehouse.conn.backup(writer.conn)
+        if snapshot:
+            SnapshotPublisher(writer, ctx.path('under_load.snapshot.db')).publish()
+            reader = SnapshotReader(ctx.path('under_load.snapshot.db')).current()
+        else:
+            reader = StockDataWarehouse(path)
+        writer.close()
+        rows = [row for _, symbol_rows in ctx.prepared_rows()[:300] for row in symbol_rows]
+        symbols = ctx.dataset.symbols[-WATCHLIST_SIZE:]
+        ctx._reload = ReloadProcess(path, rows).__enter__()
+
+        def run():
+            for symbol in symbols:
+                reader.get_stock_analytics(symbol, 90)
+            ctx._reload.stop_later()
+        return run
+    return setup
+
+
+# A watchlist of reads while another process commits large reload transactions;
+# readers of the live file wait out the writer's commit locks, snapshot readers never lock
+benchmark('query.analytics_under_load_live', repeat=5)(_analytics_under_load(False))
+benchmark('query.analytics_under_load_snapshot', repeat=5)(_analytics_under_load(True))
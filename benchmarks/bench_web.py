@@ -0,0 +1,86 @@
+"""HTTP round trips through the Flask test client"""
+
+from .harness import Counters, benchmark
+
+
+class BenchConfig:
+    TESTING = True
+    DATABASE_PATH = None
+    INGEST_JOURNAL_DIR = None
+
+
+def client_for(ctx):
+    """One app per context, serving the loaded benchmark warehouse"""
+    if not hasattr(ctx, '_client'):
+        from src.web import create_app
+        ctx.warehouse.conn.commit()
+        config = type('Config', (BenchConfig,), {'DATABASE_PATH': ctx.path('loaded.db')})
+        ctx._client = create_app(config).test_client()
+    return ctx._client
+
+
+@benchmark('web.stocks', number=5)
+def stocks(ctx):
+    client = client_for(ctx)
+    return lambda: client.get('/stocks')
+
+
+@benchmark('web.analytics', number=20)
+def analytics(ctx):
+    client = client_for(ctx)
+    symbol = ctx.dataset.symbols[-1]
+    return lambda: client.get(f'/analytics/{symbol}')
+
+
+@benchmark('web.analytics_batch', number=5)
+def analytics_batch(ctx):
+    client = client_for(ctx)
+    symbols = ctx.dataset.symbols[:50]
+    return lambda: client.post('/analytics/batch', json={'symbols': symbols})
+
+
+@benchmark('web.index', number=20)
+def index(ctx):
+    client = client_for(ctx)
+    return lambda: client.get('/')
+
+
+BURST_CLIENTS = 32
+BURST_SYMBOLS = 4
+
+
+def _analytics_burst(coalesce):
+    def setup(ctx):
+        import threading
+        from src.database.warehouse import QUERY_TIME
+        from src.web import create_app
+
+        ctx.warehouse.conn.commit()
+        config = type('Config', (BenchConfig,), {
+            'DATABASE_PATH': ctx.path('loaded.db'), 'COALESCE_REQUESTS': coalesce,
+        })
+        app = create_app(config)
+        symbols = ctx.dataset.symbols[:BURST_SYMBOLS]
+        clients = [app.test_client() for _ in range(BURST_CLIENTS)]
+
+        def run():
+            start = threading.Barrier(BURST_CLIENTS)
+
+            def client_burst(i):
+                start.wait()
+                clients[i].get(f'/analytics/{symbols[i % BURST_SYMBOLS]}')
+
+            before = QUERY_TIME.count(method='get_stock_analytics')
+            threads = [threading.Thread(target=client_burst, args=(i,)) for i in range(BURST_CLIENTS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return Counters(queries=QUERY_TIME.count(method='get_stock_analytics') - before)
+        return run
+    return setup
+
+
+# Market-open spike: many dashboards asking for the same few symbols at once
+benchmark('web.analytics_burst', repeat=5)(_analytics_burst(False))
+benchmark('web.analytics_burst_coalesced', repeat=5)(_analytics_burst(True))
@@ -0,0 +1,78 @@
+"""Deterministic synthetic market data for benchmarks"""
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+SCALES = {
+    'small': 10,
+    'medium': 1000,
+    'large': 10000,
+}
+
+END_DATE = datetime(2024, 12, 31)
+
+
+def symbols_for(n_symbols):
+    return [f'S{i:05d}' for i in range(n_symbols)]
+
+
+def trading_days(n_days, end=END_DATE):
+    """The last n business days up to `end`"""
+    return pd.bdate_range(end=end, periods=n_days)
+
+
+def generate_prices(symbol_index, dates, seed=0):
+    """Geometric random walk OHLCV bars for one symbol as a DataFrame"""
+    rng = np.random.default_rng((seed, symbol_index))
+    n = len(dates)
+    close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + rng.random(n) * 0.01)
+    low = np.minimum(open_, close) * (1 - rng.random(n) * 0.01)
+    volume = rng.integers(100_000, 10_000_000, n)
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Adj_Close': close, 'Volume': volume,
+    }, index=dates)
+
+
+def fact_rows(df, stock_key):
+    """Fact rows in insert_stock_prices order"""
+    return list(zip(
+        df.index.strftime('%Y%m%d').astype(int).tolist(), [stock_key] * len(df),
+        df['Open'].tolist(), df['High'].tolist(), df['Low'].tolist(),
+        df['Close'].tolist(), df['Adj_Close'].tolist(), df['Volume'].tolist()
+    ))
+
+
+class Dataset:
+    """A reproducible universe of `n_symbols` symbols with `n_days` daily bars each"""
+
+    def __init__(self, n_symbols, n_days=250, seed=0):
+        self.n_symbols = n_symbols
+        self.n_days = n_days
+        self.seed = seed
+        self.symbols = symbols_for(n_symbols)
+        self.dates = trading_days(n_days)
+
+    @property
+    def start_date(self):
+        return self.dates[0].to_pydatetime()
+
+    @property
+    def end_date(self):
+        return self.dates[-1].to_pydatetime()
+
+    def frames(self):
+        """Yield (symbol, DataFrame) pairs"""
+        for i, symbol in enumerate(self.symbols):
+            yield symbol, generate_prices(i, self.dates, self.seed)
+
+    def load(self, warehouse):
+        """Load the whole dataset into a warehouse, one transaction per symbol"""
+        warehouse.populate_date_dimension(self.start_date, self.end_date)
+        for symbol, df in self.frames():
+            stock_key = warehouse.add_stock(symbol, f'{symbol} Corp', 'Synthetic', 'Benchmark')
+            warehouse.insert_stock_prices(fact_rows(df, stock_key))
+        return warehouse
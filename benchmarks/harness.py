@@ -0,0 +1,140 @@
+"""Minimal benchmark registry, timer and JSON result store"""
+
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from src.database import StockDataWarehouse
+from .datasets import Dataset, fact_rows
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5, number=1):
+    """Register a benchmark
+
+    The decorated function receives a BenchContext and returns the
+    zero-argument callable to time, so any setup it does is not measured.
+    It is called again for every repeat, giving each round fresh state.
+    A callable may return Counters, which are kept from the last call; any
+    other return value, such as a query result, is ignored.
+    """
+    def register(fn):
+        BENCHMARKS[name] = {'fn': fn, 'repeat': repeat, 'number': number}
+        return fn
+    return register
+
+
+class Counters(dict):
+    """Named counts a benchmark callable reports alongside its timings"""
+
+
+class BenchContext:
+    """Shared state for one scale: the dataset and a lazily loaded warehouse"""
+
+    def __init__(self, n_symbols, n_days=250, workdir=None):
+        self.dataset = Dataset(n_symbols, n_days)
+        self.workdir = workdir or tempfile.mkdtemp(prefix='stock_bench_')
+        self._warehouse = None
+        self._rows = None
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def fresh_warehouse(self, name='fresh.db'):
+        """An empty warehouse, replacing any previous file of that name"""
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        return StockDataWarehouse(path)
+
+    def prepared_rows(self):
+        """(symbol, fact rows) pairs keyed for a fresh warehouse, generated once"""
+        if self._rows is None:
+            self._rows = [(symbol, fact_rows(df, i + 1))
+                          for i, (symbol, df) in enumerate(self.dataset.frames())]
+        return self._rows
+
+    @property
+    def warehouse(self):
+        """Warehouse loaded with the full dataset, built once per context"""
+        if self._warehouse is None:
+            self._warehouse = self.dataset.load(self.fresh_warehouse('loaded.db'))
+        return self._warehouse
+
+    def close(self):
+        if self._warehouse:
+            self._warehouse.close()
+
+
+def measure(fn, ctx, repeat, number):
+    timings = []
+    counters = None
+    for _ in range(repeat):
+        target = fn(ctx)
+        started = time.perf_counter()
+        for _ in range(number):
+            counters = target()
+        timings.append((time.perf_counter() - started) / number)
+    stats = {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'rounds': repeat,
+        'number': number,
+    }
+    if isinstance(counters, Counters):
+        stats['counters'] = dict(counters)
+    return stats
+
+
+def run(ctx, pattern=None, report=print):
+    """Run every registered benchmark whose name contains `pattern`"""
+    results = {}
+    for name in sorted(BENCHMARKS):
+        if pattern and pattern not in name:
+            continue
+        spec = BENCHMARKS[name]
+        results[name] = measure(spec['fn'], ctx, spec['repeat'], spec['number'])
+        counters = results[name].get('counters')
+        extra = '  ' + ' '.join(f'{key}={value}' for key, value in counters.items()) if counters else ''
+        report(f"{name:<40} median {results[name]['median'] * 1000:10.3f} ms{extra}")
+    return results
+
+
+def save(path, results, scale, n_symbols, n_days):
+    payload = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'scale': scale,
+            'symbols': n_symbols,
+            'days': n_days,
+        },
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    return payload
+
+
+def compare(results, baseline_path, threshold=1.2):
+    """Compare medians against a saved run; returns names slower than `threshold`x"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    regressions = {}
+    for name, stats in results.items():
+        if name not in baseline or not baseline[name]['median']:
+            continue
+        ratio = stats['median'] / baseline[name]['median']
+        if ratio > threshold:
+            regressions[name] = round(ratio, 2)
+    return regressions
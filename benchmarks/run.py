@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Run the benchmark suite and store or compare results
+
+    python -m benchmarks.run --scale small
+    python -m benchmarks.run --scale medium --filter query --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+from . import harness
+from .datasets import SCALES
+from . import bench_alerts, bench_ingest, bench_queries, bench_web  # noqa: F401 (registers benchmarks)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stock analytics benchmarks')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='Dataset size: small=10, medium=1k, large=10k symbols')
+    parser.add_argument('--days', type=int, default=250, help='Daily bars per symbol')
+    parser.add_argument('--filter', default=None, help='Only run benchmarks containing this text')
+    parser.add_argument('--output', default=None, help='Results JSON path')
+    parser.add_argument('--baseline', default=None, help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio that counts as a regression')
+    args = parser.parse_args(argv)
+
+    n_symbols = SCALES[args.scale]
+    print(f"Benchmarking {n_symbols} symbols x {args.days} days")
+    ctx = harness.BenchContext(n_symbols, args.days)
+    try:
+        results = harness.run(ctx, args.filter)
+    finally:
+        ctx.close()
+        shutil.rmtree(ctx.workdir, ignore_errors=True)
+
+    output = args.output or os.path.join('benchmarks', 'results', f'{args.scale}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    harness.save(output, results, args.scale, n_symbols, args.days)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        regressions = harness.compare(results, args.baseline, args.threshold)
+        for name, ratio in regressions.items():
+            print(f"REGRESSION {name}: {ratio}x baseline")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,12 +4,51 @@ class Config:
     # Database
     DATABASE_NAME = os.getenv('DB_NAME', 'stock_warehouse.db')
     DATABASE_PATH = os.path.join('data', DATABASE_NAME)
+    # Store new fact tables as WITHOUT ROWID integer ticks
+    COMPACT_STORAGE = os.getenv('COMPACT_STORAGE', 'False').lower() == 'true'
+    # Split price facts over this many files beside DATABASE_PATH (1 keeps one file)
+    WAREHOUSE_SHARDS = int(os.getenv('WAREHOUSE_SHARDS', 1))
+    # Price history older than this many days moves to per-year archive files
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 365))
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join('data', 'archive'))
+    # Seconds between background ANALYZE/vacuum/checkpoint runs (0 disables)
+    MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', 0))
+    # Serve reads from a read-only snapshot republished after each load (unset disables)
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH')
+    SNAPSHOT_MMAP_SIZE = int(os.getenv('SNAPSHOT_MMAP_SIZE', 256 * 1024 * 1024))
     
     # Flask
     FLASK_HOST = os.getenv('FLASK_HOST', '127.0.0.1')
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
+    # Monitoring
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # Log statements slower than this many milliseconds (unset disables the log)
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS')) if os.getenv('SLOW_QUERY_MS') else None
+    # Allow ?profile=1 / X-Profile: 1 to return a cProfile summary instead of the response
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    
     # Data loading
+    INGEST_JOURNAL_DIR = os.getenv('INGEST_JOURNAL_DIR', os.path.join('data', 'journal'))
     DEFAULT_HISTORY_DAYS = 180
     CHART_DISPLAY_DAYS = 90
+    BATCH_MAX_SYMBOLS = 200
+    # Bars per /history page; NDJSON streams read this many rows per query
+    HISTORY_PAGE_SIZE = 1000
+    HISTORY_MAX_PAGE_SIZE = 5000
+    # Rows per chunk when streaming vendor dump files
+    IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', 200_000))
+    # On-disk cache of upstream market data (empty disables); offline mode never calls upstream
+    MARKET_CACHE_DIR = os.getenv('MARKET_CACHE_DIR', os.path.join('data', 'cache'))
+    MARKET_CACHE_INFO_TTL = int(os.getenv('MARKET_CACHE_INFO_TTL', 7 * 24 * 3600))
+    MARKET_CACHE_BARS_TTL = int(os.getenv('MARKET_CACHE_BARS_TTL', 6 * 3600))
+    MARKET_CACHE_MAX_BYTES = int(os.getenv('MARKET_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    MARKET_CACHE_OFFLINE = os.getenv('MARKET_CACHE_OFFLINE', 'False').lower() == 'true'
+    # Risk analytics: benchmark for beta, return window, symbols per matrix chunk
+    RISK_BENCHMARK = os.getenv('RISK_BENCHMARK', 'SPY')
+    RISK_DAYS = 252
+    RISK_CHUNK_SYMBOLS = int(os.getenv('RISK_CHUNK_SYMBOLS', 250))
+    RISK_CACHE_ENTRIES = 32
+    # Let identical concurrent analytics requests and loads share one execution
+    COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', 'True').lower() == 'true'
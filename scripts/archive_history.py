@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Move price history older than the retention horizon into per-year archives"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.database.sharding import open_warehouse
+from src.database.retention import archive_history
+from config.config import Config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Warehouse database file')
+    parser.add_argument('--days', type=int, default=Config.RETENTION_DAYS,
+                        help='Days of history to keep in the warehouse')
+    parser.add_argument('--archive-dir', default=Config.ARCHIVE_DIR,
+                        help='Directory for the prices_<year>.db archive files')
+    args = parser.parse_args()
+
+    print(f"Archiving history older than {args.days} days from {args.db}...")
+    warehouse = open_warehouse(args.db)
+    try:
+        moved = archive_history(warehouse, args.archive_dir, args.days)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    finally:
+        warehouse.close()
+
+    for year, rows in sorted(moved.items()):
+        print(f"  {year}: {rows:,} rows -> {os.path.join(args.archive_dir, f'prices_{year}.db')}")
+    print(f"\n✓ {sum(moved.values()):,} rows archived")
+
+if __name__ == '__main__':
+    main()
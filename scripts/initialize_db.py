@@ -18,7 +18,7 @@ def main():
     os.makedirs('data', exist_ok=True)
     
     # Create warehouse (this creates the schema)
-    warehouse = StockDataWarehouse(Config.DATABASE_PATH)
+    warehouse = StockDataWarehouse(Config.DATABASE_PATH, compact=Config.COMPACT_STORAGE)
     
     print("✓ Star schema created successfully!")
     print("\nTables created:")
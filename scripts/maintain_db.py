@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Refresh planner statistics and reclaim space in the warehouse database"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.database.sharding import open_warehouse
+from src.database.maintenance import run_maintenance
+from config.config import Config
+
+def print_stats(title, stats):
+    print(f"\n{title}")
+    if stats['file_bytes'] is not None:
+        print(f"  File size:       {stats['file_bytes']:,}")
+    print(f"  WAL size:        {stats['wal_bytes']:,}")
+    print(f"  Pages:           {stats['page_count']:,} x {stats['page_size']} bytes")
+    print(f"  Free pages:      {stats['freelist_count']:,} ({stats['free_ratio']:.1%})")
+    if stats['fragmentation'] is not None:
+        print(f"  Fragmentation:   {stats['fragmentation']:.1%}")
+    drift = stats['statistics_drift']
+    print(f"  Stats drift:     {'never analyzed' if drift is None else f'{drift:.1%}'}")
+    print(f"  Auto vacuum:     {stats['auto_vacuum']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Database file to maintain')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='Allow a full VACUUM (locks the database while it runs)')
+    parser.add_argument('--force', action='store_true',
+                        help='Run every applicable task regardless of churn')
+    args = parser.parse_args()
+
+    # Opening the warehouse creates any missing tables before maintenance looks at them;
+    # a sharded warehouse also names its shard files, which hold the fact rows
+    warehouse = open_warehouse(args.db)
+    paths = [path for path, _ in warehouse.database_files()]
+    warehouse.close()
+
+    for path in paths:
+        report = run_maintenance(path, full_vacuum=args.vacuum, force=args.force, detailed=True)
+        print(f"\n== {path}")
+        print_stats("Before:", report['before'])
+        print_stats("After:", report['after'])
+        print()
+        for task in report['tasks']:
+            print(f"✓ {task} ({report['seconds'][task] * 1000:.1f} ms)")
+
+if __name__ == '__main__':
+    main()
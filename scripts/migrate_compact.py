@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Convert fact_stock_prices to the compact WITHOUT ROWID tick layout"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path so we can import src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.database import StockDataWarehouse
+from src.database.compact import migrate_to_compact, storage_report
+from config.config import Config
+
+def print_report(title, report):
+    print(f"\n{title}")
+    print(f"  Layout:          {report['layout']}")
+    print(f"  Fact rows:       {report['rows']:,}")
+    print(f"  Fact bytes:      {report['fact_bytes']:,}")
+    print(f"  Bytes per row:   {report['bytes_per_row']}")
+    if report['file_bytes'] is not None:
+        print(f"  File size:       {report['file_bytes']:,}")
+    print(f"  Cache hit rate:  {report['cache_hit_rate']:.1%} ({report['cache_pages']} cache pages)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='Database file to migrate')
+    args = parser.parse_args()
+
+    print(f"Migrating {args.db} to compact storage...")
+    warehouse = StockDataWarehouse(args.db)
+
+    print_report("Before:", storage_report(warehouse.conn, args.db))
+    rows = migrate_to_compact(warehouse.conn)
+    print_report("After:", storage_report(warehouse.conn, args.db))
+
+    warehouse.close()
+    print(f"\n✓ {rows:,} price rows stored in compact layout")
+
+if __name__ == '__main__':
+    main()
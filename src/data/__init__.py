@@ -1,3 +1,8 @@
-from .loader import StockDataLoader
-
 __all__ = ['StockDataLoader']
+
+def __getattr__(name):
+    # The loader imports pandas and yfinance; defer that until it is used
+    if name == 'StockDataLoader':
+        from .loader import StockDataLoader
+        return StockDataLoader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
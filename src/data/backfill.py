@@ -0,0 +1,203 @@
+"""Parallel history backfill through per-worker staging databases
+
+Symbols are split round-robin into shards. Each shard is fetched, validated and
+normalized in a worker process into its own staging SQLite file, so the
+CPU-bound pandas work runs on every core while the warehouse sees one writer.
+The main process merges finished shards with ATTACH + INSERT ... SELECT, one
+transaction per shard, while the remaining workers keep staging.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from src.database.adjustments import actions_from_history
+from .loader import LOADS, ROWS, STAGE_TIME, normalize_history, price_rows, reject_rows
+from .sources import YahooFinanceSource
+from .validation import allows_zero_volume, validate_prices
+
+SHARDS_PER_WORKER = 4
+
+STAGING_SCHEMA = '''
+    CREATE TABLE stage_stock (
+        symbol TEXT PRIMARY KEY,
+        company_name TEXT,
+        sector TEXT,
+        industry TEXT
+    );
+    CREATE TABLE stage_prices (
+        date_key INTEGER,
+        symbol TEXT,
+        open_price REAL,
+        high_price REAL,
+        low_price REAL,
+        close_price REAL,
+        adj_close_price REAL,
+        volume INTEGER
+    );
+    CREATE TABLE stage_rejects (
+        date_key INTEGER,
+        symbol TEXT,
+        open_price REAL,
+        high_price REAL,
+        low_price REAL,
+        close_price REAL,
+        adj_close_price REAL,
+        volume INTEGER,
+        reason TEXT
+    );
+    CREATE TABLE stage_actions (
+        symbol TEXT,
+        date_key INTEGER,
+        action_type TEXT,
+        value REAL
+    );
+'''
+
+def stage_shard(source, symbols, start_date, end_date, path):
+    """Fetch, validate and normalize symbols into a new staging database
+
+    Runs in a worker process. Rows carry the symbol instead of a stock_key,
+    which only the warehouse can assign. Returns a summary for the merge.
+    """
+    loaded, failed, rejected = {}, {}, 0
+    conn = sqlite3.connect(path)
+    # Staging files are rebuilt from the source on failure, so skip durability
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(STAGING_SCHEMA)
+
+    for symbol in symbols:
+        try:
+            info, df = source.fetch(symbol, start_date, end_date)
+            if df.empty:
+                failed[symbol] = "No data available for this symbol"
+                continue
+            df = normalize_history(df)
+            actions = actions_from_history(df)
+            df, rejects, _ = validate_prices(df, allow_zero_volume=allows_zero_volume(symbol))
+
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO stage_stock VALUES (?, ?, ?, ?)', (
+                    symbol, info.get('longName', symbol),
+                    info.get('sector', 'Unknown'), info.get('industry', 'Unknown')
+                ))
+                conn.executemany('INSERT INTO stage_prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                 price_rows(df, symbol))
+                if len(rejects):
+                    conn.executemany('INSERT INTO stage_rejects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     reject_rows(rejects, symbol))
+                conn.executemany('INSERT INTO stage_actions VALUES (?, ?, ?, ?)', [
+                    (symbol, int(action.date_key), action.action_type, float(action.value))
+                    for action in actions.itertuples(index=False)
+                ])
+        except Exception as e:
+            failed[symbol] = f"Error: {str(e)}"
+            continue
+
+        rejected += len(rejects)
+        if df.empty:
+            failed[symbol] = "No valid price data for this symbol"
+        else:
+            loaded[symbol] = len(df)
+
+    conn.close()
+    return {'path': path, 'loaded': loaded, 'failed': failed, 'rejected': rejected}
+
+def merge_shard(warehouse, path):
+    """Merge a staging database into the warehouse in one transaction"""
+    conn = warehouse.conn
+    # ATTACH is not allowed inside a transaction
+    conn.commit()
+    conn.execute('ATTACH DATABASE ? AS stage', (path,))
+    try:
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO dim_stock (symbol, company_name, sector, industry)
+                SELECT symbol, company_name, sector, industry FROM stage.stage_stock
+            ''')
+            warehouse.copy_prices('''
+                SELECT p.date_key, s.stock_key, p.open_price, p.high_price, p.low_price,
+                       p.close_price, p.adj_close_price, p.volume
+                FROM stage.stage_prices p
+                JOIN dim_stock s ON s.symbol = p.symbol
+                ORDER BY s.stock_key, p.date_key
+            ''')
+            conn.execute('''
+                INSERT INTO fact_price_rejects
+                (date_key, stock_key, open_price, high_price, low_price,
+                 close_price, adj_close_price, volume, reason, rejected_at)
+                SELECT r.date_key, s.stock_key, r.open_price, r.high_price, r.low_price,
+                       r.close_price, r.adj_close_price, r.volume, r.reason, ?
+                FROM stage.stage_rejects r
+                JOIN dim_stock s ON s.symbol = r.symbol
+            ''', (datetime.now().isoformat(),))
+            conn.execute('''
+                INSERT OR REPLACE INTO fact_corporate_actions
+                (stock_key, date_key, action_type, value)
+                SELECT s.stock_key, a.date_key, a.action_type, a.value
+                FROM stage.stage_actions a
+                JOIN dim_stock s ON s.symbol = a.symbol
+            ''')
+    finally:
+        conn.execute('DETACH DATABASE stage')
+    # dim_stock was written behind the cache's back
+    warehouse.dimensions.clear()
+
+def backfill(warehouse, symbols, source=None, days=180, end_date=None, workers=None,
+             shards=None, staging_dir=None):
+    """Load `days` of history for many symbols using `workers` processes
+
+    Returns {'loaded': {symbol: rows}, 'failed': {symbol: message}, 'rejected': rows}.
+    With workers=1 shards are staged in-process, which is the serial baseline.
+    """
+    source = source or YahooFinanceSource()
+    workers = workers or os.cpu_count() or 1
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    end_date = end_date or datetime.now()
+    start_date = end_date - timedelta(days=days)
+
+    shards = max(1, min(shards or workers * SHARDS_PER_WORKER, len(symbols)))
+    groups = [symbols[i::shards] for i in range(shards)]
+    own_dir = staging_dir is None
+    staging_dir = staging_dir or tempfile.mkdtemp(prefix='stock_backfill_')
+    paths = [os.path.join(staging_dir, f'shard-{i:04d}.db') for i in range(shards)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+    summary = {'loaded': {}, 'failed': {}, 'rejected': 0}
+    with STAGE_TIME.time(stage='date_dimension'):
+        warehouse.populate_date_dimension(start_date, end_date)
+
+    try:
+        if workers == 1:
+            results = (stage_shard(source, group, start_date, end_date, path)
+                       for group, path in zip(groups, paths))
+            _merge_results(warehouse, results, summary)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(stage_shard, source, group, start_date, end_date, path)
+                           for group, path in zip(groups, paths)]
+                _merge_results(warehouse, (f.result() for f in as_completed(futures)), summary)
+    finally:
+        if own_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return summary
+
+def _merge_results(warehouse, results, summary):
+    for result in results:
+        with STAGE_TIME.time(stage='merge'):
+            merge_shard(warehouse, result['path'])
+        os.remove(result['path'])
+
+        summary['loaded'].update(result['loaded'])
+        summary['failed'].update(result['failed'])
+        summary['rejected'] += result['rejected']
+        LOADS.inc(len(result['loaded']), result='success')
+        LOADS.inc(len(result['failed']), result='failure')
+        ROWS.inc(sum(result['loaded'].values()), outcome='accepted')
+        ROWS.inc(result['rejected'], outcome='rejected')
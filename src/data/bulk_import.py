@@ -0,0 +1,317 @@
+"""Streaming import of multi-symbol vendor dumps (CSV or Parquet)
+
+A dump holds one bar per row for many symbols and may be far larger than
+memory. Each symbol's bars must come in date order, which a dump sorted by
+date or by symbol and date satisfies; symbols may interleave freely. A bar
+dated before one already read for its symbol is quarantined as out_of_order.
+The dump is read in chunks of `chunk_rows`; each chunk is validated as a
+whole, its new symbols are inserted into dim_stock with one statement, and its
+facts are written with one executemany in one transaction. The date
+dimension is filled once for the covered range at the end.
+
+Validation looks at each bar's neighbours and keeps the last of repeated
+dates, so every symbol's bars on its newest date, and its newest bar before
+them that passed the row checks, wait for the next chunk; the bar that passed
+before that comes along as context. Results therefore do not depend on the
+chunk size.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from .loader import ROWS, STAGE_TIME
+from .validation import OUT_OF_ORDER, OUTLIER_SPIKE, allows_zero_volume, validate_prices
+
+CHUNK_ROWS = 200_000
+
+# Canonical column -> header spellings seen in vendor dumps, compared lowercased
+COLUMN_ALIASES = {
+    'symbol': ('symbol', 'ticker'),
+    'date': ('date', 'timestamp', 'day'),
+    'Open': ('open', 'open_price'),
+    'High': ('high', 'high_price'),
+    'Low': ('low', 'low_price'),
+    'Close': ('close', 'close_price'),
+    'Adj_Close': ('adj_close', 'adj close', 'adjclose', 'adj_close_price', 'adjusted_close'),
+    'Volume': ('volume', 'vol'),
+    'company_name': ('company_name', 'name', 'company'),
+    'sector': ('sector',),
+    'industry': ('industry',),
+}
+REQUIRED = ['symbol', 'date', 'Open', 'High', 'Low', 'Close', 'Volume']
+STOCK_ATTRIBUTES = ['company_name', 'sector', 'industry']
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS, file_format=None):
+    """Yield DataFrames of at most `chunk_rows` rows from a CSV (optionally compressed) or Parquet file"""
+    file_format = file_format or ('parquet' if path.lower().endswith(PARQUET_SUFFIXES) else 'csv')
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Importing Parquet dumps needs pyarrow: pip install pyarrow') from None
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif file_format == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    else:
+        raise ValueError(f'Unknown dump format: {file_format}')
+
+
+def resolve_columns(header, columns=None):
+    """Map a dump's header to canonical names, with `columns` overriding {canonical: header}"""
+    lowered = {str(name).strip().lower(): name for name in header}
+    mapping = {}
+    for canonical, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[lowered[alias]] = canonical
+                break
+    for canonical, name in (columns or {}).items():
+        if name not in header:
+            raise ValueError(f'Dump has no column {name!r} for {canonical}')
+        mapping = {k: v for k, v in mapping.items() if v != canonical}
+        mapping[name] = canonical
+    missing = [name for name in REQUIRED if name not in mapping.values()]
+    if missing:
+        raise ValueError(f"Dump is missing columns: {', '.join(missing)}")
+    return mapping
+
+
+def normalize_chunk(chunk, mapping):
+    """Canonical frame indexed by date with a `symbol` column; rows without a symbol or date are dropped"""
+    df = chunk[list(mapping)].rename(columns=mapping)
+    # A dump repeats each symbol on many rows, so clean up the distinct spellings only
+    codes, symbols = pd.factorize(df['symbol'])
+    symbols = pd.Index(symbols.astype(str)).str.strip().str.upper()
+    has_symbol = codes >= 0
+    df['symbol'] = np.where(has_symbol, symbols.to_numpy(dtype=object)[codes], '')
+    dates = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    # Timestamps with a time of day are bars of that calendar day
+    df['date'] = dates.dt.normalize()
+    keep = has_symbol & df['symbol'].ne('') & df['date'].notna()
+    df = df[keep].copy()
+    if 'Adj_Close' not in df:
+        df['Adj_Close'] = df['Close']
+    for column in ('Open', 'High', 'Low', 'Close', 'Adj_Close', 'Volume'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df.set_index('date'), int((~keep).sum())
+
+
+def _date_keys(index):
+    return (index.year * 10000 + index.month * 100 + index.day).to_numpy(dtype=np.int64)
+
+
+def _fact_rows(df, stock_keys):
+    return list(zip(
+        _date_keys(df.index).tolist(), stock_keys.tolist(),
+        df['Open'].astype(float).tolist(), df['High'].astype(float).tolist(),
+        df['Low'].astype(float).tolist(), df['Close'].astype(float).tolist(),
+        df['Adj_Close'].astype(float).tolist(), df['Volume'].astype('int64').tolist()
+    ))
+
+
+def _reject_rows(df, stock_keys):
+    frame = pd.DataFrame({
+        'date_key': _date_keys(df.index), 'stock_key': stock_keys,
+        'open': df['Open'].to_numpy(), 'high': df['High'].to_numpy(),
+        'low': df['Low'].to_numpy(), 'close': df['Close'].to_numpy(),
+        'adj_close': df['Adj_Close'].to_numpy(), 'volume': df['Volume'].to_numpy(),
+        'reason': df['reason'].to_numpy(),
+    }).astype(object)
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+class BulkImporter:
+    """Stream vendor dump files into a warehouse in bounded memory
+
+    Memory is bounded by `chunk_rows` plus a few held-back bars per symbol.
+    `columns` maps canonical names (symbol, date, Open, High, Low, Close,
+    Adj_Close, Volume, company_name, sector, industry) to the dump's headers
+    when they cannot be guessed.
+    """
+
+    def __init__(self, warehouse, chunk_rows=CHUNK_ROWS, columns=None, spike_threshold=0.5):
+        self.warehouse = warehouse
+        self.chunk_rows = chunk_rows
+        self.columns = columns
+        self.spike_threshold = spike_threshold
+        self.stock_keys = {}
+        self.carry = None
+        self.newest = {}
+        self.min_date = None
+        self.max_date = None
+        self.stats = {'rows': 0, 'loaded': 0, 'rejected': 0, 'skipped': 0, 'new_symbols': 0}
+        self.symbols = set()
+
+    def import_file(self, path, file_format=None):
+        """Import one dump file and return the running stats"""
+        started = time.perf_counter()
+        mapping = None
+        for chunk in read_chunks(path, self.chunk_rows, file_format):
+            if mapping is None:
+                mapping = resolve_columns(chunk.columns, self.columns)
+            df, skipped = normalize_chunk(chunk, mapping)
+            self.stats['rows'] += len(chunk)
+            self.stats['skipped'] += skipped
+            with STAGE_TIME.time(stage='import_chunk'):
+                self._load(df, final=False)
+        self.stats['seconds'] = self.stats.get('seconds', 0.0) + time.perf_counter() - started
+        return self.stats
+
+    def finish(self):
+        """Write the held-back bars, fill the date dimension once and return the final stats"""
+        started = time.perf_counter()
+        if self.carry is not None and len(self.carry):
+            with STAGE_TIME.time(stage='import_chunk'):
+                self._load(self.carry.iloc[:0].drop(columns=['written']), final=True)
+        if self.min_date is not None:
+            with STAGE_TIME.time(stage='date_dimension'):
+                self.warehouse.populate_date_dimension(self.min_date.to_pydatetime(),
+                                                       self.max_date.to_pydatetime())
+        stats = self.stats
+        stats['seconds'] = round(stats.get('seconds', 0.0) + time.perf_counter() - started, 3)
+        stats['symbols'] = len(self.symbols)
+        stats['rows_per_s'] = round(stats['rows'] / stats['seconds']) if stats['seconds'] else 0
+        return stats
+
+    def _load(self, df, final):
+        if len(df):
+            low, high = df.index.min(), df.index.max()
+            self.min_date = low if self.min_date is None else min(self.min_date, low)
+            self.max_date = high if self.max_date is None else max(self.max_date, high)
+            self._add_stocks(df)
+            late = self._late(df)
+            if late.any():
+                self._write(None, df[late].assign(reason=OUT_OF_ORDER))
+                df = df[~late]
+
+        # Bring back the held bars of the symbols in this chunk; the others stay held
+        df = df.assign(written=False)
+        if self.carry is not None:
+            returning = self.carry['symbol'].isin(df['symbol']) | final
+            df = pd.concat([self.carry[returning], df])
+            self.carry = self.carry[~returning]
+        # lexsort is stable, so held bars come first and repeated dates keep file order
+        date_keys = _date_keys(df.index)
+        df = df.iloc[np.lexsort((date_keys, df['symbol'].to_numpy()))]
+        date_keys = _date_keys(df.index)
+        symbols = df['symbol'].to_numpy()
+
+        frame = df.drop(columns=['written']).assign(row=np.arange(len(df)))
+        names, inverse = np.unique(symbols, return_inverse=True)
+        zero_volume = np.array([allows_zero_volume(name) for name in names], dtype=bool)[inverse]
+        clean, rejects, _ = validate_prices(frame, self.spike_threshold, groups=symbols,
+                                            allow_zero_volume=zero_volume)
+        write = ~df['written'].to_numpy()
+        if not final:
+            # A later chunk may repeat a symbol's newest date, and the bar that passed
+            # before it still waits for its next neighbour
+            newest = pd.Series(date_keys).groupby(symbols).transform('max').to_numpy()
+            passed = np.ones(len(df), dtype=bool)
+            passed[rejects['row'].to_numpy()] = rejects['reason'].to_numpy() == OUTLIER_SPIKE
+            candidates = np.flatnonzero(passed & (date_keys < newest))
+            owner = symbols[candidates]
+            same = owner[1:] == owner[:-1]
+            last = np.ones(len(owner), dtype=bool)
+            last[:-1] = ~same
+            before_last = np.zeros(len(owner), dtype=bool)
+            before_last[:-1] = same & last[1:]
+            pending = date_keys == newest
+            pending[candidates[last]] = True
+            context = np.zeros(len(df), dtype=bool)
+            context[candidates[before_last]] = True
+            held = pending | context
+            self.carry = pd.concat([self.carry, df[held].assign(written=~pending[held])])
+            write &= ~pending
+
+        self._write(clean[write[clean['row'].to_numpy()]],
+                    rejects[write[rejects['row'].to_numpy()]])
+
+    def _late(self, df):
+        """Rows dated before a bar read earlier in the file for the same symbol"""
+        date_keys = pd.Series(_date_keys(df.index))
+        symbols = df['symbol'].to_numpy()
+        running = date_keys.groupby(symbols).cummax()
+        seen = np.fmax(running.groupby(symbols).shift(1).to_numpy(dtype=float),
+                       pd.Series(symbols).map(self.newest).to_numpy(dtype=float))
+        late = date_keys.to_numpy() < seen
+        for symbol, date_key in date_keys.groupby(symbols).max().items():
+            self.newest[symbol] = max(self.newest.get(symbol, date_key), date_key)
+        return late
+
+    def _write(self, clean, rejects):
+        if clean is not None:
+            self.warehouse.insert_stock_prices(
+                _fact_rows(clean, clean['symbol'].map(self.stock_keys).to_numpy()))
+            self.symbols.update(clean['symbol'].unique().tolist())
+            self.stats['loaded'] += len(clean)
+            ROWS.inc(len(clean), outcome='accepted')
+        if rejects is not None and len(rejects):
+            self.warehouse.insert_price_rejects(
+                _reject_rows(rejects, rejects['symbol'].map(self.stock_keys).to_numpy()))
+            self.stats['rejected'] += len(rejects)
+            ROWS.inc(len(rejects), outcome='rejected')
+
+    def _add_stocks(self, df):
+        """Insert unseen symbols into dim_stock with one statement
+
+        When the dump carries company_name, sector or industry those are
+        upserted for every symbol in the chunk, so a newer dump refreshes them.
+        """
+        attributes = [name for name in STOCK_ATTRIBUTES if name in df]
+        stocks = df.drop_duplicates('symbol', keep='last').sort_values('symbol')
+        if not attributes:
+            stocks = stocks[~stocks['symbol'].isin(self.stock_keys)]
+        if stocks.empty:
+            return
+        unknown = pd.Series('Unknown', index=stocks.index)
+        rows = list(zip(
+            stocks['symbol'].tolist(),
+            stocks.get('company_name', stocks['symbol']).astype(str).tolist(),
+            stocks.get('sector', unknown).astype(str).tolist(),
+            stocks.get('industry', unknown).astype(str).tolist(),
+        ))
+
+        conn = self.warehouse.conn
+        newest = conn.execute('SELECT COALESCE(MAX(stock_key), 0) FROM dim_stock').fetchone()[0]
+        with conn:
+            if attributes:
+                updates = ', '.join(f'{name} = excluded.{name}' for name in attributes)
+                conn.executemany(f'''
+                    INSERT INTO dim_stock (symbol, company_name, sector, industry)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (symbol) DO UPDATE SET {updates}
+                ''', rows)
+            else:
+                conn.executemany('''
+                    INSERT OR IGNORE INTO dim_stock (symbol, company_name, sector, industry)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+        # stock_key is AUTOINCREMENT, so this chunk's inserts are the keys above the old maximum
+        dimensions = self.warehouse.dimensions
+        for symbol, stock_key in conn.execute(
+                'SELECT symbol, stock_key FROM dim_stock WHERE stock_key > ?', (newest,)):
+            dimensions.add_stock(symbol, stock_key)
+            self.stats['new_symbols'] += 1
+        for symbol in stocks['symbol'].tolist():
+            if symbol not in self.stock_keys:
+                self.stock_keys[symbol] = dimensions.stock_key(symbol)
+
+
+def import_dumps(warehouse, paths, chunk_rows=CHUNK_ROWS, columns=None, file_format=None):
+    """Import vendor dump files in order and return stats including rows/s
+
+    Stats count rows read, loaded, rejected (quarantined) and skipped
+    (no parseable symbol or date), plus new and loaded symbols.
+    """
+    importer = BulkImporter(warehouse, chunk_rows, columns)
+    for path in paths:
+        importer.import_file(path, file_format)
+    stats = importer.finish()
+    stats['loaded_symbols'] = sorted(importer.symbols)
+    return stats
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import date
+from src.monitoring import REGISTRY
+from .sources import MarketDataSource
+
+REQUESTS = REGISTRY.counter('market_cache_requests_total',
+                            'Market data cache lookups by kind and result')
+
+# Company metadata rarely changes; bars for recent days do until the close settles
+INFO_TTL = 7 * 24 * 3600
+BARS_TTL = 6 * 3600
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMiss(LookupError):
+    """An offline cache was asked for data it never recorded"""
+
+
+def request_key(kind, symbol, interval=None, start=None, end=None):
+    """Stable hash of a request: (kind, symbol, interval, range)"""
+    request = json.dumps([kind, symbol.upper(), interval, start, end])
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+def _day(value):
+    return value.date().isoformat() if hasattr(value, 'date') else str(value)
+
+
+class CachedSource(MarketDataSource):
+    """Content-addressed on-disk cache in front of a market data source
+
+    Responses are pickled into objects/<digest>.pkl, named by the SHA-256 of
+    their bytes so identical responses are stored once. An SQLite index maps
+    each request key to its content, fetch time and last access. Metadata
+    and bars have separate TTLs, and once the objects exceed max_bytes the
+    least recently used entries are evicted. Empty responses are not cached
+    so failed downloads are retried.
+
+    In offline mode the source is never called: entries are served however
+    old they are, history with no exact match replays the newest recording
+    for the symbol (trimmed to the requested dates when they overlap), and
+    anything else raises CacheMiss.
+    """
+
+    def __init__(self, source, cache_dir, info_ttl=INFO_TTL, bars_ttl=BARS_TTL,
+                 max_bytes=MAX_BYTES, offline=False, clock=time.time):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.info_ttl = info_ttl
+        self.bars_ttl = bars_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.clock = clock
+        self.counts = {'hit': 0, 'miss': 0, 'stale': 0, 'replay': 0, 'evicted': 0}
+        self._conn = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+
+    def __getstate__(self):
+        # Backfill workers get their own index connection
+        state = dict(self.__dict__)
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'),
+                                         timeout=30, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    request_key TEXT PRIMARY KEY,
+                    kind TEXT,
+                    symbol TEXT,
+                    interval TEXT,
+                    range_start TEXT,
+                    range_end TEXT,
+                    digest TEXT,
+                    size INTEGER,
+                    fetched_at REAL,
+                    accessed_at REAL
+                )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_entries_request ON entries (kind, symbol, range_end)')
+            self._conn.commit()
+        return self._conn
+
+    def info(self, symbol):
+        return self._get(self.info_ttl, lambda: self.source.info(symbol), 'info', symbol)
+
+    def history(self, symbol, start_date, end_date):
+        return self._get(self.bars_ttl, lambda: self.source.history(symbol, start_date, end_date),
+                         'history', symbol, '1d', _day(start_date), _day(end_date))
+
+    def intraday(self, symbol, interval, period):
+        # A relative period means different bars every day
+        today = date.fromtimestamp(self.clock()).isoformat()
+        return self._get(self.bars_ttl, lambda: self.source.intraday(symbol, interval, period),
+                         'intraday', symbol, interval, period, today)
+
+    def stats(self):
+        """Lookup counts for this process plus the index's entry count and stored bytes"""
+        with self._lock:
+            entries, size = self.conn.execute('''
+                SELECT (SELECT COUNT(*) FROM entries), COALESCE(SUM(size), 0)
+                FROM (SELECT DISTINCT digest, size FROM entries)
+            ''').fetchone()
+        return dict(self.counts, entries=entries, bytes=size)
+
+    def _count(self, kind, result):
+        self.counts[result] += 1
+        REQUESTS.inc(kind=kind, result=result)
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', f'{digest}.pkl')
+
+    def _read(self, digest):
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _get(self, ttl, fetch, kind, symbol, interval=None, start=None, end=None):
+        symbol = symbol.upper()
+        key = request_key(kind, symbol, interval, start, end)
+        now = self.clock()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT digest, fetched_at FROM entries WHERE request_key = ?', (key,)
+            ).fetchone()
+        if row and (self.offline or now - row[1] < ttl):
+            value = self._read(row[0])
+            if value is not None:
+                with self._lock, self.conn:
+                    self.conn.execute('UPDATE entries SET accessed_at = ? WHERE request_key = ?',
+                                      (now, key))
+                self._count(kind, 'hit')
+                return value
+
+        if self.offline:
+            if kind == 'history':
+                value = self._replay(symbol, start, end)
+                if value is not None:
+                    self._count(kind, 'replay')
+                    return value
+            self._count(kind, 'miss')
+            raise CacheMiss(f"No cached {kind} for {symbol}")
+
+        self._count(kind, 'stale' if row else 'miss')
+        value = fetch()
+        if len(value):
+            self._store(key, kind, symbol, interval, start, end, value, now)
+        return value
+
+    def _store(self, key, kind, symbol, interval, start, end, value, now):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO entries
+                    (request_key, kind, symbol, interval, range_start, range_end,
+                     digest, size, fetched_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (key, kind, symbol, interval, start, end, digest, len(data), now, now))
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the stored objects fit in max_bytes"""
+        total = self.conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)'
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = self.conn.execute(
+            'SELECT request_key, digest, size FROM entries ORDER BY accessed_at'
+        ).fetchall()
+        for key, digest, size in victims:
+            if total <= self.max_bytes:
+                break
+            with self.conn:
+                self.conn.execute('DELETE FROM entries WHERE request_key = ?', (key,))
+                shared = self.conn.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1',
+                                           (digest,)).fetchone()
+            if not shared:
+                total -= size
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+            self.counts['evicted'] += 1
+
+    def _replay(self, symbol, start, end):
+        """Newest recorded history for a symbol, trimmed to [start, end] when they overlap"""
+        with self._lock:
+            row = self.conn.execute('''
+                SELECT digest FROM entries
+                WHERE kind = 'history' AND symbol = ?
+                ORDER BY range_end DESC
+                LIMIT 1
+            ''', (symbol,)).fetchone()
+        df = self._read(row[0]) if row else None
+        if df is None:
+            return None
+        dates = df.index.strftime('%Y-%m-%d')
+        window = df[(dates >= start) & (dates <= end)]
+        return window if len(window) else df
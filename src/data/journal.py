@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+
+
+class IngestJournal:
+    """Append-only NDJSON journal that stages bars before they reach the warehouse
+
+    Each fetch is written as one numbered segment file (a header line naming
+    the symbol and carrying the fetch's corporate actions, followed by one
+    price row per line) and fsynced before it is applied. Applying a segment
+    inserts its rows and actions and advances the symbol's checkpoint in a
+    single transaction, so after a crash `replay` applies
+    exactly the segments that never committed. A symbol's segments always
+    commit in sequence order, which keeps its checkpoint a safe high-water
+    mark even when an apply fails and a later fetch is staged.
+    """
+
+    SUFFIX = '.ndjson'
+
+    def __init__(self, directory, keep_applied=False):
+        self.directory = directory
+        self.keep_applied = keep_applied
+        self._lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _segments(self):
+        """List (segment, path) pairs in sequence order"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                segments.append((int(name.split('-', 1)[0]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _next_segment(self):
+        """Advance the persistent sequence; numbers are never reused after cleanup"""
+        sequence_path = os.path.join(self.directory, 'SEQUENCE')
+        segment = 0
+        if os.path.exists(sequence_path):
+            with open(sequence_path) as f:
+                segment = int(f.read().strip() or 0)
+        segments = self._segments()
+        segment = max(segment, segments[-1][0] if segments else 0) + 1
+        with open(sequence_path + '.tmp', 'w') as f:
+            f.write(str(segment))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(sequence_path + '.tmp', sequence_path)
+        return segment
+
+    def append(self, symbol, rows, actions=()):
+        """Durably stage price rows and corporate actions for a symbol and return the segment path
+
+        Actions are (stock_key, date_key, action_type, value) rows, written
+        to the header so a replayed segment commits them with its prices.
+        """
+        with self._lock:
+            segment = self._next_segment()
+            path = os.path.join(self.directory, f'{segment:012d}-{symbol.upper()}{self.SUFFIX}')
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'symbol': symbol.upper(), 'segment': segment,
+                                    'actions': [list(action) for action in actions]}) + '\n')
+                for row in rows:
+                    f.write(json.dumps(list(row)) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        return path
+
+    def read(self, path):
+        """Read a segment file into its header and rows"""
+        with open(path) as f:
+            header = json.loads(f.readline())
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        return header, rows
+
+    def _header(self, path):
+        with open(path) as f:
+            return json.loads(f.readline())
+
+    def _symbol(self, path):
+        # Segment files are named <segment>-<SYMBOL>.ndjson
+        return os.path.basename(path)[:-len(self.SUFFIX)].split('-', 1)[1]
+
+    def pending(self, warehouse, symbol=None):
+        """Segment paths not yet covered by their symbol's checkpoint, in order
+
+        Read-only: applied segments are removed by apply() and compact().
+        """
+        checkpoints = {}
+        pending = []
+        for segment, path in self._segments():
+            name = self._symbol(path)
+            if symbol is not None and name != symbol.upper():
+                continue
+            if name not in checkpoints:
+                checkpoints[name] = warehouse.get_ingest_checkpoint(name)
+            if segment > checkpoints[name]:
+                pending.append(path)
+        return pending
+
+    def _apply_segment(self, warehouse, path):
+        header, rows = self.read(path)
+        actions = [tuple(action) for action in header.get('actions', ())]
+        warehouse.insert_stock_prices(rows, checkpoint=(header['symbol'], header['segment']),
+                                      actions=actions)
+        if not self.keep_applied:
+            os.remove(path)
+        return len(rows)
+
+    def apply(self, warehouse, path):
+        """Commit one segment, after any earlier pending ones of its symbol; returns the rows
+
+        The checkpoint is a per-symbol high-water mark, so segments must
+        commit in order: if an earlier segment failed to apply, it is
+        applied first, and if it fails again this one is not applied either.
+        """
+        header = self._header(path)
+        with self._apply_lock:
+            earlier = [pending for pending in self.pending(warehouse, header['symbol'])
+                       if pending != path and os.path.basename(pending) < os.path.basename(path)]
+            rows = sum(self._apply_segment(warehouse, segment) for segment in earlier)
+            return rows + self._apply_segment(warehouse, path)
+
+    def compact(self, warehouse):
+        """Delete segment files already covered by checkpoints; returns how many"""
+        if self.keep_applied:
+            return 0
+        pending = set(self.pending(warehouse))
+        removed = 0
+        for _, path in self._segments():
+            if path not in pending:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def replay(self, warehouse):
+        """Apply every unapplied segment in order, then compact; returns the number of rows"""
+        # Pending segments come in sequence order, so each symbol's commit in order
+        with self._apply_lock:
+            rows = sum(self._apply_segment(warehouse, path) for path in self.pending(warehouse))
+        self.compact(warehouse)
+        return rows
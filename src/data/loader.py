@@ -1,16 +1,76 @@
-import yfinance as yf
 from datetime import datetime, timedelta
 import pandas as pd
+from src.database.adjustments import actions_from_history
+from src.database.intraday import INTERVAL_MINUTES, IntradayStore
+from src.monitoring import REGISTRY
+from .sources import YahooFinanceSource
+from .validation import allows_zero_volume, validate_prices
+
+STAGE_TIME = REGISTRY.histogram('loader_stage_seconds',
+                                'Time spent in each stage of a stock load')
+LOADS = REGISTRY.counter('loader_loads_total', 'Stock loads by result')
+ROWS = REGISTRY.counter('loader_rows_total', 'Downloaded price rows by validation outcome')
+
+def normalize_history(df):
+    """Flatten yfinance's per-ticker column index and replace spaces in column names"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.columns = df.columns.str.replace(' ', '_')
+    return df
+
+def price_rows(df, stock_key):
+    """Build fact rows from a normalized yfinance frame"""
+    adj_close = df['Adj_Close'] if 'Adj_Close' in df else df['Close']
+    return list(zip(
+        df.index.strftime('%Y%m%d').astype(int).tolist(),
+        [stock_key] * len(df),
+        df['Open'].astype(float).tolist(), df['High'].astype(float).tolist(),
+        df['Low'].astype(float).tolist(), df['Close'].astype(float).tolist(),
+        adj_close.astype(float).tolist(), df['Volume'].astype('int64').tolist()
+    ))
+
+def reject_rows(rejects, stock_key):
+    """Build quarantine rows, keeping missing values as NULL"""
+    adj_close = rejects['Adj_Close'] if 'Adj_Close' in rejects else rejects['Close']
+    frame = pd.DataFrame({
+        'date_key': rejects.index.strftime('%Y%m%d').astype(int),
+        'stock_key': stock_key,
+        'open': rejects['Open'], 'high': rejects['High'],
+        'low': rejects['Low'], 'close': rejects['Close'],
+        'adj_close': adj_close, 'volume': rejects['Volume'],
+        'reason': rejects['reason'],
+    }).astype(object)
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
 
 class StockDataLoader:
-    def __init__(self, warehouse):
+    def __init__(self, warehouse, journal=None, on_ingest=None, source=None):
         self.warehouse = warehouse
+        self.journal = journal
+        self.source = source or YahooFinanceSource()
+        # Called with the symbol after each successful load, e.g. to publish a snapshot
+        self.on_ingest = on_ingest
+        self.last_quality = None
+        self._intraday = None
+    
+    @property
+    def intraday(self):
+        """Intraday partition store, created on first use"""
+        if self._intraday is None:
+            self._intraday = IntradayStore(self.warehouse)
+        return self._intraday
     
     def add_stock_with_data(self, symbol, days=180):
         """Add stock and load historical data"""
+        success, message = self._add_stock_with_data(symbol, days)
+        LOADS.inc(result='success' if success else 'failure')
+        if success and self.on_ingest:
+            self.on_ingest(symbol.upper())
+        return success, message
+    
+    def _add_stock_with_data(self, symbol, days):
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            with STAGE_TIME.time(stage='fetch_info'):
+                info = self.source.info(symbol)
             
             # Add to dimension table
             stock_key = self.warehouse.add_stock(
@@ -27,35 +87,87 @@ class StockDataLoader:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            df = yf.download(symbol, start=start_date, end=end_date, progress=False)
+            # Keep raw prices; splits and dividends are recorded separately
+            with STAGE_TIME.time(stage='download'):
+                df = self.source.history(symbol, start_date, end_date)
             
             if df.empty:
                 return False, "No data available for this symbol"
             
-            # Flatten multi-index columns if present
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            
-            # Normalize column names
-            df.columns = df.columns.str.replace(' ', '_')
+            df = normalize_history(df)
+            actions = actions_from_history(df)
+            # Splits and dividends for query-time adjustment, committed with the prices
+            actions = list(zip([stock_key] * len(actions), actions['date_key'].tolist(),
+                               actions['action_type'].tolist(), actions['value'].tolist()))
             
             # Populate date dimension
-            self.warehouse.populate_date_dimension(start_date, end_date)
+            with STAGE_TIME.time(stage='date_dimension'):
+                self.warehouse.populate_date_dimension(start_date, end_date)
             
-            # Insert price facts
-            for date, row in df.iterrows():
-                date_key = int(date.strftime('%Y%m%d'))
-                
-                # Get adj close with fallback
-                adj_close = row.get('Adj_Close', row.get('Close', 0))
+            # Quarantine bad rows before anything reaches the fact table
+            with STAGE_TIME.time(stage='validate'):
+                df, rejects, self.last_quality = validate_prices(
+                    df, allow_zero_volume=allows_zero_volume(symbol))
+                if len(rejects):
+                    self.warehouse.insert_price_rejects(reject_rows(rejects, stock_key))
+            ROWS.inc(len(df), outcome='accepted')
+            ROWS.inc(len(rejects), outcome='rejected')
+            if df.empty:
+                return False, "No valid price data for this symbol"
+            
+            # Insert price facts and actions in one transaction, through the journal if configured
+            with STAGE_TIME.time(stage='insert'):
+                rows = price_rows(df, stock_key)
                 
-                self.warehouse.insert_stock_price(
-                    date_key, stock_key,
-                    float(row['Open']), float(row['High']), float(row['Low']),
-                    float(row['Close']), float(adj_close), int(row['Volume'])
-                )
+                if self.journal:
+                    self.journal.apply(self.warehouse, self.journal.append(symbol, rows, actions))
+                else:
+                    self.warehouse.insert_stock_prices(rows, actions=actions)
             
+            if len(rejects):
+                return True, f"Stock data loaded successfully ({len(rejects)} rows quarantined)"
             return True, "Stock data loaded successfully"
             
         except Exception as e:
-            return False, f"Error: {str(e)}"
\ No newline at end of file
+            return False, f"Error: {str(e)}"
+    
+    def add_intraday_data(self, symbol, interval='1m', period='5d'):
+        """Load intraday bars into the monthly partitions"""
+        try:
+            if interval not in INTERVAL_MINUTES:
+                return False, f"Unsupported interval: {interval}"
+            
+            stock_key = self.warehouse.get_stock_by_symbol(symbol)
+            if not stock_key:
+                ok, message = self.add_stock_with_data(symbol)
+                if not ok:
+                    return False, message
+                stock_key = self.warehouse.get_stock_by_symbol(symbol)
+            
+            df = self.source.intraday(symbol, interval, period)
+            
+            if df.empty:
+                return False, "No intraday data available for this symbol"
+            
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+            df = df.dropna(subset=['Open', 'High', 'Low', 'Close'])
+            
+            index = df.index
+            index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+            ts = (index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+            
+            bars = zip(
+                ts.tolist(),
+                df['Open'].astype(float).tolist(), df['High'].astype(float).tolist(),
+                df['Low'].astype(float).tolist(), df['Close'].astype(float).tolist(),
+                df['Volume'].fillna(0).astype('int64').tolist()
+            )
+            count = self.intraday.insert_bars(stock_key, INTERVAL_MINUTES[interval], bars)
+            if self.on_ingest:
+                self.on_ingest(symbol.upper())
+            
+            return True, f"Loaded {count} {interval} bars"
+            
+        except Exception as e:
+            return False, f"Error: {str(e)}"
@@ -0,0 +1,99 @@
+import time
+from fnmatch import fnmatchcase
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Open/close may sit a hair outside high/low after the vendor's float rounding
+RANGE_TOLERANCE = 1e-6
+
+# Reason codes in priority order; a rejected row records the first that applies
+MISSING_PRICE = 'missing_price'
+NONPOSITIVE_PRICE = 'nonpositive_price'
+MISSING_VOLUME = 'missing_volume'
+ZERO_VOLUME = 'zero_volume'
+HIGH_BELOW_LOW = 'high_below_low'
+OUTSIDE_RANGE = 'outside_high_low'
+DUPLICATE_DATE = 'duplicate_date'
+OUTLIER_SPIKE = 'outlier_spike'
+# Set by the bulk importer, which needs each symbol's bars in date order
+OUT_OF_ORDER = 'out_of_order'
+
+# Symbols that trade without reported volume, in Yahoo Finance notation: FX pairs
+# (EURUSD=X), indices (^GSPC) and mutual funds (five letters ending in X, VFIAX)
+ZERO_VOLUME_SYMBOLS = ('*=X', '^*', '????X')
+
+
+def allows_zero_volume(symbol, patterns=ZERO_VOLUME_SYMBOLS):
+    """Whether a symbol's zero-volume bars are genuine rather than bad data"""
+    return any(fnmatchcase(symbol.upper(), pattern) for pattern in patterns)
+
+
+def validate_prices(df, spike_threshold=0.5, groups=None, allow_zero_volume=False):
+    """Split a normalized yfinance frame into clean rows and quarantined rejects
+
+    All checks are whole-column operations. A spike is a close that moves
+    more than `spike_threshold` from both neighbours in the same direction,
+    so genuine level shifts such as unadjusted splits are kept.
+    `groups` labels each row with its symbol when one frame holds several,
+    sorted by symbol and then date; duplicates and neighbours are then only
+    looked for within a symbol. `allow_zero_volume`, a bool or one per row,
+    accepts zero-volume bars, as for instruments allows_zero_volume names.
+    Returns (clean, rejects, metrics) where rejects carries a `reason` column.
+    """
+    started = time.perf_counter()
+    prices = df[PRICE_COLUMNS].astype(float)
+    volume = df['Volume'].astype(float)
+    reason = np.full(len(df), '', dtype=object)
+
+    def flag(mask, code):
+        mask = np.asarray(mask, dtype=bool)
+        reason[mask & (reason == '')] = code
+
+    flag(prices.isna().any(axis=1), MISSING_PRICE)
+    flag((prices <= 0).any(axis=1), NONPOSITIVE_PRICE)
+    flag(volume.isna(), MISSING_VOLUME)
+    flag((volume == 0) & ~np.asarray(allow_zero_volume, dtype=bool), ZERO_VOLUME)
+    flag(prices['High'] < prices['Low'], HIGH_BELOW_LOW)
+    body_high = prices[['Open', 'Close']].max(axis=1)
+    body_low = prices[['Open', 'Close']].min(axis=1)
+    flag((body_high > prices['High'] * (1 + RANGE_TOLERANCE))
+         | (body_low < prices['Low'] * (1 - RANGE_TOLERANCE)), OUTSIDE_RANGE)
+    if groups is None:
+        flag(df.index.duplicated(keep='last'), DUPLICATE_DATE)
+    else:
+        groups = np.asarray(groups)
+        flag(pd.MultiIndex.from_arrays([groups, df.index]).duplicated(keep='last'), DUPLICATE_DATE)
+
+    # Spikes are judged against neighbours that passed every other check
+    valid_pos = np.flatnonzero(reason == '')
+    close = prices['Close'].to_numpy()[valid_pos]
+    prev_close = np.r_[np.nan, close[:-1]]
+    next_close = np.r_[close[1:], np.nan]
+    if groups is not None:
+        same = groups[valid_pos][1:] == groups[valid_pos][:-1]
+        prev_close[1:][~same] = np.nan
+        next_close[:-1][~same] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        move_prev = close / prev_close - 1
+        move_next = close / next_close - 1
+    spike = ((np.abs(move_prev) > spike_threshold) & (np.abs(move_next) > spike_threshold)
+             & (np.sign(move_prev) == np.sign(move_next)))
+    spike_mask = np.zeros(len(df), dtype=bool)
+    spike_mask[valid_pos[spike]] = True
+    flag(spike_mask, OUTLIER_SPIKE)
+
+    rejected = reason != ''
+    clean = df[~rejected]
+    rejects = df[rejected].copy()
+    rejects['reason'] = reason[rejected]
+
+    counts = pd.Series(reason[rejected]).value_counts()
+    metrics = {
+        'rows': len(df),
+        'accepted': len(clean),
+        'rejected': int(rejected.sum()),
+        'reasons': {code: int(count) for code, count in counts.items()},
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+    return clean, rejects, metrics
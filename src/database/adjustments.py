@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+SPLIT = 'split'
+DIVIDEND = 'dividend'
+ACTION_TYPES = (SPLIT, DIVIDEND)
+
+PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price']
+
+
+def compute_adjustment_factors(prices, actions):
+    """Compute cumulative price and volume adjustment factors for each bar
+
+    `prices` must be sorted by date_key and carry a close_price column,
+    `actions` holds date_key (the ex-date), action_type and value rows.
+    A bar is adjusted by every action whose ex-date is after the bar.
+    """
+    n = len(prices)
+    if n == 0 or actions is None or len(actions) == 0:
+        return np.ones(n), np.ones(n)
+
+    actions = actions.sort_values('date_key')
+    bar_keys = prices['date_key'].to_numpy()
+    closes = prices['close_price'].to_numpy(dtype=float)
+    ex_keys = actions['date_key'].to_numpy()
+    values = actions['value'].to_numpy(dtype=float)
+    is_split = (actions['action_type'] == SPLIT).to_numpy()
+
+    # The last close before the ex-date is the reference for dividends
+    pos = np.searchsorted(bar_keys, ex_keys, side='left')
+    prev_close = closes[np.clip(pos - 1, 0, n - 1)]
+    valid = pos > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        split_factor = np.where(is_split & (values > 0), 1.0 / values, 1.0)
+        div_factor = np.where(~is_split & valid & (prev_close > 0),
+                              1.0 - values / prev_close, 1.0)
+    price_factor = split_factor * div_factor
+
+    # Suffix products: factor for actions j.. applies to bars before ex_keys[j]
+    price_suffix = np.append(np.cumprod(price_factor[::-1])[::-1], 1.0)
+    split_suffix = np.append(np.cumprod(split_factor[::-1])[::-1], 1.0)
+
+    first_later = np.searchsorted(ex_keys, bar_keys, side='right')
+    return price_suffix[first_later], split_suffix[first_later]
+
+
+def apply_adjustments(prices, actions):
+    """Return a copy of `prices` with split and dividend adjustments applied"""
+    adjusted = prices.copy()
+    price_factor, split_factor = compute_adjustment_factors(prices, actions)
+    for column in PRICE_COLUMNS:
+        if column in adjusted:
+            adjusted[column] = adjusted[column] * price_factor
+    if 'volume' in adjusted:
+        adjusted['volume'] = (adjusted['volume'] / split_factor).round().astype('int64')
+    adjusted['adjustment_factor'] = price_factor
+    return adjusted
+
+
+def adjust_rows(rows, actions, digits=4):
+    """(date_key, close_price, volume) rows, oldest first, in split and dividend adjusted terms
+
+    `actions` are (date_key, action_type, value) rows. Adjusted closes are
+    rounded to `digits` places; bars no action reaches are returned as stored.
+    """
+    if not rows or not actions:
+        return rows
+    prices = pd.DataFrame(rows, columns=['date_key', 'close_price', 'volume'])
+    price_factor, split_factor = compute_adjustment_factors(
+        prices, pd.DataFrame(actions, columns=['date_key', 'action_type', 'value']))
+    return [
+        (date_key,
+         close if close is None or price == 1 else round(close * price, digits),
+         volume if volume is None or split == 1 else int(round(volume / split)))
+        for (date_key, close, volume), price, split in zip(rows, price_factor.tolist(),
+                                                           split_factor.tolist())
+    ]
+
+
+def actions_from_history(df):
+    """Extract split and dividend rows from a yfinance history frame"""
+    rows = []
+    if 'Stock_Splits' in df:
+        splits = df['Stock_Splits']
+        for date, ratio in splits[splits.fillna(0) > 0].items():
+            rows.append((int(date.strftime('%Y%m%d')), SPLIT, float(ratio)))
+    if 'Dividends' in df:
+        dividends = df['Dividends']
+        for date, amount in dividends[dividends.fillna(0) > 0].items():
+            rows.append((int(date.strftime('%Y%m%d')), DIVIDEND, float(amount)))
+    return pd.DataFrame(rows, columns=['date_key', 'action_type', 'value'])
@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+from src.monitoring import REGISTRY
+from .adjustments import compute_adjustment_factors
+from .dimensions import date_of
+
+EVALUATE_TIME = REGISTRY.histogram('alert_evaluation_seconds', 'Time spent evaluating alert rules')
+TRIGGERED = REGISTRY.counter('alerts_triggered_total', 'Alerts recorded by rule type')
+
+CROSS_ABOVE_SMA = 'cross_above_sma'
+CROSS_BELOW_SMA = 'cross_below_sma'
+GAP_UP = 'gap_up'
+GAP_DOWN = 'gap_down'
+NEW_HIGH = 'new_high'
+
+# Rule type -> default lookback in bars; gaps only compare with the previous close
+RULE_TYPES = {
+    CROSS_ABOVE_SMA: 50,
+    CROSS_BELOW_SMA: 50,
+    GAP_UP: 1,
+    GAP_DOWN: 1,
+    NEW_HIGH: 252,
+}
+GAP_TYPES = (GAP_UP, GAP_DOWN)
+SMA_TYPES = (CROSS_ABOVE_SMA, CROSS_BELOW_SMA)
+
+
+def _scope(warehouse, rules):
+    """Stage (stock_key, trailing bars needed) for every stock with rules in a temp table"""
+    trailing = rules.assign(need=rules['lookback'].where(~rules['rule_type'].isin(GAP_TYPES), 1))
+    trailing = trailing.groupby('stock_key')['need'].max()
+    conn = warehouse.conn
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS alert_scope (
+            stock_key INTEGER PRIMARY KEY,
+            trailing INTEGER
+        )
+    ''')
+    conn.execute('DELETE FROM temp.alert_scope')
+    conn.executemany('INSERT INTO temp.alert_scope VALUES (?, ?)',
+                     zip(trailing.index.tolist(), trailing.tolist()))
+
+
+def _load_bars(warehouse):
+    """New bars since each stock's watermark plus the trailing bars its rules look back over
+
+    Trailing windows continue into the archives when the hot table is too
+    short, as analytics windows do, and prices are adjusted for splits and
+    dividends so a corporate action is not mistaken for a move. Returns a
+    float array of (stock_key, date_key, open, high, close, is_new) rows
+    sorted by stock_key and date_key.
+    """
+    conn = warehouse.conn
+    rows = []
+    # OFFSET cannot refer to the outer row, so stocks are read per distinct trailing length;
+    # each stock's cutoff is then an index seek, like the batch analytics query
+    for (trailing,) in conn.execute('SELECT DISTINCT trailing FROM temp.alert_scope').fetchall():
+        rows += conn.execute('''
+            WITH scope AS (
+                SELECT s.stock_key, COALESCE(w.date_key, 0) AS watermark
+                FROM temp.alert_scope s
+                LEFT JOIN alert_watermarks w ON w.stock_key = s.stock_key
+                WHERE s.trailing = ?
+            )
+            SELECT f.stock_key, f.date_key, f.open_price, f.high_price, f.close_price,
+                   f.date_key > scope.watermark
+            FROM scope
+            JOIN fact_stock_prices f ON f.stock_key = scope.stock_key AND f.date_key >= COALESCE((
+                SELECT f2.date_key FROM fact_stock_prices f2
+                WHERE f2.stock_key = scope.stock_key AND f2.date_key <= scope.watermark
+                ORDER BY f2.date_key DESC
+                LIMIT 1 OFFSET ?
+            ), 0)
+            WHERE EXISTS (
+                SELECT 1 FROM fact_stock_prices f3
+                WHERE f3.stock_key = scope.stock_key AND f3.date_key > scope.watermark
+            )
+        ''', (trailing, trailing - 1)).fetchall()
+    bars = np.array(rows, dtype=float).reshape(-1, 6)
+    bars = bars[np.lexsort((bars[:, 1], bars[:, 0]))]
+    if len(bars) and warehouse.archives.partitions():
+        bars = np.concatenate([_archived_bars(warehouse, bars), bars])
+        bars = bars[np.lexsort((bars[:, 1], bars[:, 0]))]
+    return _adjust_bars(warehouse, bars)
+
+
+def _adjust_bars(warehouse, bars):
+    """Scale open, high and close by each stock's split and dividend factors, in place"""
+    if len(bars) == 0:
+        return bars
+    stock_keys, first = np.unique(bars[:, 0], return_index=True)
+    actions = warehouse.get_corporate_actions_many(stock_keys.astype(int).tolist())
+    ends = np.append(first[1:], len(bars))
+    for stock_key, start, end in zip(stock_keys.astype(int).tolist(), first.tolist(), ends.tolist()):
+        if stock_key not in actions:
+            continue
+        prices = pd.DataFrame({'date_key': bars[start:end, 1].astype(np.int64),
+                               'close_price': bars[start:end, 4]})
+        factor, _ = compute_adjustment_factors(
+            prices, pd.DataFrame(actions[stock_key], columns=['date_key', 'action_type', 'value']))
+        bars[start:end, 2:5] *= factor[:, None]
+    return bars
+
+
+def _archived_bars(warehouse, bars):
+    """Archived bars completing the trailing windows the hot table could not fill"""
+    scope = {stock_key: (trailing, watermark) for stock_key, trailing, watermark in
+             warehouse.conn.execute('''
+                 SELECT s.stock_key, s.trailing, COALESCE(w.date_key, 0)
+                 FROM temp.alert_scope s
+                 LEFT JOIN alert_watermarks w ON w.stock_key = s.stock_key
+             ''')}
+    stock_keys, first = np.unique(bars[:, 0], return_index=True)
+    held = np.add.reduceat(1 - bars[:, 5], first)
+    rows = []
+    for stock_key, start, have in zip(stock_keys.astype(int).tolist(), first.tolist(),
+                                      held.astype(int).tolist()):
+        trailing, watermark = scope[stock_key]
+        if have >= trailing:
+            continue
+        older = warehouse.archives.recent_rows(stock_key, 'open_price, high_price, close_price',
+                                               trailing - have, int(bars[start, 1]))
+        rows += [(stock_key, date_key, open_price, high, close, date_key > watermark)
+                 for date_key, open_price, high, close in older]
+    return np.array(rows, dtype=float).reshape(-1, 6)
+
+
+def _window(values, starts, ends, ufunc):
+    """ufunc reduction of values[start:end] for each (start, end) pair, in one C loop"""
+    if len(starts) == 0:
+        return np.empty(0)
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    # reduceat needs every bound inside the array, including ends one past the last bar
+    return ufunc.reduceat(np.append(values, 0.0), bounds)[0::2]
+
+
+def new_bar_features(bars, rules):
+    """Frame of the new bars with the previous close and each trailing feature the rules use
+
+    Features are computed only at new bars, over windows of the earlier
+    bars of the same stock; a window reaching before the stock's first bar
+    gives NaN.
+    """
+    stock_key, close, high = bars[:, 0], bars[:, 4], bars[:, 3]
+    index = np.arange(len(bars))
+    first = np.r_[True, stock_key[1:] != stock_key[:-1]]
+    position = index - np.maximum.accumulate(np.where(first, index, 0))
+    at = np.flatnonzero(bars[:, 5])
+    history = position[at]
+
+    def valid(bars_needed, values):
+        return np.where(history >= bars_needed, values, np.nan)
+
+    features = pd.DataFrame({
+        'stock_key': stock_key[at].astype(np.int64),
+        'date_key': bars[at, 1].astype(np.int64),
+        'open': bars[at, 2],
+        'high': high[at],
+        'close': close[at],
+        'prev_close': valid(1, close[np.maximum(at - 1, 0)]),
+    })
+    for lookback in sorted(set(rules.loc[rules['rule_type'].isin(SMA_TYPES), 'lookback'])):
+        start = np.maximum(at - lookback, 0)
+        features[f'sma_{lookback}'] = valid(
+            lookback - 1, _window(close, np.maximum(at + 1 - lookback, 0), at + 1, np.add) / lookback)
+        features[f'prev_sma_{lookback}'] = valid(
+            lookback, _window(close, start, np.maximum(at, start + 1), np.add) / lookback)
+    for lookback in sorted(set(rules.loc[rules['rule_type'] == NEW_HIGH, 'lookback'])):
+        start = np.maximum(at - lookback, 0)
+        features[f'prior_high_{lookback}'] = valid(
+            lookback, _window(high, start, np.maximum(at, start + 1), np.maximum))
+    return features
+
+
+def evaluate_rules(bars, rules):
+    """Vectorized rule evaluation over new bars carrying their trailing features
+
+    Every rule is checked against each new bar of its stock at once, one
+    numpy comparison per (rule type, lookback). Returns a frame of
+    triggered (rule_key, stock_key, date_key, rule_type, value) rows.
+    """
+    candidates = rules.merge(bars, on='stock_key')
+    hits = []
+    for (rule_type, lookback), group in candidates.groupby(['rule_type', 'lookback'], sort=False):
+        close = group['close'].to_numpy(dtype=float)
+        prev_close = group['prev_close'].to_numpy(dtype=float)
+        if rule_type in GAP_TYPES:
+            value = (group['open'].to_numpy(dtype=float) / prev_close - 1) * 100
+            threshold = group['threshold'].to_numpy(dtype=float)
+            hit = value >= threshold if rule_type == GAP_UP else value <= -threshold
+        elif rule_type == NEW_HIGH:
+            value = group['high'].to_numpy(dtype=float)
+            hit = value > group[f'prior_high_{lookback}'].to_numpy(dtype=float)
+        else:
+            sma = group[f'sma_{lookback}'].to_numpy(dtype=float)
+            prev_sma = group[f'prev_sma_{lookback}'].to_numpy(dtype=float)
+            value = close
+            if rule_type == CROSS_ABOVE_SMA:
+                hit = (prev_close <= prev_sma) & (close > sma)
+            else:
+                hit = (prev_close >= prev_sma) & (close < sma)
+        # Comparisons with NaN (too little history) are False, so those bars never trigger
+        hits.append(group.loc[hit, ['rule_key', 'stock_key', 'date_key', 'rule_type']]
+                    .assign(value=np.round(value[hit], 4)))
+    if not hits:
+        return pd.DataFrame(columns=['rule_key', 'stock_key', 'date_key', 'rule_type', 'value'])
+    return pd.concat(hits, ignore_index=True)
+
+
+def evaluate_alerts(warehouse, symbols=None):
+    """Evaluate alert rules on the bars ingested since the last evaluation and record hits
+
+    Covers the stocks for `symbols`, or every stock with rules. All their
+    rules are checked in one pass over the new bars plus the trailing window
+    the longest rule needs; each stock's watermark then moves to its newest
+    bar so the next run only sees what was loaded after this one. Returns
+    the triggered alerts.
+    """
+    with EVALUATE_TIME.time():
+        conn = warehouse.conn
+        rules = pd.DataFrame(conn.execute(
+            'SELECT rule_key, stock_key, rule_type, lookback, threshold FROM alert_rules'
+        ).fetchall(), columns=['rule_key', 'stock_key', 'rule_type', 'lookback', 'threshold'])
+        if symbols is not None:
+            stock_keys = {warehouse.dimensions.stock_key(symbol) for symbol in symbols}
+            rules = rules[rules['stock_key'].isin(stock_keys)]
+        if rules.empty:
+            return []
+
+        _scope(warehouse, rules)
+        bars = _load_bars(warehouse)
+        if len(bars) == 0:
+            return []
+        new_bars = new_bar_features(bars, rules)
+        triggered = evaluate_rules(new_bars, rules)
+
+        conn.executemany('''
+            INSERT OR IGNORE INTO fact_alerts (rule_key, stock_key, date_key, value)
+            VALUES (?, ?, ?, ?)
+        ''', triggered[['rule_key', 'stock_key', 'date_key', 'value']].itertuples(index=False))
+        watermarks = new_bars.groupby('stock_key')['date_key'].max()
+        conn.executemany('INSERT OR REPLACE INTO alert_watermarks (stock_key, date_key) VALUES (?, ?)',
+                         zip(watermarks.index.tolist(), watermarks.tolist()))
+        conn.commit()
+
+    symbol = warehouse.dimensions.symbol
+    alerts = []
+    for rule_key, stock_key, date_key, rule_type, value in triggered.itertuples(index=False):
+        TRIGGERED.inc(rule_type=rule_type)
+        alerts.append({'rule_key': int(rule_key), 'symbol': symbol(stock_key),
+                       'rule_type': rule_type, 'date': date_of(int(date_key)),
+                       'value': float(value)})
+    return alerts
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+
+# Prices are stored as integer ticks of 1/10000 of a currency unit
+PRICE_SCALE = 10000
+COMPACT_TABLE = 'fact_stock_prices_compact'
+PRICE_FIELDS = ['open', 'high', 'low', 'close', 'adj_close']
+
+
+def _encode(expr):
+    return f'CAST(ROUND({expr} * {PRICE_SCALE}) AS INTEGER)'
+
+
+def is_compact(conn):
+    """True when fact_stock_prices is the decoding view over the compact table"""
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'fact_stock_prices'"
+    ).fetchone()
+    return row is not None and row[0] == 'view'
+
+
+def create_compact_layout(conn):
+    """Create the WITHOUT ROWID tick table plus a view that decodes it
+
+    The view keeps the name and columns of fact_stock_prices, and INSTEAD OF
+    triggers route inserts and deletes to the compact table, so every read
+    and write path works unchanged on either layout.
+    """
+    tick_columns = ',\n'.join(f'                {field}_ticks INTEGER' for field in PRICE_FIELDS)
+    decoded = ',\n'.join(
+        f'                   {field}_ticks / {PRICE_SCALE}.0 AS {field}_price' for field in PRICE_FIELDS
+    )
+    encoded = ', '.join(_encode(f'NEW.{field}_price') for field in PRICE_FIELDS)
+
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {COMPACT_TABLE} (
+                stock_key INTEGER,
+                date_key INTEGER,
+{tick_columns},
+                volume INTEGER,
+                PRIMARY KEY (stock_key, date_key)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE VIEW IF NOT EXISTS fact_stock_prices AS
+            SELECT stock_key, date_key,
+{decoded},
+                   volume
+            FROM {COMPACT_TABLE}
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS fact_stock_prices_insert
+        INSTEAD OF INSERT ON fact_stock_prices
+        BEGIN
+            INSERT OR REPLACE INTO {COMPACT_TABLE}
+            (stock_key, date_key, {', '.join(f'{field}_ticks' for field in PRICE_FIELDS)}, volume)
+            VALUES (NEW.stock_key, NEW.date_key, {encoded}, NEW.volume);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS fact_stock_prices_delete
+        INSTEAD OF DELETE ON fact_stock_prices
+        BEGIN
+            DELETE FROM {COMPACT_TABLE}
+            WHERE stock_key = OLD.stock_key AND date_key = OLD.date_key;
+        END
+    ''')
+
+
+def migrate_to_compact(conn):
+    """Convert a row-layout fact_stock_prices table into the compact layout
+
+    Duplicate (stock_key, date_key) rows collapse to the most recently
+    inserted one. Returns the number of rows in the compact table.
+    """
+    if is_compact(conn):
+        return conn.execute(f'SELECT COUNT(*) FROM {COMPACT_TABLE}').fetchone()[0]
+
+    conn.commit()
+    conn.execute('BEGIN')
+    try:
+        conn.execute('ALTER TABLE fact_stock_prices RENAME TO fact_stock_prices_rows')
+        create_compact_layout(conn)
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {COMPACT_TABLE}
+            SELECT stock_key, date_key,
+                   {', '.join(_encode(f'{field}_price') for field in PRICE_FIELDS)},
+                   volume
+            FROM fact_stock_prices_rows
+            ORDER BY fact_key
+        ''')
+        conn.execute('DROP TABLE fact_stock_prices_rows')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    conn.execute('VACUUM')
+    return conn.execute(f'SELECT COUNT(*) FROM {COMPACT_TABLE}').fetchone()[0]
+
+
+def storage_report(conn, db_path=None):
+    """Report on-disk bytes per fact row and how much of the fact b-tree fits in cache
+
+    sqlite3 does not expose the pager's hit/miss counters, so the cache
+    figure is the share of fact pages the configured page cache can hold,
+    which is the hit rate a uniform random read workload converges to.
+    """
+    table = COMPACT_TABLE if is_compact(conn) else 'fact_stock_prices'
+    rows = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+
+    try:
+        names = [table] + [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,)
+        )]
+        placeholders = ', '.join('?' for _ in names)
+        fact_bytes, fact_pages = conn.execute(
+            f'SELECT COALESCE(SUM(pgsize), 0), COUNT(*) FROM dbstat WHERE name IN ({placeholders})',
+            names
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # dbstat is optional; fall back to the whole file
+        fact_pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        fact_bytes = fact_pages * page_size
+
+    cache_size = conn.execute('PRAGMA cache_size').fetchone()[0]
+    cache_pages = -cache_size * 1024 // page_size if cache_size < 0 else cache_size
+
+    return {
+        'layout': 'compact' if table == COMPACT_TABLE else 'rows',
+        'rows': rows,
+        'fact_bytes': fact_bytes,
+        'bytes_per_row': round(fact_bytes / rows, 1) if rows else 0,
+        'file_bytes': os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None,
+        'cache_pages': cache_pages,
+        'cache_hit_rate': round(min(1.0, cache_pages / fact_pages), 3) if fact_pages else 1.0,
+    }
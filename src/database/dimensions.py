@@ -0,0 +1,121 @@
+import threading
+
+
+def date_key_of(date):
+    """Turn a 'YYYY-MM-DD' string, date or datetime into its YYYYMMDD date_key; date_keys pass through"""
+    if isinstance(date, int):
+        return date
+    if isinstance(date, str):
+        return int(date[:10].replace('-', ''))
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def date_of(date_key):
+    """Turn a YYYYMMDD date_key into the 'YYYY-MM-DD' string stored in dim_date"""
+    return f'{date_key // 10000:04d}-{date_key // 100 % 100:02d}-{date_key % 100:02d}'
+
+
+class DimensionCache:
+    """In-memory symbol <-> stock_key and date <-> date_key maps for one warehouse
+
+    Both maps load from the database on first use and are kept current by the
+    warehouse as it inserts dimension rows. Lookups are plain dict reads;
+    loads and updates hold a lock so threads sharing a connection see whole maps.
+    Symbols and stock_keys missing from the cache are looked up once more in the
+    database, so stocks added by another process are picked up on first request.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.RLock()
+        self._stock_keys = None
+        self._symbols = None
+        self._dates = None
+        self._date_keys = None
+
+    def _stock_maps(self):
+        with self._lock:
+            if self._stock_keys is None:
+                rows = self.conn.execute('SELECT symbol, stock_key FROM dim_stock').fetchall()
+                self._symbols = {stock_key: symbol for symbol, stock_key in rows}
+                self._stock_keys = dict(rows)
+            return self._stock_keys, self._symbols
+
+    def _date_maps(self):
+        with self._lock:
+            if self._dates is None:
+                rows = self.conn.execute('SELECT date_key, date FROM dim_date').fetchall()
+                self._date_keys = {date: date_key for date_key, date in rows}
+                self._dates = dict(rows)
+            return self._dates, self._date_keys
+
+    def stock_key(self, symbol):
+        """Get the stock_key for a symbol, or None"""
+        stock_keys = self._stock_keys
+        if stock_keys is None:
+            stock_keys = self._stock_maps()[0]
+        symbol = symbol.upper()
+        stock_key = stock_keys.get(symbol)
+        if stock_key is None:
+            row = self.conn.execute(
+                'SELECT stock_key FROM dim_stock WHERE symbol = ?', (symbol,)
+            ).fetchone()
+            if row:
+                stock_key = row[0]
+                self.add_stock(symbol, stock_key)
+        return stock_key
+
+    def symbol(self, stock_key):
+        """Get the symbol for a stock_key, or None"""
+        symbols = self._symbols
+        if symbols is None:
+            symbols = self._stock_maps()[1]
+        symbol = symbols.get(stock_key)
+        if symbol is None:
+            row = self.conn.execute(
+                'SELECT symbol FROM dim_stock WHERE stock_key = ?', (stock_key,)
+            ).fetchone()
+            if row:
+                symbol = row[0]
+                self.add_stock(symbol, stock_key)
+        return symbol
+
+    def add_stock(self, symbol, stock_key):
+        """Record a dim_stock row; maps not loaded yet pick it up when they load"""
+        with self._lock:
+            if self._stock_keys is not None:
+                self._stock_keys[symbol.upper()] = stock_key
+                self._symbols[stock_key] = symbol.upper()
+
+    def date(self, date_key):
+        """Get the dim_date date string for a date_key"""
+        dates = self._dates
+        if dates is None:
+            dates = self._date_maps()[0]
+        date = dates.get(date_key)
+        return date if date is not None else date_of(date_key)
+
+    def date_key(self, date):
+        """Get the date_key for a date string, date or datetime"""
+        date_keys = self._date_keys
+        if date_keys is None:
+            date_keys = self._date_maps()[1]
+        if isinstance(date, str):
+            date_key = date_keys.get(date)
+            if date_key is not None:
+                return date_key
+        return date_key_of(date)
+
+    def add_dates(self, rows):
+        """Record (date_key, date) dim_date rows; maps not loaded yet pick them up when they load"""
+        with self._lock:
+            if self._dates is not None:
+                for date_key, date in rows:
+                    self._dates[date_key] = date
+                    self._date_keys[date] = date_key
+
+    def clear(self):
+        """Drop both maps so the next lookup reloads them"""
+        with self._lock:
+            self._stock_keys = self._symbols = None
+            self._dates = self._date_keys = None
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from itertools import groupby
+
+INTERVAL_MINUTES = {'1m': 1, '5m': 5}
+
+
+def to_timestamp_key(value):
+    """Convert a datetime (naive values are UTC) or epoch seconds to an integer key"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def month_key(ts):
+    """YYYYMM partition key for an epoch-seconds timestamp"""
+    moment = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return moment.year * 100 + moment.month
+
+
+def partition_name(key):
+    return f'fact_intraday_{key}'
+
+
+class IntradayStore:
+    """Intraday bars stored in one WITHOUT ROWID table per calendar month
+
+    Bars are keyed by (stock_key, interval_minutes, ts) where ts is epoch
+    seconds, so daily tables and indexes never see intraday volume and
+    range queries only open the months they cover.
+    """
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.conn = warehouse.conn
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS intraday_partitions (
+                month_key INTEGER PRIMARY KEY,
+                table_name TEXT UNIQUE
+            )
+        ''')
+        self.conn.commit()
+
+    def ensure_partition(self, key):
+        """Create the month table for `key` if it does not exist yet"""
+        name = partition_name(key)
+        self.conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                stock_key INTEGER,
+                interval_minutes INTEGER,
+                ts INTEGER,
+                open_price REAL,
+                high_price REAL,
+                low_price REAL,
+                close_price REAL,
+                volume INTEGER,
+                PRIMARY KEY (stock_key, interval_minutes, ts)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute(
+            'INSERT OR IGNORE INTO intraday_partitions (month_key, table_name) VALUES (?, ?)',
+            (key, name)
+        )
+        return name
+
+    def get_partitions(self, start_ts=None, end_ts=None):
+        """List existing partition month keys overlapping the range"""
+        query = 'SELECT month_key FROM intraday_partitions'
+        params = []
+        if start_ts is not None and end_ts is not None:
+            query += ' WHERE month_key BETWEEN ? AND ?'
+            params = [month_key(start_ts), month_key(end_ts)]
+        query += ' ORDER BY month_key'
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def insert_bars(self, stock_key, interval_minutes, bars):
+        """Bulk insert (ts, open, high, low, close, volume) bars in one transaction"""
+        bars = sorted(bars, key=lambda bar: bar[0])
+        count = 0
+        with self.conn:
+            for key, group in groupby(bars, key=lambda bar: month_key(bar[0])):
+                name = self.ensure_partition(key)
+                rows = [(stock_key, interval_minutes) + tuple(bar) for bar in group]
+                self.conn.executemany(f'''
+                    INSERT OR REPLACE INTO {name}
+                    (stock_key, interval_minutes, ts, open_price, high_price,
+                     low_price, close_price, volume)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                count += len(rows)
+        return count
+
+    def get_bars(self, symbol, start, end, interval='1m'):
+        """Get bars between start and end (inclusive) touching only covering partitions"""
+        stock_key = self.warehouse.get_stock_by_symbol(symbol)
+        if stock_key is None:
+            return []
+        start_ts, end_ts = to_timestamp_key(start), to_timestamp_key(end)
+        interval_minutes = INTERVAL_MINUTES[interval]
+
+        rows = []
+        for key in self.get_partitions(start_ts, end_ts):
+            rows.extend(self.conn.execute(f'''
+                SELECT ts, open_price, high_price, low_price, close_price, volume
+                FROM {partition_name(key)}
+                WHERE stock_key = ? AND interval_minutes = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts
+            ''', (stock_key, interval_minutes, start_ts, end_ts)))
+        return rows
@@ -0,0 +1,209 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from src.monitoring import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TASK_TIME = REGISTRY.histogram('maintenance_task_seconds', 'Time spent in maintenance tasks')
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+# Re-ANALYZE once a tenth of the rows changed since the last statistics
+ANALYZE_CHURN = 0.1
+# Reclaim free pages once they make up a tenth of the file
+FREE_PAGE_RATIO = 0.1
+# Rebuild with a full VACUUM (only when allowed) past this share of out-of-order pages
+FRAGMENTATION_RATIO = 0.3
+CHECKPOINT_WAL_BYTES = 16 * 1024 * 1024
+
+
+def fragmentation(conn):
+    """Share of b-tree leaf pages not stored right after their predecessor, or None without dbstat"""
+    try:
+        pages = conn.execute("SELECT name, path, pageno FROM dbstat WHERE pagetype = 'leaf'").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    pages.sort()
+    out_of_order = total = 0
+    previous_name = previous_page = None
+    for name, path, pageno in pages:
+        if name == previous_name:
+            total += 1
+            out_of_order += pageno != previous_page + 1
+        previous_name, previous_page = name, pageno
+    return round(out_of_order / total, 3) if total else 0.0
+
+
+def analyzed_rows(conn):
+    """Row count per table as of its last ANALYZE, empty if never analyzed"""
+    try:
+        stats = conn.execute('SELECT tbl, stat FROM sqlite_stat1').fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    rows = {}
+    for table, stat in stats:
+        rows[table] = max(rows.get(table, 0), int(stat.split()[0]))
+    return rows
+
+
+def stale_statistics(conn, rows_at_analyze):
+    """Largest relative drift between row counts now and at the last ANALYZE, or None"""
+    if not rows_at_analyze:
+        return None
+    drift = 0.0
+    for table, rows in rows_at_analyze.items():
+        try:
+            current = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        except sqlite3.OperationalError:
+            continue
+        drift = max(drift, abs(current - rows) / max(rows, 1))
+    return round(drift, 3)
+
+
+def database_stats(conn, db_path=None, detailed=False):
+    """File size, free pages and planner statistics for a database
+
+    Everything comes from pragmas and sqlite_stat1 row estimates, so a
+    scheduled pass stays cheap however large the tables are. `detailed`
+    adds fragmentation, from a scan of every page in dbstat, and the exact
+    statistics drift, from counting every analyzed table; both stay None
+    otherwise.
+    """
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    wal_path = f'{db_path}-wal' if db_path else None
+    rows_at_analyze = analyzed_rows(conn)
+    return {
+        'file_bytes': os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None,
+        'wal_bytes': os.path.getsize(wal_path) if wal_path and os.path.exists(wal_path) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist_count,
+        'free_ratio': round(freelist_count / page_count, 3) if page_count else 0.0,
+        'fragmentation': fragmentation(conn) if detailed else None,
+        'analyzed': bool(rows_at_analyze),
+        'analyzed_rows': sum(rows_at_analyze.values()),
+        'statistics_drift': stale_statistics(conn, rows_at_analyze) if detailed else None,
+        'auto_vacuum': AUTO_VACUUM_MODES[conn.execute('PRAGMA auto_vacuum').fetchone()[0]],
+        'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0],
+    }
+
+
+def plan_maintenance(stats, changes=0, full_vacuum=False, force=False):
+    """Pick the tasks the observed churn calls for, cheapest first
+
+    Without detailed stats, drift since the last ANALYZE is judged from
+    `changes` alone.
+    """
+    tasks = ['optimize']
+    drift = stats['statistics_drift']
+    rows = stats['analyzed_rows']
+    if (force or not stats['analyzed'] or (drift is not None and drift >= ANALYZE_CHURN)
+            or (rows and changes / rows >= ANALYZE_CHURN)):
+        tasks.append('analyze')
+    if full_vacuum and (force or stats['auto_vacuum'] != 'incremental'
+                        or stats['free_ratio'] >= FREE_PAGE_RATIO
+                        or (stats['fragmentation'] or 0) >= FRAGMENTATION_RATIO):
+        tasks.append('vacuum')
+    elif stats['auto_vacuum'] == 'incremental' and (force or stats['free_ratio'] >= FREE_PAGE_RATIO):
+        tasks.append('incremental_vacuum')
+    if stats['journal_mode'] == 'wal' and (force or stats['wal_bytes'] >= CHECKPOINT_WAL_BYTES):
+        tasks.append('checkpoint')
+    return tasks
+
+
+def run_task(conn, task):
+    if task == 'optimize':
+        conn.execute('PRAGMA optimize')
+    elif task == 'analyze':
+        # A full ANALYZE keeps sqlite_stat1 row counts exact, which the churn check relies on
+        conn.execute('ANALYZE')
+    elif task == 'incremental_vacuum':
+        # execute() steps the pragma once, freeing a single page; a script runs it to completion
+        conn.executescript('PRAGMA incremental_vacuum')
+    elif task == 'vacuum':
+        # A full rebuild also switches older files to incremental auto-vacuum
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    elif task == 'checkpoint':
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    conn.commit()
+
+
+def run_maintenance(db_path, changes=0, full_vacuum=False, force=False, detailed=False):
+    """Run the maintenance tasks a database needs and report before and after
+
+    Works on its own connection so it can run beside a live warehouse.
+    `changes` is the number of rows written since the last run, when known.
+    A full VACUUM locks the file for its duration, so it only runs with
+    full_vacuum=True; incremental vacuum and the rest are safe online.
+    `detailed` scans the tables for fragmentation and exact drift, as
+    database_stats describes; scheduled runs leave it off.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        before = database_stats(conn, db_path, detailed)
+        tasks = plan_maintenance(before, changes, full_vacuum, force)
+        seconds = {}
+        for task in tasks:
+            started = time.perf_counter()
+            with TASK_TIME.time(task=task):
+                run_task(conn, task)
+            seconds[task] = round(time.perf_counter() - started, 4)
+        after = database_stats(conn, db_path, detailed)
+    finally:
+        conn.close()
+    return {'tasks': tasks, 'seconds': seconds, 'before': before, 'after': after}
+
+
+class MaintenanceScheduler:
+    """Background thread running online maintenance for a warehouse every `interval` seconds
+
+    Every database file of the warehouse is maintained on its own, a sharded
+    warehouse's shards as well as its catalog. Churn is each file's
+    connection change count since the previous run. Full VACUUM is never
+    scheduled; run scripts/maintain_db.py --vacuum for that.
+    """
+
+    def __init__(self, warehouse, interval=3600):
+        self.warehouse = warehouse
+        self.interval = interval
+        self.last_report = None
+        self._last_changes = {path: conn.total_changes for path, conn in warehouse.database_files()}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """{path: report} for every database file of the warehouse"""
+        reports = {}
+        for path, conn in self.warehouse.database_files():
+            total_changes = conn.total_changes
+            reports[path] = run_maintenance(path, changes=total_changes - self._last_changes.get(path, 0))
+            self._last_changes[path] = total_changes
+        self.last_report = reports
+        return reports
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                for path, report in self.run_once().items():
+                    logger.info('Maintenance of %s ran %s', path, ', '.join(report['tasks']))
+            except sqlite3.Error:
+                logger.exception('Maintenance run failed')
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='warehouse-maintenance',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
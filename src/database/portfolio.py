@@ -0,0 +1,123 @@
+from src.monitoring import REGISTRY
+
+NAV_TIME = REGISTRY.histogram('portfolio_nav_update_seconds', 'Time spent updating portfolio NAV')
+NAV_DAYS = REGISTRY.counter('portfolio_nav_days_total', 'NAV days computed')
+
+# One statement values every held position on every trading day from :start on.
+# Positions are runs of constant quantity between a stock's trade dates and
+# split ex-dates; a split multiplies the shares held before it, and a trade on
+# the ex-date is already in post-split shares. A day without a bar for a
+# holding falls back to its last earlier close.
+NAV_QUERY = '''
+    WITH RECURSIVE trades AS (
+        SELECT stock_key, date_key, SUM(quantity) AS quantity, SUM(quantity * price) AS invested
+        FROM fact_transactions
+        WHERE portfolio_key = :portfolio
+        GROUP BY stock_key, date_key
+    ),
+    events AS (
+        SELECT stock_key, date_key FROM trades
+        UNION
+        SELECT stock_key, date_key FROM fact_corporate_actions
+        WHERE action_type = 'split' AND stock_key IN (SELECT stock_key FROM trades)
+    ),
+    steps AS (
+        SELECT e.stock_key, e.date_key, COALESCE(t.quantity, 0) AS quantity,
+               COALESCE(a.value, 1.0) AS ratio,
+               LEAD(e.date_key, 1, 99991232) OVER w AS to_key,
+               ROW_NUMBER() OVER w AS step
+        FROM events e
+        LEFT JOIN trades t ON t.stock_key = e.stock_key AND t.date_key = e.date_key
+        LEFT JOIN fact_corporate_actions a
+            ON a.stock_key = e.stock_key AND a.date_key = e.date_key AND a.action_type = 'split'
+        WINDOW w AS (PARTITION BY e.stock_key ORDER BY e.date_key)
+    ),
+    positions (stock_key, from_key, to_key, quantity, step) AS (
+        SELECT stock_key, date_key, to_key, quantity, step FROM steps WHERE step = 1
+        UNION ALL
+        SELECT s.stock_key, s.date_key, s.to_key, p.quantity * s.ratio + s.quantity, s.step
+        FROM positions p
+        JOIN steps s ON s.stock_key = p.stock_key AND s.step = p.step + 1
+    ),
+    days AS (
+        SELECT DISTINCT f.date_key
+        FROM (SELECT DISTINCT stock_key FROM trades) held
+        JOIN fact_stock_prices f ON f.stock_key = held.stock_key
+        WHERE f.date_key >= :start AND f.date_key >= (SELECT MIN(date_key) FROM trades)
+    )
+    SELECT :portfolio, d.date_key,
+           TOTAL(p.quantity * COALESCE(f.close_price, (
+               SELECT f2.close_price FROM fact_stock_prices f2
+               WHERE f2.stock_key = p.stock_key AND f2.date_key < d.date_key
+               ORDER BY f2.date_key DESC
+               LIMIT 1
+           ))),
+           (SELECT TOTAL(invested) FROM trades t WHERE t.date_key <= d.date_key),
+           COUNT(*),
+           COUNT(COALESCE(f.close_price, (
+               SELECT 1 FROM fact_stock_prices f3
+               WHERE f3.stock_key = p.stock_key AND f3.date_key < d.date_key
+               LIMIT 1
+           )))
+    FROM days d
+    JOIN positions p ON p.from_key <= d.date_key AND d.date_key < p.to_key AND p.quantity != 0
+    LEFT JOIN fact_stock_prices f ON f.stock_key = p.stock_key AND f.date_key = d.date_key
+    GROUP BY d.date_key
+'''
+
+
+def nav_start(conn, portfolio_key):
+    """First date_key whose stored NAV may be stale
+
+    That is the earliest of: the oldest trade or split ex-date recorded since
+    the last update, the last stored day (its bars may have been reloaded), and any day
+    valued while a holding had no price yet.
+    """
+    return conn.execute('''
+        SELECT MIN(
+            COALESCE(p.nav_dirty_from, 99991231),
+            COALESCE((SELECT MAX(date_key) FROM fact_portfolio_nav n
+                      WHERE n.portfolio_key = p.portfolio_key), 0),
+            COALESCE((SELECT MIN(date_key) FROM fact_portfolio_nav n
+                      WHERE n.portfolio_key = p.portfolio_key AND n.priced < n.positions), 99991231)
+        )
+        FROM dim_portfolio p
+        WHERE p.portfolio_key = ?
+    ''', (portfolio_key,)).fetchone()[0]
+
+
+def update_nav(warehouse, portfolio_keys=None, stock_keys=None, full=False):
+    """Bring stored daily NAV series up to date and return {portfolio_key: days written}
+
+    Refreshes `portfolio_keys`, the portfolios that ever traded `stock_keys`,
+    or every portfolio. Only days from nav_start() on are revalued, so after
+    a load or a trade this touches the new days rather than the whole
+    history; `full` recomputes everything.
+    """
+    conn = warehouse.conn
+    if portfolio_keys is None:
+        if stock_keys is not None:
+            placeholders = ', '.join('?' for _ in stock_keys)
+            portfolio_keys = [row[0] for row in conn.execute(f'''
+                SELECT DISTINCT portfolio_key FROM fact_transactions
+                WHERE stock_key IN ({placeholders})
+            ''', list(stock_keys))]
+        else:
+            portfolio_keys = [row[0] for row in conn.execute('SELECT portfolio_key FROM dim_portfolio')]
+
+    written = {}
+    with NAV_TIME.time():
+        for portfolio_key in portfolio_keys:
+            start = 0 if full else nav_start(conn, portfolio_key)
+            if start is None:
+                continue
+            with conn:
+                conn.execute('DELETE FROM fact_portfolio_nav WHERE portfolio_key = ? AND date_key >= ?',
+                             (portfolio_key, start))
+                cursor = conn.execute(f'INSERT INTO fact_portfolio_nav {NAV_QUERY}',
+                                      {'portfolio': portfolio_key, 'start': start})
+                conn.execute('UPDATE dim_portfolio SET nav_dirty_from = NULL WHERE portfolio_key = ?',
+                             (portfolio_key,))
+            written[portfolio_key] = cursor.rowcount
+            NAV_DAYS.inc(cursor.rowcount)
+    return written
@@ -0,0 +1,215 @@
+import os
+from datetime import datetime, timedelta
+from .dimensions import date_key_of
+
+# SQLite allows 10 attached databases by default; leave room for other ATTACH users
+MAX_ATTACHED_ARCHIVES = 6
+
+
+def archive_path(archive_dir, year):
+    return os.path.join(archive_dir, f'prices_{year}.db')
+
+
+def schema_name(year):
+    return f'archive_{year}'
+
+
+def retention_cutoff(horizon_days, today=None):
+    """date_key of the oldest day kept in the hot fact table"""
+    today = today or datetime.now()
+    return date_key_of(today - timedelta(days=horizon_days))
+
+
+class ArchiveSet:
+    """Read access to the per-year archive files listed in archive_partitions
+
+    Archives are attached only when a query runs past the oldest hot row, and
+    at most MAX_ATTACHED_ARCHIVES stay attached, least recently used first out.
+    The partition list is cached until another connection commits.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._partitions = None
+        self._data_version = None
+        self._attached = []
+
+    def partitions(self):
+        """(year, path, min_date_key, max_date_key) rows, newest year first
+
+        Rows left without bounds by an archive run that moved nothing are skipped.
+        """
+        data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if self._partitions is None or data_version != self._data_version:
+            self._partitions = self.conn.execute('''
+                SELECT year, path, min_date_key, max_date_key
+                FROM archive_partitions
+                WHERE min_date_key IS NOT NULL
+                ORDER BY year DESC
+            ''').fetchall()
+            self._data_version = data_version
+        return self._partitions
+
+    def invalidate(self):
+        """Forget the partition list after this connection changed it"""
+        self._partitions = None
+
+    def attach(self, year, path):
+        """Attach the archive for `year` if needed and return its schema name"""
+        name = schema_name(year)
+        if name in self._attached:
+            self._attached.remove(name)
+        else:
+            if len(self._attached) >= MAX_ATTACHED_ARCHIVES:
+                self.detach(self._attached[0])
+            # ATTACH is not allowed inside a transaction
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute('ATTACH DATABASE ? AS ' + name, (path,))
+        self._attached.append(name)
+        return name
+
+    def detach(self, name):
+        if name in self._attached:
+            self._attached.remove(name)
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute('DETACH DATABASE ' + name)
+
+    def detach_all(self):
+        for name in list(self._attached):
+            self.detach(name)
+
+    def recent_rows(self, stock_key, columns, limit, before=None):
+        """Up to `limit` (date_key, *columns) archived rows older than `before`, newest first"""
+        rows = []
+        for year, path, min_date_key, max_date_key in self.partitions():
+            if len(rows) >= limit:
+                break
+            if before is not None and min_date_key >= before:
+                continue
+            name = self.attach(year, path)
+            rows.extend(self.conn.execute(f'''
+                SELECT date_key, {columns}
+                FROM {name}.fact_stock_prices
+                WHERE stock_key = ? AND date_key < ?
+                ORDER BY date_key DESC
+                LIMIT ?
+            ''', (stock_key, before if before is not None else max_date_key + 1,
+                  limit - len(rows))).fetchall())
+        return rows
+
+    def range_rows(self, stock_key, columns, after, end, limit):
+        """Up to `limit` (date_key, *columns) archived rows with after < date_key <= end, oldest first"""
+        rows = []
+        for year, path, min_date_key, max_date_key in reversed(self.partitions()):
+            if len(rows) >= limit or min_date_key > end:
+                break
+            if max_date_key <= after:
+                continue
+            name = self.attach(year, path)
+            rows.extend(self.conn.execute(f'''
+                SELECT date_key, {columns}
+                FROM {name}.fact_stock_prices
+                WHERE stock_key = ? AND date_key > ? AND date_key <= ?
+                ORDER BY date_key
+                LIMIT ?
+            ''', (stock_key, rows[-1][0] if rows else after, end, limit - len(rows))).fetchall())
+        return rows
+
+
+def archive_history(warehouse, archive_dir, horizon_days, today=None):
+    """Move fact rows older than the horizon into per-year archive files
+
+    Each year is copied and deleted in one transaction spanning the warehouse
+    and its archive, so a row is always in exactly one of them. dim_date rows
+    for archived days move along unless another fact still references them.
+    Returns {year: rows moved}; a year with nothing to move gets no partition.
+    """
+    from .sharding import ShardedWarehouse
+    if isinstance(warehouse, ShardedWarehouse):
+        # The copy would read the catalog's empty fact table and archive nothing
+        raise ValueError('Archives need a single-file warehouse; fact rows live in the shards')
+    conn = warehouse.conn
+    cutoff = retention_cutoff(horizon_days, today)
+    years = [row[0] for row in conn.execute('''
+        SELECT DISTINCT date_key / 10000 FROM fact_stock_prices
+        WHERE date_key < ?
+        ORDER BY 1
+    ''', (cutoff,))]
+    if not years:
+        return {}
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archives = warehouse.archives
+    moved = {}
+    for year in years:
+        path = archive_path(archive_dir, year)
+        name = archives.attach(year, path)
+        low, high = year * 10000, min((year + 1) * 10000, cutoff)
+        with conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {name}.fact_stock_prices (
+                    stock_key INTEGER,
+                    date_key INTEGER,
+                    open_price REAL,
+                    high_price REAL,
+                    low_price REAL,
+                    close_price REAL,
+                    adj_close_price REAL,
+                    volume INTEGER,
+                    PRIMARY KEY (stock_key, date_key)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {name}.dim_date (
+                    date_key INTEGER PRIMARY KEY,
+                    date TEXT,
+                    year INTEGER,
+                    month INTEGER,
+                    day INTEGER,
+                    quarter INTEGER,
+                    day_of_week INTEGER,
+                    week_of_year INTEGER
+                )
+            ''')
+            cursor = conn.execute(f'''
+                INSERT OR REPLACE INTO {name}.fact_stock_prices
+                (stock_key, date_key, open_price, high_price, low_price,
+                 close_price, adj_close_price, volume)
+                SELECT stock_key, date_key, open_price, high_price, low_price,
+                       close_price, adj_close_price, volume
+                FROM main.fact_stock_prices
+                WHERE date_key >= ? AND date_key < ?
+                ORDER BY stock_key, date_key
+            ''', (low, high))
+            if cursor.rowcount <= 0:
+                continue
+            moved[year] = cursor.rowcount
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {name}.dim_date
+                SELECT date_key, date, year, month, day, quarter, day_of_week, week_of_year
+                FROM main.dim_date WHERE date_key >= ? AND date_key < ?
+            ''', (low, high))
+            conn.execute('''
+                DELETE FROM main.fact_stock_prices WHERE date_key >= ? AND date_key < ?
+            ''', (low, high))
+            conn.execute(f'''
+                INSERT OR REPLACE INTO main.archive_partitions
+                (year, path, min_date_key, max_date_key, rows, archived_at)
+                SELECT ?, ?, MIN(date_key), MAX(date_key), COUNT(*), ?
+                FROM {name}.fact_stock_prices
+            ''', (year, path, datetime.now().isoformat()))
+
+    # Calendar days before the horizon are only kept while a fact refers to them
+    with conn:
+        conn.execute('''
+            DELETE FROM dim_date
+            WHERE date_key < ?
+              AND date_key NOT IN (SELECT date_key FROM fact_corporate_actions)
+              AND date_key NOT IN (SELECT date_key FROM fact_price_rejects)
+        ''', (cutoff,))
+    archives.detach_all()
+    archives.invalidate()
+    warehouse.dimensions.clear()
+    return moved
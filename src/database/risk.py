@@ -0,0 +1,257 @@
+"""Risk metrics over many symbols at once
+
+Prices are read in chunks of symbols. Each chunk becomes a dates x symbols
+matrix of daily returns, aligned on the dates any symbol in the chunk
+traded; a symbol's return sits on the date of the later of its two bars and
+is NaN on dates it has no bar. Every metric is then one numpy reduction down
+the date axis, so the cost per chunk does not grow with Python loops over
+symbols, and memory is bounded by the chunk size times the window.
+
+Prices are adjusted for the splits and dividends in fact_corporate_actions
+and windows continue into the archives, through the same reader as batch
+analytics. Losses (drawdown, VaR, CVaR) are reported as positive fractions
+of value.
+"""
+
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+import numpy as np
+from src.monitoring import REGISTRY
+
+RISK_TIME = REGISTRY.histogram('risk_compute_seconds', 'Time spent computing risk metrics')
+RISK_CACHE = REGISTRY.counter('risk_cache_requests_total', 'Risk cache lookups by result')
+
+TRADING_DAYS = 252
+CHUNK_SYMBOLS = 250
+
+METRICS = ('volatility', 'rolling_volatility', 'max_drawdown', 'var_historical',
+           'cvar_historical', 'var_parametric', 'cvar_parametric', 'beta')
+
+
+def return_matrix(rows, stock_keys):
+    """(date_keys, returns) for (stock_key, date_key, price) rows sorted by stock and date
+
+    returns has one column per stock_keys entry, which must be sorted.
+    """
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(stock_keys)))
+    # NULL prices become NaN
+    keys, date_keys, prices = np.array(rows, dtype=float).T
+    date_index = np.unique(date_keys).astype(np.int64)
+
+    same = keys[1:] == keys[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = prices[1:] / prices[:-1] - 1
+    # A missing or non-positive price leaves a gap rather than an infinite return
+    valid = same & np.isfinite(changes)
+
+    returns = np.full((len(date_index), len(stock_keys)), np.nan)
+    rows_at = np.searchsorted(date_index, date_keys[1:][valid])
+    columns_at = np.searchsorted(stock_keys, keys[1:][valid])
+    returns[rows_at, columns_at] = changes[valid]
+    return date_index, returns
+
+
+def aligned(date_keys, series_keys, series):
+    """`series` values (indexed by sorted series_keys) at date_keys, NaN where absent"""
+    values = np.full(len(date_keys), np.nan)
+    if len(series_keys):
+        pos = np.clip(np.searchsorted(series_keys, date_keys), 0, len(series_keys) - 1)
+        found = series_keys[pos] == date_keys
+        values[found] = series[pos[found]]
+    return values
+
+
+def nan_quantile(returns, q):
+    """Per-column quantile ignoring NaN, interpolated linearly like np.nanpercentile
+
+    np.nanpercentile loops over columns in Python; sorting once moves NaN
+    to the bottom of every column and leaves one gather per column.
+    """
+    ordered = np.sort(returns, axis=0)
+    position = (np.sum(~np.isnan(returns), axis=0) - 1) * q
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    columns = np.arange(returns.shape[1])
+    low, high = ordered[below, columns], ordered[above, columns]
+    return low + (high - low) * (position - below)
+
+
+def rolling_volatility(returns, window):
+    """Annualized volatility of each column over trailing `window` rows, NaN until full
+
+    Row t covers rows t - window + 1 .. t; running sums make this one pass
+    whatever the window length.
+    """
+    observed = ~np.isnan(returns)
+    values = np.where(observed, returns, 0.0)
+    zeros = np.zeros((1, returns.shape[1]))
+    totals, squares, counts = (
+        np.concatenate([zeros, np.cumsum(a, axis=0)]) for a in (values, values ** 2, observed)
+    )
+    total = totals[window:] - totals[:-window]
+    square = squares[window:] - squares[:-window]
+    count = counts[window:] - counts[:-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.maximum(square - total ** 2 / count, 0) / (count - 1)
+    volatility = np.where(count >= window, np.sqrt(variance * TRADING_DAYS), np.nan)
+    return np.concatenate([np.full((window - 1, returns.shape[1]), np.nan), volatility])
+
+
+def risk_metrics(returns, benchmark=None, confidence=0.95, window=21):
+    """{metric: array with one value per column} for a dates x symbols return matrix
+
+    Columns need at least two returns; `benchmark` is a return vector
+    aligned with the rows, or None to skip beta. 'rolling' holds the whole
+    rolling volatility matrix, 'rolling_volatility' its last row.
+    """
+    observed = ~np.isnan(returns)
+    count = observed.sum(axis=0)
+    mean = np.nanmean(returns, axis=0)
+    std = np.nanstd(returns, axis=0, ddof=1)
+
+    # Historical: the empirical (1 - confidence) quantile and the mean beyond it
+    quantile = nan_quantile(returns, 1 - confidence)
+    tail = returns <= quantile
+    tail_mean = np.where(tail, returns, 0).sum(axis=0) / tail.sum(axis=0)
+
+    # Parametric: the same under a normal distribution with the sample moments
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - confidence)
+
+    # Days without a bar hold their value, so wealth only moves on observed returns
+    wealth = np.cumprod(1 + np.where(observed, returns, 0), axis=0)
+    peak = np.maximum.accumulate(np.maximum(wealth, 1), axis=0)
+    rolling = (rolling_volatility(returns, window) if len(returns) >= window
+               else np.full(returns.shape, np.nan))
+
+    metrics = {
+        'observations': count,
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'rolling': rolling,
+        'rolling_volatility': rolling[-1],
+        'max_drawdown': (1 - wealth / peak).max(axis=0),
+        'var_historical': -quantile,
+        'cvar_historical': -tail_mean,
+        'var_parametric': -(mean + z * std),
+        'cvar_parametric': -(mean - std * normal.pdf(z) / (1 - confidence)),
+        'beta': np.full(len(count), np.nan),
+    }
+    if benchmark is not None:
+        # Pairwise: only dates where both the symbol and the benchmark moved
+        both = observed & ~np.isnan(benchmark)[:, None]
+        pairs = both.sum(axis=0)
+        x = np.where(both, returns, 0)
+        y = np.where(both, benchmark[:, None], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_x, mean_y = x.sum(axis=0) / pairs, y.sum(axis=0) / pairs
+            covariance = (x * y).sum(axis=0) - pairs * mean_x * mean_y
+            variance = (y * y).sum(axis=0) - pairs * mean_y ** 2
+            metrics['beta'] = np.where((pairs >= 2) & (variance > 0), covariance / variance, np.nan)
+    return metrics
+
+
+def _value(value, digits=6):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _price_rows(warehouse, stock_keys, days):
+    """(stock_key, date_key, adjusted close) rows of each stock's newest `days` bars"""
+    windows = warehouse.get_adjusted_windows(stock_keys, days)
+    return [(stock_key, date_key, close)
+            for stock_key in stock_keys
+            for date_key, close, _ in windows.get(stock_key, ())]
+
+
+def compute_risk(warehouse, symbols=None, benchmark=None, days=TRADING_DAYS, confidence=0.95,
+                 window=21, series=False, chunk_symbols=CHUNK_SYMBOLS):
+    """{symbol: metrics} over each symbol's newest `days` daily returns
+
+    Covers every stock in the warehouse when symbols is None. Symbols that
+    are unknown or have fewer than two returns are left out. beta is None
+    without a benchmark or when the benchmark has no overlapping returns.
+    With `series` each symbol also gets its rolling volatility by date.
+    """
+    stock_key = warehouse.dimensions.stock_key
+    if symbols is None:
+        stock_keys = [row[0] for row in warehouse.conn.execute(
+            'SELECT stock_key FROM dim_stock ORDER BY stock_key')]
+    else:
+        stock_keys = sorted({key for key in map(stock_key, symbols) if key is not None})
+
+    benchmark_keys = benchmark_returns = None
+    benchmark_key = stock_key(benchmark) if benchmark else None
+    if benchmark_key is not None:
+        rows = _price_rows(warehouse, [benchmark_key], days + 1)
+        benchmark_keys, returns = return_matrix(rows, [benchmark_key])
+        benchmark_returns = returns[:, 0]
+
+    symbol, date = warehouse.dimensions.symbol, warehouse.dimensions.date
+    results = {}
+    with RISK_TIME.time():
+        for start in range(0, len(stock_keys), chunk_symbols):
+            chunk = stock_keys[start:start + chunk_symbols]
+            rows = _price_rows(warehouse, chunk, days + 1)
+            date_keys, returns = return_matrix(rows, chunk)
+            keep = (~np.isnan(returns)).sum(axis=0) >= 2
+            if not keep.any():
+                continue
+            chunk = [key for key, kept in zip(chunk, keep) if kept]
+            returns = returns[:, keep]
+            aligned_benchmark = (aligned(date_keys, benchmark_keys, benchmark_returns)
+                                 if benchmark_returns is not None else None)
+            metrics = risk_metrics(returns, aligned_benchmark, confidence, window)
+            # Index of each column's newest return
+            last = len(date_keys) - 1 - np.argmax(~np.isnan(returns[::-1]), axis=0)
+            for i, key in enumerate(chunk):
+                stock_symbol = symbol(key)
+                if stock_symbol is None:
+                    # The stock's dim_stock row is gone; leave it out rather than emit a None key
+                    continue
+                result = {name: _value(metrics[name][i]) for name in METRICS}
+                result['observations'] = int(metrics['observations'][i])
+                result['as_of'] = date(int(date_keys[last[i]]))
+                if series:
+                    column = metrics['rolling'][:, i]
+                    result['rolling_volatility_series'] = [
+                        {'date': date(int(date_keys[t])), 'value': _value(column[t])}
+                        for t in np.flatnonzero(np.isfinite(column))
+                    ]
+                results[stock_symbol] = result
+    return results
+
+
+class RiskCache:
+    """Risk results keyed by request, valid for one warehouse ingest version
+
+    The first lookup after a load sees a new version and drops every
+    entry; otherwise the least recently used entry goes once max_entries
+    are held.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+
+    def get(self, version, key, compute):
+        """Cached result for key at version, calling compute() on a miss"""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                RISK_CACHE.inc(result='hit')
+                return self._entries[key]
+        RISK_CACHE.inc(result='miss')
+        value = compute()
+        with self._lock:
+            # A load that finished meanwhile makes this result stale for the new version
+            if version == self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,221 @@
+"""Hash-sharded warehouse: fact rows spread over several SQLite files by stock_key
+
+A SQLite file has one writer at a time. Here `fact_stock_prices` is split
+over N shard files by stock_key, while the dimensions and every other table
+stay in the catalog file at db_path. Writers to different shards, whether
+threads of one warehouse or separate processes, never wait for each other.
+
+Each shard connection attaches the catalog, so single-stock queries run
+unchanged on the stock's shard and still see dim_stock and dim_date. The
+catalog connection attaches every shard behind a TEMP view named
+fact_stock_prices, which shadows the catalog's own (empty) fact table, so
+cross-cutting readers such as alerts and portfolio NAV keep working.
+Cross-symbol analytics fan out to the shards in parallel and merge.
+
+Fact writes go through insert_stock_prices or copy_prices; the view itself
+is read-only. Archives, the compact layout and snapshots need a single file.
+"""
+
+import heapq
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from src.monitoring import REGISTRY
+from .warehouse import QUERY_TIME, StockDataWarehouse
+
+# The catalog connection attaches every shard; leave room under SQLite's
+# default limit of 10 attached databases for a backfill's staging file
+MAX_SHARDS = 8
+
+SHARD_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS fact_stock_prices (
+        fact_key INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_key INTEGER,
+        stock_key INTEGER,
+        open_price REAL,
+        high_price REAL,
+        low_price REAL,
+        close_price REAL,
+        adj_close_price REAL,
+        volume INTEGER
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_fact_stock_date
+    ON fact_stock_prices (stock_key, date_key);
+'''
+
+SHARD_ROWS = REGISTRY.counter('warehouse_shard_rows_total', 'Fact rows written per shard')
+
+
+def shard_of(stock_key, shards):
+    """Shard holding a stock's facts
+
+    stock_keys are dense AUTOINCREMENT values, so the modulo spreads them
+    evenly, and unlike hash() it is the same in every process.
+    """
+    return stock_key % shards
+
+
+def shard_path(db_path, shard):
+    root, ext = os.path.splitext(db_path)
+    return f'{root}.shard{shard:02d}{ext or ".db"}'
+
+
+def is_sharded(db_path):
+    """True when db_path is the catalog of a sharded warehouse"""
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'warehouse_shards'"
+        ).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def open_warehouse(db_path, shards=1, **kwargs):
+    """A ShardedWarehouse when asked for more than one shard or db_path already is one"""
+    if shards > 1 or is_sharded(db_path):
+        if kwargs.pop('compact', False):
+            raise ValueError('The compact layout needs a single-file warehouse')
+        return ShardedWarehouse(db_path, shards if shards > 1 else None, **kwargs)
+    return StockDataWarehouse(db_path, **kwargs)
+
+
+class ShardedWarehouse(StockDataWarehouse):
+    """StockDataWarehouse whose fact rows live in `shards` files beside the catalog
+
+    The shard count is recorded in the catalog when it is created; reopening
+    with shards=None uses the recorded count.
+    """
+
+    def __init__(self, db_path='data/stock_warehouse.db', shards=None, slow_query_ms=None,
+                 mmap_size=0):
+        super().__init__(db_path, slow_query_ms=slow_query_ms, mmap_size=mmap_size)
+        try:
+            self.shard_paths = self._register_shards(shards)
+        except ValueError:
+            super().close()
+            raise
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.shards = len(self.shard_paths)
+        self.shard_conns = [self._open_shard(path) for path in self.shard_paths]
+        for shard, path in enumerate(self.shard_paths):
+            self.conn.execute('ATTACH DATABASE ? AS ?', (path, f'shard{shard}'))
+        self.conn.execute('CREATE TEMP VIEW fact_stock_prices AS ' + ' UNION ALL '.join(
+            f'SELECT * FROM shard{shard}.fact_stock_prices' for shard in range(self.shards)
+        ))
+        self._pool = ThreadPoolExecutor(max_workers=self.shards, thread_name_prefix='shard')
+
+    def _register_shards(self, shards):
+        """Shard file paths recorded in the catalog, creating the record on first open"""
+        conn = self.conn
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS warehouse_shards (
+                shard_id INTEGER PRIMARY KEY,
+                path TEXT
+            )
+        ''')
+        names = [row[0] for row in conn.execute('SELECT path FROM warehouse_shards ORDER BY shard_id')]
+        if names and shards and shards != len(names):
+            raise ValueError(f'{self.db_path} has {len(names)} shards, not {shards}')
+        if not names:
+            if not shards or not 1 <= shards <= MAX_SHARDS:
+                raise ValueError(f'shards must be between 1 and {MAX_SHARDS}')
+            if conn.execute('SELECT 1 FROM main.fact_stock_prices LIMIT 1').fetchone():
+                raise ValueError(f'{self.db_path} already holds price facts in a single file')
+            names = [os.path.basename(shard_path(self.db_path, shard)) for shard in range(shards)]
+            with conn:
+                conn.executemany('INSERT INTO warehouse_shards VALUES (?, ?)', enumerate(names))
+        # Shard files sit next to the catalog, so the pair can be moved together
+        return [os.path.join(os.path.dirname(self.db_path), name) for name in names]
+
+    def _open_shard(self, path):
+        conn = self._connect(path)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.executescript(SHARD_SCHEMA)
+        conn.execute('ATTACH DATABASE ? AS catalog', (self.db_path,))
+        return conn
+
+    def _fact_conn(self, stock_key):
+        return self.shard_conns[shard_of(stock_key, self.shards)]
+
+    def _write_shard(self, shard, rows):
+        conn = self.shard_conns[shard]
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO fact_stock_prices
+                (date_key, stock_key, open_price, high_price, low_price,
+                 close_price, adj_close_price, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        SHARD_ROWS.inc(len(rows), shard=str(shard))
+
+    @REGISTRY.timed(QUERY_TIME)
+    def insert_stock_prices(self, rows, checkpoint=None, actions=()):
+        """Insert many price facts, one transaction per shard, shards written in parallel
+
+        A checkpoint and any corporate actions are recorded in the catalog
+        after every shard committed; replaying a journal segment is
+        idempotent, so a crash in between only means it is applied twice.
+        """
+        count = self._write_shards(rows)
+        with self.conn:
+            self._write_corporate_actions(actions)
+            self._bump_ingest_version()
+            if checkpoint:
+                self._record_checkpoint(checkpoint, count)
+
+    def _write_shards(self, rows):
+        """Write rows to their shards in parallel; returns the number written"""
+        by_shard = defaultdict(list)
+        for row in rows:
+            by_shard[shard_of(row[1], self.shards)].append(row)
+        # list() waits for every shard and re-raises the first failure
+        list(self._pool.map(lambda item: self._write_shard(*item), by_shard.items()))
+        return sum(len(r) for r in by_shard.values())
+
+    def insert_stock_price(self, date_key, stock_key, open_p, high, low, close, adj_close, volume):
+        """Insert a single stock price fact into its shard"""
+        self._write_shard(shard_of(stock_key, self.shards),
+                          [(date_key, stock_key, open_p, high, low, close, adj_close, volume)])
+        with self.conn:
+            self._bump_ingest_version()
+
+    def copy_prices(self, select, params=()):
+        """Route the rows of a catalog query to their shards
+
+        The query may read tables attached to the catalog connection, such as
+        a backfill staging file, which the shard connections cannot see. The
+        catalog side (the ingest version) joins the caller's transaction
+        instead of committing on its own; shard writes commit per shard and
+        are idempotent, so a rolled-back caller can simply run again.
+        """
+        self._write_shards(self.conn.execute(select, params).fetchall())
+        self._bump_ingest_version()
+
+    def _window_rows(self, stock_keys, days, conn=None):
+        """Each shard's windows in parallel, merged back into (stock_key, date_key) order"""
+        by_shard = defaultdict(list)
+        for stock_key in stock_keys:
+            by_shard[shard_of(stock_key, self.shards)].append(stock_key)
+        window_rows = super()._window_rows
+        results = self._pool.map(
+            lambda item: window_rows(item[1], days, self.shard_conns[item[0]]), by_shard.items()
+        )
+        return list(heapq.merge(*results, key=itemgetter(0, 1)))
+
+    def database_files(self):
+        """The catalog followed by every shard file"""
+        return super().database_files() + list(zip(self.shard_paths, self.shard_conns))
+
+    def close(self):
+        """Close the shard and catalog connections"""
+        if self.conn and hasattr(self, '_pool'):
+            self._pool.shutdown()
+            for conn in self.shard_conns:
+                conn.close()
+            self.shard_conns = []
+        super().close()
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from src.monitoring import REGISTRY
+from .sharding import ShardedWarehouse
+from .warehouse import StockDataWarehouse
+
+PUBLISH_TIME = REGISTRY.histogram('snapshot_publish_seconds', 'Time spent publishing snapshots')
+PUBLISHES = REGISTRY.counter('snapshot_publishes_total', 'Snapshots published')
+
+# Map the whole snapshot into memory for typical warehouse sizes
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class SnapshotPublisher:
+    """Publish consistent read-only copies of a warehouse for web readers
+
+    The copy is taken with SQLite's online backup API into a temporary file,
+    fsynced and renamed over the snapshot path, so readers only ever open a
+    complete snapshot and a published file is never modified again.
+    """
+
+    def __init__(self, warehouse, path):
+        if isinstance(warehouse, ShardedWarehouse):
+            raise ValueError('Snapshots need a single-file warehouse; the backup only copies the catalog')
+        self.warehouse = warehouse
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def publish(self):
+        """Copy the warehouse's committed state to the snapshot path"""
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with self._lock, PUBLISH_TIME.time():
+            try:
+                target = sqlite3.connect(tmp_path)
+                try:
+                    self.warehouse.conn.backup(target)
+                    # immutable readers cannot see a WAL, so the copy must be self-contained
+                    target.execute('PRAGMA journal_mode = DELETE')
+                finally:
+                    target.close()
+                with open(tmp_path, 'rb') as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        PUBLISHES.inc()
+        return self.path
+
+
+class SnapshotReader:
+    """Read-only warehouse over the latest published snapshot
+
+    acquire() pins the newest snapshot, reopening the file when a publish
+    replaced it (noticed by inode, mtime and size), and release() unpins it.
+    A replaced warehouse is closed once its last holder released it, so a
+    request pinned to it can outlive any number of publishes; the
+    renamed-over file stays readable through its open handle until then.
+    """
+
+    def __init__(self, path, mmap_size=DEFAULT_MMAP_SIZE, slow_query_ms=None):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._warehouse = None
+        self._identity = None
+        self._holders = {}
+
+    def _refresh(self):
+        """Open a newly published snapshot; call with the lock held"""
+        stat = os.stat(self.path)
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != self._identity:
+            retired = self._warehouse
+            self._warehouse = StockDataWarehouse(self.path, read_only=True,
+                                                 mmap_size=self.mmap_size,
+                                                 slow_query_ms=self.slow_query_ms)
+            self._identity = identity
+            if retired and not self._holders.get(retired):
+                retired.close()
+        return self._warehouse
+
+    def acquire(self):
+        """Pin and return the warehouse for the newest snapshot"""
+        with self._lock:
+            warehouse = self._refresh()
+            self._holders[warehouse] = self._holders.get(warehouse, 0) + 1
+            return warehouse
+
+    def retain(self, warehouse):
+        """Add a holder to a warehouse that is already pinned"""
+        with self._lock:
+            self._holders[warehouse] += 1
+
+    def release(self, warehouse):
+        """Unpin a warehouse from acquire(), closing it if it was replaced meanwhile"""
+        with self._lock:
+            holders = self._holders.pop(warehouse) - 1
+            if holders:
+                self._holders[warehouse] = holders
+            elif warehouse is not self._warehouse:
+                warehouse.close()
+
+    @contextmanager
+    def pinned(self):
+        """The newest snapshot's warehouse, pinned for the duration of the block"""
+        warehouse = self.acquire()
+        try:
+            yield warehouse
+        finally:
+            self.release(warehouse)
+
+    def current(self):
+        """The warehouse for the newest snapshot, unpinned
+
+        Only for calls that finish before the next publish; anything that
+        may span one, such as a streamed response, must use acquire().
+        """
+        with self._lock:
+            return self._refresh()
+
+    def close(self):
+        with self._lock:
+            for warehouse in set(self._holders) | {self._warehouse}:
+                if warehouse:
+                    warehouse.close()
+            self._holders = {}
+            self._warehouse = self._identity = None
@@ -1,20 +1,103 @@
 import sqlite3
-import pandas as pd
 from datetime import datetime, timedelta
 import os
+from urllib.parse import quote
+from itertools import groupby
+from operator import itemgetter
+from .compact import create_compact_layout, is_compact
+from .dimensions import DimensionCache, date_key_of, date_of
+from .retention import ArchiveSet
+from src.monitoring import REGISTRY, InstrumentedConnection, SlowQueryLog
+
+QUERY_TIME = REGISTRY.histogram('warehouse_query_seconds',
+                                'Time spent in StockDataWarehouse methods')
+STAGE_TIME = REGISTRY.histogram('warehouse_stage_seconds',
+                                'Time spent in post-query processing stages')
+
+HISTORY_COLUMNS = 'open_price, high_price, low_price, close_price, adj_close_price, volume'
+HISTORY_PAGE_SIZE = 1000
+
+def round_like_numpy(value, digits=2):
+    """Round as numpy does (scale, round half to even, unscale) to match DataFrame results"""
+    if not isinstance(value, float):
+        return value
+    scale = 10 ** digits
+    return round(value * scale) / scale
+
+def summarize_prices(symbol, data):
+    """Build the analytics payload from (date, close_price, volume) rows in date order"""
+    # NULLs are skipped like pandas skips NaN
+    closes = [row[1] for row in data if row[1] is not None]
+    volumes = [row[2] for row in data if row[2] is not None]
+    
+    return analytics_payload(
+        symbol, [row[1] for row in data[-2:]], max(closes), min(closes),
+        sum(volumes) / len(volumes), data
+    )
+
+def analytics_payload(symbol, latest, high, low, avg_volume, data):
+    """Analytics payload from the last one or two closes, window aggregates and chart rows"""
+    current_price = latest[-1]
+    prev_price = latest[-2] if len(latest) > 1 else current_price
+    price_change = current_price - prev_price
+    price_change_pct = (price_change / prev_price * 100) if prev_price != 0 else 0
+    
+    return {
+        'symbol': symbol.upper(),
+        'current_price': round_like_numpy(current_price),
+        'price_change': round_like_numpy(price_change),
+        'price_change_pct': round_like_numpy(price_change_pct),
+        'high': round_like_numpy(high),
+        'low': round_like_numpy(low),
+        'avg_volume': int(avg_volume),
+        'chart_data': [
+            {'date': date, 'close_price': close, 'volume': volume}
+            for date, close, volume in data
+        ]
+    }
 
 class StockDataWarehouse:
-    def __init__(self, db_path='data/stock_warehouse.db'):
+    def __init__(self, db_path='data/stock_warehouse.db', compact=False, slow_query_ms=None,
+                 read_only=False, mmap_size=0):
         self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.compact = compact
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+        self.slow_query_log = SlowQueryLog(slow_query_ms) if slow_query_ms is not None else None
         self.conn = None
-        self.create_star_schema()
+        if read_only:
+            self.conn = self._connect()
+            self.compact = is_compact(self.conn)
+        else:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.create_star_schema()
+        self.dimensions = DimensionCache(self.conn)
+        self.archives = ArchiveSet(self.conn)
+    
+    def _connect(self, path=None):
+        path = path or self.db_path
+        factory = InstrumentedConnection if self.slow_query_log else sqlite3.Connection
+        if self.read_only:
+            # Published snapshots never change, so readers skip locking and change checks
+            uri = f'file:{quote(os.path.abspath(path))}?mode=ro&immutable=1'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+        else:
+            conn = sqlite3.connect(path, check_same_thread=False, factory=factory)
+        if self.mmap_size:
+            conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        if self.slow_query_log:
+            conn.enable_slow_query_log(self.slow_query_log)
+        return conn
     
     def create_star_schema(self):
         """Create star schema with fact and dimension tables"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn = self._connect()
         cursor = self.conn.cursor()
         
+        # New files reclaim free pages with incremental vacuum; no-op on existing ones
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # Dimension: Date
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS dim_date (
@@ -40,7 +123,12 @@ class StockDataWarehouse:
             )
         ''')
         
-        # Fact: Stock Prices
+        # Fact: Stock Prices (new databases may use the compact tick layout)
+        has_facts = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'fact_stock_prices'"
+        ).fetchone()
+        if self.compact and not has_facts:
+            create_compact_layout(self.conn)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS fact_stock_prices (
                 fact_key INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,23 +144,185 @@ class StockDataWarehouse:
                 FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
             )
         ''')
+        self.compact = is_compact(self.conn)
+        if not self.compact:
+            self._ensure_fact_unique_index(cursor)
+        
+        # Fact: Corporate actions (splits and dividends keyed by ex-date)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fact_corporate_actions (
+                action_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                stock_key INTEGER,
+                date_key INTEGER,
+                action_type TEXT,
+                value REAL,
+                UNIQUE (stock_key, date_key, action_type),
+                FOREIGN KEY (date_key) REFERENCES dim_date(date_key),
+                FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
+            )
+        ''')
+        
+        # Quarantined price rows that failed validation
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fact_price_rejects (
+                reject_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                date_key INTEGER,
+                stock_key INTEGER,
+                open_price REAL,
+                high_price REAL,
+                low_price REAL,
+                close_price REAL,
+                adj_close_price REAL,
+                volume INTEGER,
+                reason TEXT,
+                rejected_at TEXT,
+                FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
+            )
+        ''')
+        
+        # Ingest checkpoints: last journal segment applied per symbol
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                symbol TEXT PRIMARY KEY,
+                segment INTEGER,
+                rows_applied INTEGER,
+                applied_at TEXT
+            )
+        ''')
+        
+        # Bumped by every fact write, so readers can tell when cached results went stale
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_version (
+                version_key INTEGER PRIMARY KEY CHECK (version_key = 1),
+                version INTEGER
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO ingest_version VALUES (1, 0)')
+        
+        # Alert rules, the alerts they triggered, and the last bar evaluated per stock
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_rules (
+                rule_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                stock_key INTEGER,
+                rule_type TEXT,
+                lookback INTEGER,
+                threshold REAL,
+                created_at TEXT,
+                FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fact_alerts (
+                alert_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                rule_key INTEGER,
+                stock_key INTEGER,
+                date_key INTEGER,
+                value REAL,
+                UNIQUE (rule_key, date_key),
+                FOREIGN KEY (rule_key) REFERENCES alert_rules(rule_key),
+                FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
+            )
+        ''')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_fact_alerts_date ON fact_alerts (date_key, stock_key)'
+        )
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_watermarks (
+                stock_key INTEGER PRIMARY KEY,
+                date_key INTEGER
+            )
+        ''')
+        
+        # Portfolios, their trades, and the stored daily NAV series
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dim_portfolio (
+                portfolio_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE,
+                created_at TEXT,
+                nav_dirty_from INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fact_transactions (
+                transaction_key INTEGER PRIMARY KEY AUTOINCREMENT,
+                portfolio_key INTEGER,
+                stock_key INTEGER,
+                date_key INTEGER,
+                quantity REAL,
+                price REAL,
+                FOREIGN KEY (portfolio_key) REFERENCES dim_portfolio(portfolio_key),
+                FOREIGN KEY (stock_key) REFERENCES dim_stock(stock_key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_portfolio
+            ON fact_transactions (portfolio_key, stock_key, date_key)
+        ''')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_transactions_stock ON fact_transactions (stock_key)'
+        )
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fact_portfolio_nav (
+                portfolio_key INTEGER,
+                date_key INTEGER,
+                market_value REAL,
+                net_invested REAL,
+                positions INTEGER,
+                priced INTEGER,
+                PRIMARY KEY (portfolio_key, date_key)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Archive partitions: years of price history moved out to archive files
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_partitions (
+                year INTEGER PRIMARY KEY,
+                path TEXT,
+                min_date_key INTEGER,
+                max_date_key INTEGER,
+                rows INTEGER,
+                archived_at TEXT
+            )
+        ''')
         
         self.conn.commit()
     
+    def _ensure_fact_unique_index(self, cursor):
+        """One fact row per stock and day, so reloads and replays replace instead of append"""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_fact_stock_date'"
+        ).fetchone()
+        if exists:
+            return
+        # Older databases may hold duplicate appends; keep the latest of each
+        cursor.execute('''
+            DELETE FROM fact_stock_prices
+            WHERE fact_key NOT IN (
+                SELECT MAX(fact_key) FROM fact_stock_prices GROUP BY stock_key, date_key
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX idx_fact_stock_date
+            ON fact_stock_prices (stock_key, date_key)
+        ''')
+    
+    @REGISTRY.timed(QUERY_TIME)
     def populate_date_dimension(self, start_date, end_date):
         """Populate date dimension table"""
         cursor = self.conn.cursor()
         
+        dates = []
         current = start_date
         while current <= end_date:
             date_key = int(current.strftime('%Y%m%d'))
+            dates.append((date_key, current.strftime('%Y-%m-%d')))
             cursor.execute('''
                 INSERT OR IGNORE INTO dim_date 
                 (date_key, date, year, month, day, quarter, day_of_week, week_of_year)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 date_key,
-                current.strftime('%Y-%m-%d'),
+                dates[-1][1],
                 current.year,
                 current.month,
                 current.day,
@@ -83,24 +333,31 @@ class StockDataWarehouse:
             current += timedelta(days=1)
         
         self.conn.commit()
+        self.dimensions.add_dates(dates)
     
+    @REGISTRY.timed(QUERY_TIME)
     def get_stock_by_symbol(self, symbol):
         """Get stock_key for a symbol"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT stock_key FROM dim_stock WHERE symbol = ?', (symbol.upper(),))
-        result = cursor.fetchone()
-        return result[0] if result else None
+        return self.dimensions.stock_key(symbol)
     
+    @REGISTRY.timed(QUERY_TIME)
     def add_stock(self, symbol, company_name, sector='Unknown', industry='Unknown'):
         """Add stock to dimension table"""
+        stock_key = self.dimensions.stock_key(symbol)
+        if stock_key is not None:
+            return stock_key
+        
         cursor = self.conn.cursor()
         cursor.execute('''
             INSERT OR IGNORE INTO dim_stock (symbol, company_name, sector, industry)
             VALUES (?, ?, ?, ?)
         ''', (symbol.upper(), company_name, sector, industry))
         self.conn.commit()
-        return self.get_stock_by_symbol(symbol)
+        if cursor.rowcount == 1:
+            self.dimensions.add_stock(symbol, cursor.lastrowid)
+        return self.dimensions.stock_key(symbol)
     
+    @REGISTRY.timed(QUERY_TIME)
     def insert_stock_price(self, date_key, stock_key, open_p, high, low, close, adj_close, volume):
         """Insert a single stock price fact"""
         cursor = self.conn.cursor()
@@ -110,52 +367,639 @@ class StockDataWarehouse:
              close_price, adj_close_price, volume)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (date_key, stock_key, open_p, high, low, close, adj_close, volume))
+        self._bump_ingest_version()
         self.conn.commit()
     
-    def get_stock_analytics(self, symbol, days=90):
-        """Get analytics for a specific stock"""
+    @REGISTRY.timed(QUERY_TIME)
+    def insert_stock_prices(self, rows, checkpoint=None, actions=()):
+        """Insert many price facts in one transaction
+        
+        rows are (date_key, stock_key, open, high, low, close, adj_close, volume)
+        tuples. An optional (symbol, segment) checkpoint is recorded in the
+        same transaction so a journal replay knows exactly what was applied,
+        as are `actions`, (stock_key, date_key, action_type, value) rows.
+        """
+        rows = list(rows)
+        with self.conn:
+            self._write_corporate_actions(actions)
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO fact_stock_prices 
+                (date_key, stock_key, open_price, high_price, low_price, 
+                 close_price, adj_close_price, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._bump_ingest_version()
+            if checkpoint:
+                self._record_checkpoint(checkpoint, len(rows))
+    
+    def _record_checkpoint(self, checkpoint, rows_applied):
+        symbol, segment = checkpoint
+        self.conn.execute('''
+            INSERT OR REPLACE INTO ingest_checkpoints
+            (symbol, segment, rows_applied, applied_at)
+            VALUES (?, ?, ?, ?)
+        ''', (symbol.upper(), segment, rows_applied, datetime.now().isoformat()))
+    
+    def _bump_ingest_version(self):
+        self.conn.execute('UPDATE ingest_version SET version = version + 1')
+    
+    def copy_prices(self, select, params=()):
+        """Upsert the (date_key, stock_key, open, high, low, close, adj_close, volume) rows of a query
+        
+        Runs as one INSERT ... SELECT inside the caller's transaction, so
+        staged rows never pass through Python.
+        """
+        self.conn.execute(f'''
+            INSERT OR REPLACE INTO fact_stock_prices
+            (date_key, stock_key, open_price, high_price, low_price,
+             close_price, adj_close_price, volume)
+            {select}
+        ''', params)
+        self._bump_ingest_version()
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def insert_price_rejects(self, rows):
+        """Quarantine rows that failed validation
+        
+        rows are (date_key, stock_key, open, high, low, close, adj_close,
+        volume, reason) tuples.
+        """
+        rejected_at = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO fact_price_rejects
+                (date_key, stock_key, open_price, high_price, low_price,
+                 close_price, adj_close_price, volume, reason, rejected_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [tuple(row) + (rejected_at,) for row in rows])
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_price_rejects(self, stock_key):
+        """Get quarantined rows for a stock with their reason codes"""
         cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT date_key, open_price, high_price, low_price, close_price,
+                   adj_close_price, volume, reason
+            FROM fact_price_rejects
+            WHERE stock_key = ?
+            ORDER BY date_key
+        ''', (stock_key,))
+        return cursor.fetchall()
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_ingest_checkpoint(self, symbol):
+        """Get the last journal segment applied for a symbol, or 0"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT segment FROM ingest_checkpoints WHERE symbol = ?', (symbol.upper(),))
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    def get_ingest_version(self):
+        """Counter bumped by every price fact write, from any connection or process"""
+        return self.conn.execute('SELECT version FROM ingest_version').fetchone()[0]
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def add_corporate_action(self, stock_key, date_key, action_type, value):
+        """Record a split ratio or dividend amount effective on its ex-date"""
+        self._write_corporate_actions([(stock_key, date_key, action_type, value)])
+        # Adjusted prices change, so results cached by ingest version are stale
+        self._bump_ingest_version()
+        self.conn.commit()
+    
+    def _write_corporate_actions(self, actions):
+        """Upsert (stock_key, date_key, action_type, value) rows in the caller's transaction"""
+        actions = list(actions)
+        if not actions:
+            return
+        # Imported past the early return: most price loads carry no actions and skip pandas
+        from .adjustments import ACTION_TYPES
+        for action in actions:
+            if action[2] not in ACTION_TYPES:
+                raise ValueError(f"Unknown corporate action type: {action[2]}")
+        self.conn.executemany('''
+            INSERT OR REPLACE INTO fact_corporate_actions
+            (stock_key, date_key, action_type, value)
+            VALUES (?, ?, ?, ?)
+        ''', actions)
+        # A split changes the shares held, so NAV is stale from the ex-date for portfolios that
+        # traded the stock
+        self.conn.executemany('''
+            UPDATE dim_portfolio
+            SET nav_dirty_from = MIN(COALESCE(nav_dirty_from, :date_key), :date_key)
+            WHERE portfolio_key IN (SELECT portfolio_key FROM fact_transactions
+                                    WHERE stock_key = :stock_key)
+        ''', [{'stock_key': action[0], 'date_key': action[1]} for action in actions])
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_corporate_actions(self, stock_key):
+        """Get all corporate actions for a stock ordered by ex-date"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT date_key, action_type, value
+            FROM fact_corporate_actions
+            WHERE stock_key = ?
+            ORDER BY date_key
+        ''', (stock_key,))
+        return cursor.fetchall()
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_corporate_actions_many(self, stock_keys):
+        """{stock_key: [(date_key, action_type, value)]} for those stocks that have corporate actions"""
+        placeholders = ', '.join('?' for _ in stock_keys)
+        rows = self.conn.execute(f'''
+            SELECT stock_key, date_key, action_type, value
+            FROM fact_corporate_actions
+            WHERE stock_key IN ({placeholders})
+            ORDER BY stock_key, date_key
+        ''', list(stock_keys)).fetchall()
+        return {stock_key: [row[1:] for row in actions]
+                for stock_key, actions in groupby(rows, key=itemgetter(0))}
+    
+    def _newest_action_keys(self, stock_keys):
+        """{stock_key: action_key of its newest recorded corporate action}
+        
+        Every upsert deletes and reinserts the row under a fresh AUTOINCREMENT
+        key, so a larger key means the stock's adjustment changed since.
+        """
+        placeholders = ', '.join('?' for _ in stock_keys)
+        return dict(self.conn.execute(f'''
+            SELECT stock_key, MAX(action_key) FROM fact_corporate_actions
+            WHERE stock_key IN ({placeholders})
+            GROUP BY stock_key
+        ''', list(stock_keys)).fetchall())
+    
+    def _adjusted(self, stock_key, rows, actions=None):
+        """(date_key, close_price, volume) rows, oldest first, adjusted for the stock's actions"""
+        if actions is None:
+            actions = self.get_corporate_actions_many([stock_key]).get(stock_key)
+        if not actions:
+            return rows
+        from .adjustments import adjust_rows
+        return adjust_rows(rows, actions)
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def add_alert_rule(self, symbol, rule_type, lookback=None, threshold=None):
+        """Add an alert rule for a stock and return its rule_key
         
-        query = '''
-            SELECT d.date, f.close_price, f.volume
-            FROM fact_stock_prices f
-            JOIN dim_date d ON f.date_key = d.date_key
-            JOIN dim_stock s ON f.stock_key = s.stock_key
-            WHERE s.symbol = ?
-            ORDER BY d.date DESC
+        Rules look forward: bars already loaded when the first rule for a
+        stock is added are not evaluated.
+        """
+        from .alerts import GAP_TYPES, RULE_TYPES
+        
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown alert rule type: {rule_type}")
+        if rule_type in GAP_TYPES:
+            if threshold is None or threshold <= 0:
+                raise ValueError("Gap rules need a positive threshold percentage")
+            lookback = 1
+        elif lookback is None:
+            lookback = RULE_TYPES[rule_type]
+        elif lookback < 2:
+            raise ValueError("lookback must be at least 2 bars")
+        stock_key = self.dimensions.stock_key(symbol)
+        if stock_key is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO alert_rules (stock_key, rule_type, lookback, threshold, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (stock_key, rule_type, int(lookback), threshold, datetime.now().isoformat()))
+        rule_key = cursor.lastrowid
+        cursor.execute('''
+            INSERT OR IGNORE INTO alert_watermarks (stock_key, date_key)
+            SELECT ?, MAX(date_key) FROM fact_stock_prices WHERE stock_key = ?
+        ''', (stock_key, stock_key))
+        self.conn.commit()
+        return rule_key
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_alert_rules(self, symbol=None):
+        """Get (rule_key, symbol, rule_type, lookback, threshold) rows"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT r.rule_key, s.symbol, r.rule_type, r.lookback, r.threshold
+            FROM alert_rules r
+            JOIN dim_stock s ON r.stock_key = s.stock_key
+            WHERE ? IS NULL OR s.symbol = ?
+            ORDER BY r.rule_key
+        ''', (symbol, symbol))
+        return cursor.fetchall()
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_alerts(self, symbol=None, since=None, limit=100):
+        """Get triggered alerts, newest bar first, optionally for one symbol or from a date on"""
+        stock_key = None
+        if symbol is not None:
+            stock_key = self.dimensions.stock_key(symbol)
+            if stock_key is None:
+                return []
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT a.rule_key, a.stock_key, r.rule_type, r.lookback, r.threshold,
+                   a.date_key, a.value
+            FROM fact_alerts a
+            JOIN alert_rules r ON a.rule_key = r.rule_key
+            WHERE (? IS NULL OR a.stock_key = ?) AND a.date_key >= ?
+            ORDER BY a.date_key DESC, a.alert_key DESC
             LIMIT ?
-        '''
-        cursor.execute(query, (symbol.upper(), days))
-        data = cursor.fetchall()
+        ''', (stock_key, stock_key, date_key_of(since) if since else 0, limit))
+        symbol_of, date = self.dimensions.symbol, self.dimensions.date
+        return [
+            {'rule_key': rule_key, 'symbol': symbol_of(stock_key), 'rule_type': rule_type,
+             'lookback': lookback, 'threshold': threshold, 'date': date(date_key), 'value': value}
+            for rule_key, stock_key, rule_type, lookback, threshold, date_key, value in cursor
+        ]
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def add_portfolio(self, name):
+        """Create a portfolio, or return the key of the one with this name"""
+        cursor = self.conn.cursor()
+        cursor.execute('INSERT OR IGNORE INTO dim_portfolio (name, created_at) VALUES (?, ?)',
+                       (name, datetime.now().isoformat()))
+        self.conn.commit()
+        cursor.execute('SELECT portfolio_key FROM dim_portfolio WHERE name = ?', (name,))
+        return cursor.fetchone()[0]
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def add_transaction(self, portfolio_key, symbol, date, quantity, price):
+        """Record a trade (negative quantity sells) and mark the NAV stale from its date"""
+        stock_key = self.dimensions.stock_key(symbol)
+        if stock_key is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+        date_key = date_key_of(date)
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE dim_portfolio
+            SET nav_dirty_from = MIN(COALESCE(nav_dirty_from, ?), ?)
+            WHERE portfolio_key = ?
+        ''', (date_key, date_key, portfolio_key))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Unknown portfolio: {portfolio_key}")
+        cursor.execute('''
+            INSERT INTO fact_transactions (portfolio_key, stock_key, date_key, quantity, price)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (portfolio_key, stock_key, date_key, float(quantity), float(price)))
+        self.conn.commit()
+        return cursor.lastrowid
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_portfolio(self, portfolio_key, days=90):
+        """Current positions valued at their latest close, plus the stored NAV series
         
-        if not data:
+        Reads the NAV as last updated by portfolio.update_nav; it is not
+        recomputed here.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT name FROM dim_portfolio WHERE portfolio_key = ?', (portfolio_key,))
+        row = cursor.fetchone()
+        if row is None:
             return None
         
-        df = pd.DataFrame(data, columns=['date', 'close_price', 'volume'])
-        df = df.sort_values('date')
+        cursor.execute('''
+            SELECT stock_key, date_key, SUM(quantity), SUM(quantity * price)
+            FROM fact_transactions
+            WHERE portfolio_key = ?
+            GROUP BY stock_key, date_key
+        ''', (portfolio_key,))
+        trades = cursor.fetchall()
+        actions = self.get_corporate_actions_many(sorted({trade[0] for trade in trades}))
+        holdings = {}
+        for stock_key, date_key, quantity, invested in trades:
+            # Shares bought before a split ex-date are multiplied by it; the latest
+            # close is raw, so it values the post-split share count
+            for ex_date, action_type, value in actions.get(stock_key, ()):
+                if action_type == 'split' and ex_date > date_key:
+                    quantity *= value
+            held = holdings.setdefault(stock_key, [0.0, 0.0])
+            held[0] += quantity
+            held[1] += invested
         
-        current_price = df['close_price'].iloc[-1]
-        prev_price = df['close_price'].iloc[-2] if len(df) > 1 else current_price
-        price_change = current_price - prev_price
-        price_change_pct = (price_change / prev_price * 100) if prev_price != 0 else 0
+        symbol = self.dimensions.symbol
+        positions = []
+        for stock_key, (quantity, invested) in holdings.items():
+            if quantity == 0:
+                continue
+            cursor.execute('''
+                SELECT close_price FROM fact_stock_prices
+                WHERE stock_key = ?
+                ORDER BY date_key DESC
+                LIMIT 1
+            ''', (stock_key,))
+            close = cursor.fetchone()
+            close = close[0] if close else None
+            positions.append({
+                'symbol': symbol(stock_key), 'quantity': quantity, 'net_invested': round(invested, 2),
+                'close_price': close,
+                'market_value': round(quantity * close, 2) if close is not None else None
+            })
+        positions.sort(key=lambda position: -(position['market_value'] or 0))
         
+        cursor.execute('''
+            SELECT date_key, market_value, net_invested
+            FROM fact_portfolio_nav
+            WHERE portfolio_key = ?
+            ORDER BY date_key DESC
+            LIMIT ?
+        ''', (portfolio_key, days))
+        date = self.dimensions.date
+        nav = [{'date': date(date_key), 'market_value': round(value, 2),
+                'net_invested': round(invested, 2)}
+               for date_key, value, invested in reversed(cursor.fetchall())]
         return {
-            'symbol': symbol.upper(),
-            'current_price': round(current_price, 2),
-            'price_change': round(price_change, 2),
-            'price_change_pct': round(price_change_pct, 2),
-            'high': round(df['close_price'].max(), 2),
-            'low': round(df['close_price'].min(), 2),
-            'avg_volume': int(df['volume'].mean()),
-            'chart_data': df.to_dict('records')
+            'portfolio_id': portfolio_key,
+            'name': row[0],
+            'market_value': nav[-1]['market_value'] if nav else None,
+            'positions': positions,
+            'nav': nav
         }
     
+    @REGISTRY.timed(QUERY_TIME)
+    def get_adjusted_prices(self, symbol, days=90):
+        """Get split and dividend adjusted bars, adjusted at query time"""
+        # pandas is imported on first use so schema setup and serving start fast
+        import pandas as pd
+        from .adjustments import apply_adjustments
+        
+        stock_key = self.get_stock_by_symbol(symbol)
+        if stock_key is None:
+            return None
+        
+        # One extra bar gives dividends on the first ex-date a reference close
+        rows = self._recent_prices(
+            stock_key, 'open_price, high_price, low_price, close_price, volume', days + 1
+        )
+        date = self.dimensions.date
+        data = [(row[0], date(row[0])) + row[1:] for row in rows]
+        
+        if not data:
+            return None
+        
+        df = pd.DataFrame(data, columns=['date_key', 'date', 'open_price', 'high_price',
+                                         'low_price', 'close_price', 'volume'])
+        df = df.sort_values('date_key').reset_index(drop=True)
+        actions = pd.DataFrame(self.get_corporate_actions(stock_key),
+                               columns=['date_key', 'action_type', 'value'])
+        adjusted = apply_adjustments(df, actions)
+        return adjusted.tail(days).reset_index(drop=True)
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_stock_analytics(self, symbol, days=90, since=None, action_key=None):
+        """Get analytics for a specific stock
+        
+        Closes and volumes are adjusted for the stock's splits and dividends,
+        so a split does not show up as a price cliff; action_key names the
+        newest corporate action the adjustment reflects (0 for none).
+        
+        With `since` (a date_key or date) chart_data only holds the bars after
+        it, for clients that already have the rest of the window; the summary
+        fields still cover the whole window. A client that also passes the
+        action_key its chart was drawn with gets `replot` and the whole
+        window back when a newer action has changed the bars it holds.
+        """
+        stock_key = self.dimensions.stock_key(symbol)
+        if stock_key is None:
+            return None
+        if since is not None:
+            return self._analytics_since(symbol, stock_key, days, date_key_of(since), action_key)
+        
+        rows = self._recent_prices(stock_key, 'close_price, volume', days)
+        if not rows:
+            return None
+        
+        date = self.dimensions.date
+        data = [(date(date_key), close, volume)
+                for date_key, close, volume in self._adjusted(stock_key, rows[::-1])]
+        
+        with STAGE_TIME.time(stage='analytics_summary'):
+            analytics = summarize_prices(symbol, data)
+        analytics['action_key'] = self._newest_action_keys([stock_key]).get(stock_key, 0)
+        return analytics
+    
+    def _analytics_since(self, symbol, stock_key, days, since, action_key=None):
+        """Window summary from one aggregate query plus only the bars after `since`"""
+        conn = self._fact_conn(stock_key)
+        high, low, volume_sum, volume_count, bars, oldest = conn.execute('''
+            SELECT MAX(close_price), MIN(close_price), SUM(volume), COUNT(volume), COUNT(*),
+                   MIN(date_key)
+            FROM (
+                SELECT date_key, close_price, volume FROM fact_stock_prices
+                WHERE stock_key = ?
+                ORDER BY date_key DESC
+                LIMIT ?
+            )
+        ''', (stock_key, days)).fetchone()
+        actions = self.get_corporate_actions_many([stock_key]).get(stock_key, [])
+        # An action recorded after the client's chart that adjusts a bar of the window
+        # (any bar, when the window may continue into the archives) invalidates the chart
+        replot = bool(bars) and action_key is not None and self.conn.execute('''
+            SELECT 1 FROM fact_corporate_actions
+            WHERE stock_key = ? AND action_key > ? AND date_key > ?
+            LIMIT 1
+        ''', (stock_key, action_key, oldest if bars >= days else 0)).fetchone() is not None
+        if (replot or (bars < days and self.archives.partitions())
+                or (bars and any(action[0] > oldest for action in actions))):
+            # The window reaches into the archives, or an action adjusts part of it;
+            # summarize it the full way
+            analytics = self.get_stock_analytics(symbol, days)
+            if analytics:
+                if not replot:
+                    analytics['chart_data'] = [bar for bar in analytics['chart_data']
+                                               if bar['date'] > date_of(since)]
+                analytics['since'] = since
+                analytics['replot'] = replot
+            return analytics
+        if not bars:
+            return None
+        
+        rows = conn.execute('''
+            SELECT date_key, close_price, volume FROM fact_stock_prices
+            WHERE stock_key = ? AND date_key > ?
+            ORDER BY date_key DESC
+            LIMIT ?
+        ''', (stock_key, since, days)).fetchall()
+        latest = rows[:2] if len(rows) >= 2 else self._recent_prices(stock_key, 'close_price, volume',
+                                                                    min(days, 2))
+        
+        date = self.dimensions.date
+        with STAGE_TIME.time(stage='analytics_summary'):
+            analytics = analytics_payload(
+                symbol, [row[1] for row in reversed(latest)], high, low,
+                volume_sum / volume_count,
+                [(date(date_key), close, volume) for date_key, close, volume in reversed(rows)]
+            )
+        analytics['action_key'] = self._newest_action_keys([stock_key]).get(stock_key, 0)
+        analytics['since'] = since
+        analytics['replot'] = False
+        return analytics
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_stock_analytics_many(self, symbols, days=90):
+        """Get analytics for many stocks with one windowed query
+        
+        Returns a dict of symbol -> the same payload as get_stock_analytics;
+        symbols without data are left out.
+        """
+        stock_keys = {self.dimensions.stock_key(symbol) for symbol in symbols}
+        stock_keys.discard(None)
+        if not stock_keys:
+            return {}
+        
+        by_stock = self.get_adjusted_windows(sorted(stock_keys), days)
+        
+        date = self.dimensions.date
+        symbol = self.dimensions.symbol
+        action_keys = self._newest_action_keys(sorted(by_stock))
+        results = {}
+        with STAGE_TIME.time(stage='analytics_batch_summary'):
+            for stock_key, rows in sorted(by_stock.items()):
+                analytics = summarize_prices(symbol(stock_key), [
+                    (date(date_key), close, volume) for date_key, close, volume in rows
+                ])
+                analytics['action_key'] = action_keys.get(stock_key, 0)
+                results[symbol(stock_key)] = analytics
+        return results
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_price_history(self, symbol, start=None, end=None, cursor=None,
+                          limit=HISTORY_PAGE_SIZE):
+        """One page of daily bars between the start and end dates, oldest first
+        
+        Pages are keyed on (stock_key, date_key) rather than OFFSET: `cursor`
+        is the date_key of the last bar already returned, so every page is an
+        index range scan no matter how deep into the history it starts.
+        Returns (bars, next_cursor), with next_cursor None after the last
+        page, or None for an unknown symbol.
+        """
+        stock_key = self.dimensions.stock_key(symbol)
+        if stock_key is None:
+            return None
+        
+        after = max(date_key_of(start) - 1 if start else 0, int(cursor or 0))
+        end_key = date_key_of(end) if end else 99991231
+        # One row past the page tells whether another page follows
+        rows = []
+        if self.archives.partitions():
+            rows = self.archives.range_rows(stock_key, HISTORY_COLUMNS, after, end_key, limit + 1)
+        if len(rows) <= limit:
+            rows += self._fact_conn(stock_key).execute(f'''
+                SELECT date_key, {HISTORY_COLUMNS}
+                FROM fact_stock_prices
+                WHERE stock_key = ? AND date_key > ? AND date_key <= ?
+                ORDER BY date_key
+                LIMIT ?
+            ''', (stock_key, rows[-1][0] if rows else after, end_key,
+                  limit + 1 - len(rows))).fetchall()
+        
+        page = rows[:limit]
+        date = self.dimensions.date
+        bars = [(date(row[0]),) + row[1:] for row in page]
+        return bars, (page[-1][0] if len(rows) > limit else None)
+    
+    def iter_price_history(self, symbol, start=None, end=None, cursor=None,
+                           page_size=HISTORY_PAGE_SIZE):
+        """Yield pages of bars until the range is exhausted, holding one page at a time"""
+        while True:
+            result = self.get_price_history(symbol, start, end, cursor, page_size)
+            if result is None:
+                return
+            bars, cursor = result
+            if bars:
+                yield bars
+            if cursor is None:
+                return
+    
+    def _window_rows(self, stock_keys, days, conn=None):
+        """(stock_key, date_key, close_price, volume) rows of each stock's newest `days` bars"""
+        conn = conn or self.conn
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in stock_keys)
+        # Each symbol's cutoff is its days-th newest bar, found by an index seek,
+        # so only the requested window is read for every symbol
+        cursor.execute(f'''
+            WITH windows AS (
+                SELECT s.stock_key,
+                       COALESCE((
+                           SELECT f2.date_key FROM fact_stock_prices f2
+                           WHERE f2.stock_key = s.stock_key
+                           ORDER BY f2.date_key DESC
+                           LIMIT 1 OFFSET ?
+                       ), 0) AS cutoff
+                FROM dim_stock s
+                WHERE s.stock_key IN ({placeholders})
+            )
+            SELECT f.stock_key, f.date_key, f.close_price, f.volume
+            FROM windows w
+            JOIN fact_stock_prices f ON f.stock_key = w.stock_key AND f.date_key >= w.cutoff
+            ORDER BY f.stock_key, f.date_key
+        ''', [days - 1] + list(stock_keys))
+        return cursor.fetchall()
+    
+    @REGISTRY.timed(QUERY_TIME)
+    def get_adjusted_windows(self, stock_keys, days):
+        """{stock_key: (date_key, close_price, volume) rows, oldest first} of each stock's
+        newest `days` bars
+        
+        Stocks with less hot history than requested continue into the
+        archives, and every window is adjusted for splits and dividends.
+        Stocks without bars are left out.
+        """
+        by_stock = {stock_key: [row[1:] for row in rows]
+                    for stock_key, rows in groupby(self._window_rows(stock_keys, days),
+                                                   key=itemgetter(0))}
+        
+        if self.archives.partitions():
+            for stock_key in stock_keys:
+                rows = by_stock.get(stock_key, [])
+                if len(rows) < days:
+                    older = self.archives.recent_rows(stock_key, 'close_price, volume',
+                                                      days - len(rows),
+                                                      rows[0][0] if rows else None)
+                    if older:
+                        by_stock[stock_key] = older[::-1] + rows
+        
+        for stock_key, actions in self.get_corporate_actions_many(sorted(by_stock)).items():
+            by_stock[stock_key] = self._adjusted(stock_key, by_stock[stock_key], actions)
+        return by_stock
+    
+    def _fact_conn(self, stock_key):
+        """Connection holding a stock's fact rows"""
+        return self.conn
+    
+    def _recent_prices(self, stock_key, columns, days):
+        """Newest `days` (date_key, *columns) rows for a stock, newest first
+        
+        date_key orders like date, so the (stock_key, date_key) index serves
+        the LIMIT without sorting the stock's whole history. Archives are only
+        attached when the hot table holds fewer rows than requested.
+        """
+        rows = self._fact_conn(stock_key).execute(f'''
+            SELECT date_key, {columns}
+            FROM fact_stock_prices
+            WHERE stock_key = ?
+            ORDER BY date_key DESC
+            LIMIT ?
+        ''', (stock_key, days)).fetchall()
+        if len(rows) < days and self.archives.partitions():
+            rows += self.archives.recent_rows(stock_key, columns, days - len(rows),
+                                              rows[-1][0] if rows else None)
+        return rows
+    
+    @REGISTRY.timed(QUERY_TIME)
     def get_all_stocks(self):
         """Get list of all stocks in database"""
         cursor = self.conn.cursor()
         cursor.execute('SELECT symbol, company_name, sector FROM dim_stock')
         return cursor.fetchall()
     
+    def get_slow_queries(self):
+        """Get recorded slow statements, oldest first"""
+        return self.slow_query_log.snapshot() if self.slow_query_log else []
+    
+    def database_files(self):
+        """(path, connection) for every database file this warehouse writes to"""
+        return [(self.db_path, self.conn)]
+    
     def close(self):
         """Close database connection"""
         if self.conn:
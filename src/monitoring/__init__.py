@@ -0,0 +1,5 @@
+from .metrics import REGISTRY, Counter, Histogram, MetricsRegistry
+from .slow_query import InstrumentedConnection, SlowQueryLog
+
+__all__ = ['REGISTRY', 'Counter', 'Histogram', 'MetricsRegistry',
+           'InstrumentedConnection', 'SlowQueryLog']
@@ -0,0 +1,33 @@
+import cProfile
+import io
+import pstats
+
+
+class RequestProfiler:
+    """cProfile wrapper producing a text summary for a single request"""
+
+    def __init__(self, sort_by='cumulative', limit=40):
+        self.sort_by = sort_by
+        self.limit = limit
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def start(self):
+        try:
+            self.profile.enable()
+            self.active = True
+        except ValueError:
+            # Another profiler is already running in this interpreter
+            self.active = False
+        return self.active
+
+    def stop(self):
+        if self.active:
+            self.profile.disable()
+            self.active = False
+
+    def summary(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.strip_dirs().sort_stats(self.sort_by).print_stats(self.limit)
+        return stream.getvalue()
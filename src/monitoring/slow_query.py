@@ -0,0 +1,123 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Progress handler granularity in SQLite VM instructions
+PROGRESS_STEPS = 1000
+
+
+class SlowQueryLog:
+    """Ring buffer of statements slower than a wall-time threshold
+
+    Each entry records the SQL, its parameters, the expanded statement seen
+    by sqlite3's trace callback, an estimate of VM steps from the progress
+    handler and the EXPLAIN QUERY PLAN rows for reads. Timing covers
+    execute(), which for SQLite includes sorting and the first row step.
+    executemany entries carry the batch size in place of parameters.
+    """
+
+    def __init__(self, threshold_ms=100, max_entries=200):
+        self.threshold = threshold_ms / 1000.0
+        self.entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, conn, sql, params, elapsed, expanded=None, vm_steps=0):
+        if elapsed < self.threshold:
+            return None
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'sql': ' '.join(sql.split()),
+            'params': params,
+            'expanded_sql': ' '.join(expanded.split()) if expanded else None,
+            'vm_steps': vm_steps,
+            'plan': self._explain(conn, sql, params),
+        }
+        with self._lock:
+            self.entries.append(entry)
+        logger.warning('Slow query (%.1f ms): %s params=%r plan=%s',
+                       entry['elapsed_ms'], entry['sql'], params, entry['plan'])
+        return entry
+
+    def _explain(self, conn, sql, params):
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')) or isinstance(params, int):
+            return None
+        try:
+            cursor = sqlite3.Connection.cursor(conn)
+            rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+            return [row[-1] for row in rows]
+        except sqlite3.Error:
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.entries)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's wall time to the connection's slow log"""
+
+    def execute(self, sql, params=()):
+        return self.connection._observe(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self.connection._observe(lambda s, _: super(InstrumentedCursor, self).executemany(s, seq_of_params),
+                                 sql, len(seq_of_params))
+        return self
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors feed a SlowQueryLog
+
+    Pass as `factory=` to sqlite3.connect, then call `enable_slow_query_log`.
+    """
+
+    slow_query_log = None
+
+    def enable_slow_query_log(self, log):
+        self.slow_query_log = log
+        self._local = threading.local()
+        self.set_trace_callback(self._trace)
+        self.set_progress_handler(self._progress, PROGRESS_STEPS)
+
+    def _trace(self, statement):
+        # Skip the implicit BEGIN and trigger sub-statements
+        local = self._local
+        if not hasattr(local, 'expanded') and not statement.startswith(('BEGIN', '--')):
+            local.expanded = statement
+
+    def _progress(self):
+        local = self._local
+        local.steps = getattr(local, 'steps', 0) + PROGRESS_STEPS
+        return 0
+
+    def _observe(self, execute, sql, params):
+        log = self.slow_query_log
+        if log is None:
+            return execute(sql, params)
+        local = self._local
+        local.steps = 0
+        if hasattr(local, 'expanded'):
+            del local.expanded
+        started = time.perf_counter()
+        try:
+            return execute(sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            log.record(self, sql, params, elapsed,
+                       expanded=getattr(local, 'expanded', None), vm_steps=local.steps)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
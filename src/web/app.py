@@ -1,8 +1,21 @@
-from flask import Flask, render_template, jsonify, request
-from src.database import StockDataWarehouse
-from src.data import StockDataLoader
+import json
+import time
+from datetime import datetime
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+from src.database.sharding import open_warehouse
+from src.database.dimensions import date_key_of
+from src.data.journal import IngestJournal
+from src.monitoring import REGISTRY
+from src.monitoring.profiling import RequestProfiler
+from .singleflight import SingleFlight
 from config.config import Config
 
+REQUEST_TIME = REGISTRY.histogram('http_request_seconds', 'Flask request latency by route')
+REQUESTS = REGISTRY.counter('http_requests_total', 'Flask requests by route and status')
+SERIALIZE_TIME = REGISTRY.histogram('http_serialize_seconds', 'Time spent building JSON responses')
+
+HISTORY_FIELDS = ('date', 'open', 'high', 'low', 'close', 'adj_close', 'volume')
+
 def create_app(config=None):
     app = Flask(__name__, template_folder='templates')
     
@@ -11,8 +24,139 @@ def create_app(config=None):
     else:
         app.config.from_object(Config)
     
-    warehouse = StockDataWarehouse(app.config['DATABASE_PATH'])
-    loader = StockDataLoader(warehouse)
+    REGISTRY.enabled = app.config.get('METRICS_ENABLED', True)
+    
+    warehouse = open_warehouse(app.config['DATABASE_PATH'],
+                               shards=app.config.get('WAREHOUSE_SHARDS', 1),
+                               compact=app.config.get('COMPACT_STORAGE', False),
+                               slow_query_ms=app.config.get('SLOW_QUERY_MS'))
+    journal = None
+    if app.config.get('INGEST_JOURNAL_DIR'):
+        # Finish any loads that were staged but not committed before a crash
+        journal = IngestJournal(app.config['INGEST_JOURNAL_DIR'])
+        journal.replay(warehouse)
+    if app.config.get('MAINTENANCE_INTERVAL'):
+        # ANALYZE, incremental vacuum and WAL checkpoints on a background thread
+        from src.database.maintenance import MaintenanceScheduler
+        app.extensions['maintenance'] = MaintenanceScheduler(
+            warehouse, app.config['MAINTENANCE_INTERVAL']
+        ).start()
+    publisher = snapshots = None
+    if app.config.get('SNAPSHOT_PATH'):
+        # Price reads serve an immutable copy that is republished after each load
+        from src.database.snapshot import SnapshotPublisher, SnapshotReader
+        publisher = SnapshotPublisher(warehouse, app.config['SNAPSHOT_PATH'])
+        publisher.publish()
+        snapshots = SnapshotReader(app.config['SNAPSHOT_PATH'],
+                                   mmap_size=app.config.get('SNAPSHOT_MMAP_SIZE', 0),
+                                   slow_query_ms=app.config.get('SLOW_QUERY_MS'))
+    loaders = []
+    
+    def get_loader():
+        """Create the loader, and import pandas/yfinance, on the first load request"""
+        if not loaders:
+            from src.data import StockDataLoader
+            
+            def on_ingest(symbol):
+                from src.database.alerts import evaluate_alerts
+                from src.database.portfolio import update_nav
+                evaluate_alerts(warehouse, [symbol])
+                update_nav(warehouse, stock_keys=[warehouse.get_stock_by_symbol(symbol)])
+                if publisher:
+                    publisher.publish()
+            
+            source = None
+            if app.config.get('MARKET_CACHE_DIR'):
+                from src.data.cache import CachedSource
+                from src.data.sources import YahooFinanceSource
+                source = CachedSource(YahooFinanceSource(), app.config['MARKET_CACHE_DIR'],
+                                      info_ttl=app.config.get('MARKET_CACHE_INFO_TTL'),
+                                      bars_ttl=app.config.get('MARKET_CACHE_BARS_TTL'),
+                                      max_bytes=app.config.get('MARKET_CACHE_MAX_BYTES'),
+                                      offline=app.config.get('MARKET_CACHE_OFFLINE', False))
+            loaders.append(StockDataLoader(warehouse, journal=journal, on_ingest=on_ingest,
+                                           source=source))
+        return loaders[0]
+    
+    risk_caches = []
+    
+    def get_risk_cache():
+        """Create the risk cache, and import numpy, on the first risk request"""
+        if not risk_caches:
+            from src.database.risk import RiskCache
+            risk_caches.append(RiskCache(app.config.get('RISK_CACHE_ENTRIES', 32)))
+        return risk_caches[0]
+    
+    def reader():
+        """Warehouse for read routes: the latest snapshot when snapshots are enabled
+        
+        The snapshot is pinned until the request ends, so a publish cannot
+        close it under a running request; streamed bodies add their own pin.
+        """
+        if not snapshots:
+            return warehouse
+        if 'snapshot' not in g:
+            g.snapshot = snapshots.acquire()
+        return g.snapshot
+    
+    # Identical concurrent requests share one query or load instead of repeating it
+    analytics_flights = SingleFlight('analytics')
+    risk_flights = SingleFlight('risk')
+    load_flights = SingleFlight('add_stock')
+    
+    def coalesced(flights, key, fn):
+        if not app.config.get('COALESCE_REQUESTS', True):
+            return fn()
+        return flights.do(key, fn)
+    
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_TIME.observe(time.perf_counter() - started, route=route, method=request.method)
+            REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+    
+    @app.teardown_request
+    def release_snapshot(exc):
+        snapshot = g.pop('snapshot', None)
+        if snapshot is not None:
+            snapshots.release(snapshot)
+    
+    @app.before_request
+    def start_profiler():
+        if not app.config.get('PROFILING_ENABLED'):
+            return
+        if request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+            profiler = RequestProfiler()
+            if profiler.start():
+                g.profiler = profiler
+    
+    @app.after_request
+    def attach_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        return Response(profiler.summary(), mimetype='text/plain')
+    
+    @app.route('/debug/slow_queries')
+    def slow_queries():
+        if not app.config.get('PROFILING_ENABLED'):
+            return jsonify({'error': 'Profiling is disabled'}), 404
+        entries = warehouse.get_slow_queries()
+        if snapshots:
+            entries += reader().get_slow_queries()
+        return jsonify({'slow_queries': entries})
+    
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
     
     @app.route('/')
     def index():
@@ -26,21 +170,223 @@ def create_app(config=None):
         if not symbol:
             return jsonify({'success': False, 'message': 'No symbol provided'})
         
-        success, message = loader.add_stock_with_data(symbol)
+        success, message = coalesced(load_flights, symbol,
+                                     lambda: get_loader().add_stock_with_data(symbol))
         return jsonify({'success': success, 'message': message})
     
     @app.route('/stocks')
     def get_stocks():
-        stocks = warehouse.get_all_stocks()
+        stocks = reader().get_all_stocks()
         return jsonify({'stocks': stocks})
     
     @app.route('/analytics/<symbol>')
     def get_analytics(symbol):
-        analytics = warehouse.get_stock_analytics(symbol)
+        symbol = symbol.upper()
+        # ?since=<date_key or date> returns only newer chart bars for incremental redraws;
+        # ?action_key=<n> from the drawn chart asks for a replot after a new split or dividend
+        since = request.args.get('since') or None
+        if since is not None:
+            try:
+                since = int(since) if since.isdigit() else date_key_of(
+                    datetime.strptime(since, '%Y-%m-%d'))
+            except ValueError:
+                return jsonify({'error': 'since must be a date_key or YYYY-MM-DD'}), 400
+        action_key = request.args.get('action_key') or None
+        if action_key is not None:
+            if not action_key.isdigit():
+                return jsonify({'error': 'action_key must be an integer'}), 400
+            action_key = int(action_key)
+        analytics = coalesced(analytics_flights, (symbol, 90, since, action_key),
+                              lambda: reader().get_stock_analytics(symbol, since=since,
+                                                                   action_key=action_key))
         if analytics:
-            return jsonify(analytics)
+            with SERIALIZE_TIME.time(route='analytics'):
+                return jsonify(analytics)
         return jsonify({'error': 'No data found'})
     
+    @app.route('/analytics/batch', methods=['POST'])
+    def get_analytics_batch():
+        data = request.json or {}
+        symbols = [str(symbol).upper() for symbol in data.get('symbols', []) if symbol]
+        try:
+            days = int(data.get('days', app.config.get('CHART_DISPLAY_DAYS', 90)))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'days must be an integer'}), 400
+        if days < 1:
+            return jsonify({'error': 'days must be at least 1'}), 400
+        
+        if not symbols:
+            return jsonify({'error': 'No symbols provided'}), 400
+        max_symbols = app.config.get('BATCH_MAX_SYMBOLS', 200)
+        if len(symbols) > max_symbols:
+            return jsonify({'error': f'At most {max_symbols} symbols per request'}), 400
+        
+        analytics = coalesced(analytics_flights, (tuple(symbols), days),
+                              lambda: reader().get_stock_analytics_many(symbols, days))
+        with SERIALIZE_TIME.time(route='analytics_batch'):
+            return jsonify({
+                'analytics': analytics,
+                'missing': [symbol for symbol in symbols if symbol not in analytics]
+            })
+    
+    @app.route('/risk')
+    def get_risk():
+        from src.database.risk import CHUNK_SYMBOLS, compute_risk
+        
+        symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',')
+                   if symbol.strip()] or None
+        benchmark = request.args.get('benchmark', app.config.get('RISK_BENCHMARK', 'SPY')).upper()
+        try:
+            days = int(request.args.get('days', app.config.get('RISK_DAYS', 252)))
+            confidence = float(request.args.get('confidence', 0.95))
+            window = int(request.args.get('window', 21))
+        except ValueError:
+            return jsonify({'error': 'days and window must be integers, confidence a number'}), 400
+        if not (2 <= window <= days and 0.5 <= confidence < 1):
+            return jsonify({'error': 'Need 2 <= window <= days and 0.5 <= confidence < 1'}), 400
+        series = request.args.get('series') == '1'
+        
+        # Pin one warehouse so the version and the results come from the same data
+        source = reader()
+        if source.get_stock_by_symbol(benchmark) is None:
+            if 'benchmark' in request.args:
+                return jsonify({'error': f'Unknown benchmark: {benchmark}'}), 400
+            benchmark = None
+        
+        # Results stay cached until the next load bumps the ingest version
+        version = source.get_ingest_version()
+        key = (tuple(symbols) if symbols else None, benchmark, days, confidence, window, series)
+        risk = coalesced(risk_flights, (version,) + key, lambda: get_risk_cache().get(
+            version, key, lambda: compute_risk(
+                source, symbols, benchmark, days, confidence, window, series,
+                chunk_symbols=app.config.get('RISK_CHUNK_SYMBOLS', CHUNK_SYMBOLS)
+            )
+        ))
+        with SERIALIZE_TIME.time(route='risk'):
+            return jsonify({
+                'benchmark': benchmark,
+                'days': days,
+                'confidence': confidence,
+                'window': window,
+                'ingest_version': version,
+                'risk': risk,
+                'missing': [symbol for symbol in symbols if symbol not in risk] if symbols else []
+            })
+    
+    @app.route('/alerts')
+    def get_alerts():
+        symbol = request.args.get('symbol')
+        since = request.args.get('since')
+        try:
+            if since:
+                datetime.strptime(since, '%Y-%m-%d')
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return jsonify({'error': 'since must be YYYY-MM-DD and limit an integer'}), 400
+        limit = max(1, min(limit, 1000))
+        alerts = reader().get_alerts(symbol.upper() if symbol else None, since, limit)
+        return jsonify({'alerts': alerts})
+    
+    @app.route('/alerts/rules', methods=['GET', 'POST'])
+    def alert_rules():
+        if request.method == 'GET':
+            symbol = request.args.get('symbol')
+            # Rules are user writes, read live so a new rule shows up at once
+            rules = warehouse.get_alert_rules(symbol.upper() if symbol else None)
+            return jsonify({'rules': [
+                dict(zip(('rule_key', 'symbol', 'rule_type', 'lookback', 'threshold'), rule))
+                for rule in rules
+            ]})
+        
+        data = request.json or {}
+        try:
+            rule_key = warehouse.add_alert_rule(str(data.get('symbol', '')).upper(),
+                                                data.get('rule_type'), data.get('lookback'),
+                                                data.get('threshold'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'rule_key': rule_key})
+    
+    @app.route('/portfolio', methods=['POST'])
+    def create_portfolio():
+        name = str((request.json or {}).get('name', '')).strip()
+        if not name:
+            return jsonify({'success': False, 'message': 'No name provided'}), 400
+        return jsonify({'success': True, 'portfolio_id': warehouse.add_portfolio(name)})
+    
+    @app.route('/portfolio/<int:portfolio_id>/transactions', methods=['POST'])
+    def add_transaction(portfolio_id):
+        from src.database.portfolio import update_nav
+        
+        data = request.json or {}
+        try:
+            datetime.strptime(str(data.get('date')), '%Y-%m-%d')
+            transaction_key = warehouse.add_transaction(
+                portfolio_id, str(data.get('symbol', '')).upper(), data['date'],
+                data['quantity'], data['price']
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'Invalid transaction: {e}'}), 400
+        update_nav(warehouse, [portfolio_id])
+        return jsonify({'success': True, 'transaction_id': transaction_key})
+    
+    @app.route('/portfolio/<int:portfolio_id>')
+    def get_portfolio(portfolio_id):
+        try:
+            days = int(request.args.get('days', app.config.get('CHART_DISPLAY_DAYS', 90)))
+        except ValueError:
+            return jsonify({'error': 'days must be an integer'}), 400
+        if days < 1:
+            return jsonify({'error': 'days must be at least 1'}), 400
+        # Portfolios and their NAV change with user writes, which do not republish
+        # the snapshot, so they are read live like the rules
+        portfolio = warehouse.get_portfolio(portfolio_id, days)
+        if portfolio is None:
+            return jsonify({'error': 'No such portfolio'}), 404
+        with SERIALIZE_TIME.time(route='portfolio'):
+            return jsonify(portfolio)
+    
+    @app.route('/history/<symbol>')
+    def get_history(symbol):
+        symbol = symbol.upper()
+        start, end = request.args.get('start'), request.args.get('end')
+        try:
+            for value in (start, end):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+            limit = int(request.args.get('limit', app.config.get('HISTORY_PAGE_SIZE', 1000)))
+        except ValueError:
+            return jsonify({'error': 'start/end must be YYYY-MM-DD, cursor and limit integers'}), 400
+        limit = max(1, min(limit, app.config.get('HISTORY_MAX_PAGE_SIZE', 5000)))
+        
+        # Pin one warehouse so a stream is not cut short by a snapshot swap
+        source = reader()
+        if source.get_stock_by_symbol(symbol) is None:
+            return jsonify({'error': 'No data found'}), 404
+        
+        if (request.args.get('format') == 'ndjson'
+                or request.accept_mimetypes.best == 'application/x-ndjson'):
+            # One bar per line, read a page at a time, so memory stays flat for any range
+            def lines():
+                for bars in source.iter_price_history(symbol, start, end, cursor, limit):
+                    yield ''.join(json.dumps(dict(zip(HISTORY_FIELDS, bar))) + '\n'
+                                  for bar in bars)
+            response = Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+            if snapshots:
+                # The body is sent after the request ends; keep the snapshot until it is closed
+                snapshots.retain(source)
+                response.call_on_close(lambda: snapshots.release(source))
+            return response
+        
+        bars, next_cursor = source.get_price_history(symbol, start, end, cursor, limit)
+        with SERIALIZE_TIME.time(route='history'):
+            return jsonify({
+                'symbol': symbol,
+                'bars': [dict(zip(HISTORY_FIELDS, bar)) for bar in bars],
+                'next_cursor': next_cursor
+            })
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,104 @@
+import unittest
+import os
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.data.loader import StockDataLoader
+from src.data.sources import SyntheticSource
+
+class SplittingSource(SyntheticSource):
+    def history(self, symbol, start_date, end_date):
+        df = super().history(symbol, start_date, end_date)
+        df.iloc[-5, df.columns.get_loc('Stock Splits')] = 2.0
+        return df
+
+class TestCorporateActions(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_adjustments.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.warehouse.populate_date_dimension(datetime(2024, 1, 1), datetime(2024, 1, 10))
+        self.stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        for day, close in [(2, 400.0), (3, 404.0), (4, 101.0), (5, 100.0)]:
+            self.warehouse.insert_stock_price(
+                20240100 + day, self.stock_key, close, close, close, close, close, 1000
+            )
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_split_adjusts_prior_history(self):
+        self.warehouse.add_corporate_action(self.stock_key, 20240104, 'split', 4.0)
+
+        df = self.warehouse.get_adjusted_prices('AAPL')
+        self.assertEqual(list(df['close_price']), [100.0, 101.0, 101.0, 100.0])
+        self.assertEqual(list(df['volume']), [4000, 4000, 1000, 1000])
+
+    def test_dividend_uses_previous_close(self):
+        self.warehouse.add_corporate_action(self.stock_key, 20240105, 'dividend', 1.01)
+
+        df = self.warehouse.get_adjusted_prices('AAPL')
+        self.assertAlmostEqual(df['close_price'].iloc[0], 400.0 * 0.99)
+        self.assertAlmostEqual(df['close_price'].iloc[2], 101.0 * 0.99)
+        self.assertEqual(df['close_price'].iloc[3], 100.0)
+
+    def test_window_keeps_requested_days(self):
+        self.warehouse.add_corporate_action(self.stock_key, 20240103, 'dividend', 4.0)
+
+        df = self.warehouse.get_adjusted_prices('AAPL', days=3)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df['date'].iloc[0], '2024-01-03')
+
+    def test_analytics_are_adjusted(self):
+        self.warehouse.add_corporate_action(self.stock_key, 20240104, 'split', 4.0)
+
+        analytics = self.warehouse.get_stock_analytics('AAPL')
+        self.assertEqual([bar['close_price'] for bar in analytics['chart_data']],
+                         [100.0, 101.0, 101.0, 100.0])
+        self.assertEqual((analytics['high'], analytics['low'], analytics['avg_volume']),
+                         (101.0, 100.0, 2500))
+        self.assertEqual(self.warehouse.get_stock_analytics_many(['AAPL'])['AAPL'], analytics)
+        # The split falls inside the window, so the cheap path for `since` is not used
+        since = self.warehouse.get_stock_analytics('AAPL', since=20240103)
+        self.assertEqual(since['chart_data'], analytics['chart_data'][2:])
+        self.assertEqual(since['high'], 101.0)
+
+    def test_action_recorded_after_the_chart_asks_for_a_replot(self):
+        # The client's chart of the raw bars, refreshed once the newest bar is loaded
+        chart = self.warehouse.get_stock_analytics('AAPL')
+        self.assertEqual(chart['action_key'], 0)
+        refresh = self.warehouse.get_stock_analytics('AAPL', since=20240105, action_key=0)
+        self.assertEqual((refresh['replot'], refresh['chart_data']), (False, []))
+
+        # The split adjusts bars the client already drew
+        self.warehouse.add_corporate_action(self.stock_key, 20240104, 'split', 4.0)
+        refresh = self.warehouse.get_stock_analytics('AAPL', since=20240105, action_key=0)
+        self.assertTrue(refresh['replot'])
+        self.assertEqual([bar['close_price'] for bar in refresh['chart_data']],
+                         [100.0, 101.0, 101.0, 100.0])
+        self.assertGreater(refresh['action_key'], 0)
+
+        # Redrawn with the new action_key, refreshes are incremental again
+        again = self.warehouse.get_stock_analytics('AAPL', since=20240105,
+                                                   action_key=refresh['action_key'])
+        self.assertEqual((again['replot'], again['chart_data']), (False, []))
+
+    def test_loader_commits_actions_with_the_prices(self):
+        loader = StockDataLoader(self.warehouse, source=SplittingSource())
+        # Writing the split fails, so the prices must not be committed either
+        self.warehouse.conn.execute('DROP TABLE fact_corporate_actions')
+        self.assertFalse(loader.add_stock_with_data('MSFT', days=30)[0])
+        self.assertIsNone(self.warehouse.get_stock_analytics('MSFT'))
+
+        self.warehouse.create_star_schema()
+        self.assertTrue(loader.add_stock_with_data('MSFT', days=30)[0])
+        stock_key = self.warehouse.get_stock_by_symbol('MSFT')
+        actions = self.warehouse.get_corporate_actions(stock_key)
+        self.assertEqual([action[1:] for action in actions], [('split', 2.0)])
+
+    def test_unknown_action_type(self):
+        with self.assertRaises(ValueError):
+            self.warehouse.add_corporate_action(self.stock_key, 20240104, 'merger', 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import os
+import shutil
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.database.alerts import evaluate_alerts
+from src.database.retention import archive_history
+from src.web import create_app
+
+DATE_KEYS = [20240102, 20240103, 20240104, 20240105, 20240108, 20240109]
+CLOSES = [10.0, 10.0, 10.0, 9.0, 9.0, 12.0]
+OPENS = [10.0, 10.0, 10.0, 9.0, 9.0, 11.0]
+
+RULES = [
+    ('cross_above_sma', 3, None),
+    ('cross_below_sma', 3, None),
+    ('gap_up', None, 10.0),
+    ('gap_down', None, 5.0),
+    ('new_high', 3, None),
+]
+EXPECTED = [
+    ('2024-01-05', 'cross_below_sma'),
+    ('2024-01-05', 'gap_down'),
+    ('2024-01-09', 'cross_above_sma'),
+    ('2024-01-09', 'gap_up'),
+    ('2024-01-09', 'new_high'),
+]
+
+class TestAlerts(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_alerts.db'
+        self.archive_dir = 'test_alerts_archive'
+        self.warehouse = StockDataWarehouse(self.test_db)
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _insert(self, stock_key, bars, scale=1.0):
+        self.warehouse.insert_stock_prices([
+            (DATE_KEYS[i], stock_key, OPENS[i] * scale, (CLOSES[i] + 0.5) * scale,
+             (CLOSES[i] - 0.5) * scale, CLOSES[i] * scale, CLOSES[i] * scale, 1000)
+            for i in bars
+        ])
+
+    def _add_rules(self, symbol):
+        for rule_type, lookback, threshold in RULES:
+            self.warehouse.add_alert_rule(symbol, rule_type, lookback, threshold)
+
+    def _triggered(self, alerts):
+        return sorted((alert['date'], alert['rule_type']) for alert in alerts)
+
+    def test_each_ingest_only_evaluates_new_bars(self):
+        stock_key = self.warehouse.add_stock('AAA', 'A Corp')
+        self._insert(stock_key, range(3))
+        # Bars loaded before the first rule are history, not news
+        self._add_rules('AAA')
+        self.assertEqual(evaluate_alerts(self.warehouse, ['AAA']), [])
+
+        triggered = []
+        for i in range(3, 6):
+            self._insert(stock_key, [i])
+            triggered += evaluate_alerts(self.warehouse, ['AAA'])
+        self.assertEqual(self._triggered(triggered), EXPECTED)
+        self.assertEqual(evaluate_alerts(self.warehouse), [])
+
+        gap_up = next(alert for alert in triggered if alert['rule_type'] == 'gap_up')
+        self.assertEqual(gap_up['value'], 22.2222)
+        self.assertEqual(self._triggered(self.warehouse.get_alerts('AAA')), EXPECTED)
+        self.assertEqual(len(self.warehouse.get_alerts(since='2024-01-09')), 3)
+
+    def test_splits_are_not_price_moves(self):
+        stock_key = self.warehouse.add_stock('AAA', 'A Corp')
+        # Stored prices are raw: four times higher before the 4:1 split
+        self._insert(stock_key, range(3), scale=4.0)
+        self._add_rules('AAA')
+        self.warehouse.add_corporate_action(stock_key, DATE_KEYS[3], 'split', 4.0)
+
+        triggered = []
+        for i in range(3, 6):
+            self._insert(stock_key, [i])
+            triggered += evaluate_alerts(self.warehouse, ['AAA'])
+        # The same alerts as without the split, and no -77.5% gap_down on the ex-date
+        self.assertEqual(self._triggered(triggered), EXPECTED)
+        gap_down = next(alert for alert in triggered if alert['rule_type'] == 'gap_down')
+        self.assertEqual(gap_down['value'], -10.0)
+
+    def test_trailing_windows_reach_into_the_archives(self):
+        stock_key = self.warehouse.add_stock('AAA', 'A Corp')
+        self._insert(stock_key, range(3))
+        self._add_rules('AAA')
+        archive_history(self.warehouse, self.archive_dir, 1, today=datetime(2024, 1, 6))
+        self.assertEqual(self.warehouse.conn.execute(
+            'SELECT COUNT(*) FROM fact_stock_prices').fetchone()[0], 0)
+
+        triggered = []
+        for i in range(3, 6):
+            self._insert(stock_key, [i])
+            triggered += evaluate_alerts(self.warehouse, ['AAA'])
+        self.assertEqual(self._triggered(triggered), EXPECTED)
+
+    def test_one_pass_matches_incremental(self):
+        first = self.warehouse.add_stock('AAA', 'A Corp')
+        second = self.warehouse.add_stock('BBB', 'B Corp')
+        self._add_rules('AAA')
+        self._add_rules('BBB')
+        self._insert(first, range(6))
+        self._insert(second, range(6))
+
+        alerts = evaluate_alerts(self.warehouse)
+        for symbol in ('AAA', 'BBB'):
+            self.assertEqual(self._triggered(a for a in alerts if a['symbol'] == symbol), EXPECTED)
+
+    def test_rule_validation(self):
+        self.warehouse.add_stock('AAA', 'A Corp')
+        with self.assertRaises(ValueError):
+            self.warehouse.add_alert_rule('AAA', 'moon')
+        with self.assertRaises(ValueError):
+            self.warehouse.add_alert_rule('AAA', 'gap_up')
+        with self.assertRaises(ValueError):
+            self.warehouse.add_alert_rule('MSFT', 'new_high')
+        rule_key = self.warehouse.add_alert_rule('AAA', 'new_high')
+        self.assertEqual(self.warehouse.get_alert_rules('AAA'),
+                         [(rule_key, 'AAA', 'new_high', 252, None)])
+
+    def test_endpoints(self):
+        stock_key = self.warehouse.add_stock('AAA', 'A Corp')
+        self._insert(stock_key, range(5))
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        client = create_app(config).test_client()
+
+        response = client.post('/alerts/rules', json={'symbol': 'aaa', 'rule_type': 'gap_up',
+                                                      'threshold': 10})
+        self.assertTrue(response.get_json()['success'])
+        client.post('/alerts/rules', json={'symbol': 'AAA', 'rule_type': 'new_high', 'lookback': 3})
+        self.assertEqual(client.post('/alerts/rules', json={'symbol': 'AAA'}).status_code, 400)
+        self.assertEqual(len(client.get('/alerts/rules?symbol=AAA').get_json()['rules']), 2)
+
+        self._insert(stock_key, [5])
+        evaluate_alerts(self.warehouse, ['AAA'])
+        alerts = client.get('/alerts?symbol=AAA').get_json()['alerts']
+        self.assertEqual(sorted((alert['date'], alert['rule_type']) for alert in alerts),
+                         [('2024-01-09', 'gap_up'), ('2024-01-09', 'new_high')])
+        # limit is clamped to 1..1000, so a negative one is not unlimited
+        for limit in ('-1', '0', '1'):
+            self.assertEqual(len(client.get(f'/alerts?symbol=AAA&limit={limit}').get_json()['alerts']),
+                             1, limit)
+
+if __name__ == '__main__':
+    unittest.main()
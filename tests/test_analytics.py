@@ -0,0 +1,130 @@
+import unittest
+import json
+import os
+import random
+from datetime import datetime
+import pandas as pd
+from src.database import StockDataWarehouse
+
+def pandas_analytics(warehouse, symbol, days=90):
+    """The original DataFrame implementation, kept as the reference result"""
+    cursor = warehouse.conn.cursor()
+    cursor.execute('''
+        SELECT d.date, f.close_price, f.volume
+        FROM fact_stock_prices f
+        JOIN dim_date d ON f.date_key = d.date_key
+        JOIN dim_stock s ON f.stock_key = s.stock_key
+        WHERE s.symbol = ?
+        ORDER BY d.date DESC
+        LIMIT ?
+    ''', (symbol.upper(), days))
+    data = cursor.fetchall()
+    if not data:
+        return None
+
+    df = pd.DataFrame(data, columns=['date', 'close_price', 'volume'])
+    df = df.sort_values('date')
+    current_price = df['close_price'].iloc[-1]
+    prev_price = df['close_price'].iloc[-2] if len(df) > 1 else current_price
+    price_change = current_price - prev_price
+    price_change_pct = (price_change / prev_price * 100) if prev_price != 0 else 0
+    return {
+        'symbol': symbol.upper(),
+        'current_price': round(current_price, 2),
+        'price_change': round(price_change, 2),
+        'price_change_pct': round(price_change_pct, 2),
+        'high': round(df['close_price'].max(), 2),
+        'low': round(df['close_price'].min(), 2),
+        'avg_volume': int(df['volume'].mean()),
+        'chart_data': df.to_dict('records')
+    }
+
+class TestStockAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_analytics.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.warehouse.populate_date_dimension(datetime(2023, 1, 1), datetime(2024, 12, 31))
+        date_keys = [row[0] for row in self.warehouse.conn.execute(
+            'SELECT date_key FROM dim_date ORDER BY date_key')]
+
+        rng = random.Random(7)
+        for symbol in ('AAPL', 'MSFT', 'FLAT'):
+            stock_key = self.warehouse.add_stock(symbol, symbol)
+            rows = []
+            for date_key in date_keys[:400]:
+                # Half-cent values exercise rounding ties
+                close = 1.0 if symbol == 'FLAT' else round(rng.uniform(1, 500), 3) + 0.005
+                rows.append((date_key, stock_key, close, close, close, close, close,
+                             rng.randint(0, 10 ** 9)))
+            self.warehouse.insert_stock_prices(rows)
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_matches_dataframe_implementation(self):
+        for symbol in ('AAPL', 'msft', 'FLAT'):
+            for days in (1, 2, 90, 1000):
+                # No corporate actions recorded, so nothing adjusts the bars
+                expected = dict(pandas_analytics(self.warehouse, symbol, days), action_key=0)
+                actual = self.warehouse.get_stock_analytics(symbol, days)
+                self.assertEqual(actual, expected)
+                self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_rows_are_ascending(self):
+        dates = [row['date'] for row in self.warehouse.get_stock_analytics('AAPL')['chart_data']]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(dates), 90)
+
+    def test_unknown_symbol(self):
+        self.assertIsNone(self.warehouse.get_stock_analytics('NOPE'))
+
+    def test_batch_matches_single_symbol_results(self):
+        for days in (1, 90, 1000):
+            batch = self.warehouse.get_stock_analytics_many(['aapl', 'MSFT', 'FLAT', 'NOPE'], days)
+            self.assertEqual(sorted(batch), ['AAPL', 'FLAT', 'MSFT'])
+            for symbol, analytics in batch.items():
+                self.assertEqual(analytics, self.warehouse.get_stock_analytics(symbol, days))
+
+    def test_since_returns_newer_bars_with_full_summary(self):
+        for symbol in ('AAPL', 'FLAT'):
+            for days in (1, 2, 90):
+                full = self.warehouse.get_stock_analytics(symbol, days)
+                dates = [bar['date'] for bar in full['chart_data']]
+                for since in (dates[0], dates[-1], '2020-01-01'):
+                    delta = self.warehouse.get_stock_analytics(symbol, days, since=since)
+                    self.assertEqual(delta.pop('since'), int(since.replace('-', '')))
+                    self.assertFalse(delta.pop('replot'))
+                    self.assertEqual(delta, dict(full, chart_data=[
+                        bar for bar in full['chart_data'] if bar['date'] > since]))
+        self.assertIsNone(self.warehouse.get_stock_analytics('NOPE', since=20240101))
+
+    def test_batch_endpoint(self):
+        from src.web import create_app
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        client = create_app(config).test_client()
+
+        response = client.post('/analytics/batch', json={'symbols': ['AAPL', 'NOPE'], 'days': 5})
+        data = response.get_json()
+        self.assertEqual(list(data['analytics']), ['AAPL'])
+        self.assertEqual(len(data['analytics']['AAPL']['chart_data']), 5)
+        self.assertEqual(data['missing'], ['NOPE'])
+        self.assertEqual(client.post('/analytics/batch', json={}).status_code, 400)
+        for days in ('abc', None, 0):
+            self.assertEqual(client.post('/analytics/batch', json={'symbols': ['AAPL'], 'days': days})
+                             .status_code, 400, days)
+        self.assertEqual(client.get('/analytics/AAPL').get_json()['symbol'], 'AAPL')
+
+        last = client.get('/analytics/AAPL').get_json()['chart_data'][-2]['date']
+        delta = client.get(f"/analytics/aapl?since={last.replace('-', '')}").get_json()
+        self.assertEqual(len(delta['chart_data']), 1)
+        self.assertEqual(client.get(f'/analytics/AAPL?since={last}').get_json(), delta)
+        self.assertEqual(client.get('/analytics/AAPL?since=yesterday').status_code, 400)
+        self.assertEqual(client.get(f'/analytics/AAPL?since={last}&action_key=0').get_json(), delta)
+        self.assertEqual(client.get(f'/analytics/AAPL?since={last}&action_key=-1').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.data.backfill import backfill
+from src.data.sources import SyntheticSource
+
+END_DATE = datetime(2024, 6, 28)
+
+class FlakySource(SyntheticSource):
+    """Synthetic bars with a failing symbol, a bad bar and a split"""
+
+    def fetch(self, symbol, start_date, end_date):
+        if symbol == 'FAIL':
+            raise ConnectionError('provider unavailable')
+        info, df = super().fetch(symbol, start_date, end_date)
+        if symbol == 'BAD':
+            df.iloc[3, df.columns.get_loc('Close')] = -1.0
+            df.iloc[10, df.columns.get_loc('Stock Splits')] = 2.0
+        return info, df
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.paths = ['test_backfill_serial.db', 'test_backfill_parallel.db']
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _run(self, path, workers, symbols):
+        warehouse = StockDataWarehouse(path)
+        summary = backfill(warehouse, symbols, FlakySource(seed=3), days=60,
+                           end_date=END_DATE, workers=workers)
+        return warehouse, summary
+
+    def _facts(self, warehouse):
+        return warehouse.conn.execute('''
+            SELECT s.symbol, f.date_key, f.open_price, f.close_price, f.volume
+            FROM fact_stock_prices f JOIN dim_stock s ON f.stock_key = s.stock_key
+            ORDER BY s.symbol, f.date_key
+        ''').fetchall()
+
+    def test_parallel_matches_serial(self):
+        symbols = [f'S{i:03d}' for i in range(12)] + ['bad', 'FAIL']
+        serial, serial_summary = self._run(self.paths[0], 1, symbols)
+        parallel, parallel_summary = self._run(self.paths[1], 3, symbols)
+        try:
+            self.assertEqual(parallel_summary, serial_summary)
+            self.assertEqual(self._facts(parallel), self._facts(serial))
+            self.assertEqual(len(parallel_summary['loaded']), 13)
+            self.assertEqual(parallel_summary['rejected'], 1)
+            self.assertIn('provider unavailable', parallel_summary['failed']['FAIL'])
+        finally:
+            serial.close()
+            parallel.close()
+
+    def test_merge_fills_dimensions_rejects_and_actions(self):
+        warehouse, summary = self._run(self.paths[0], 1, ['BAD', 'S001'])
+        try:
+            stock_key = warehouse.get_stock_by_symbol('BAD')
+            self.assertEqual([row[-1] for row in warehouse.get_price_rejects(stock_key)],
+                             ['nonpositive_price'])
+            self.assertEqual([row[1:] for row in warehouse.get_corporate_actions(stock_key)],
+                             [('split', 2.0)])
+            analytics = warehouse.get_stock_analytics('S001', 1000)
+            self.assertEqual(len(analytics['chart_data']), summary['loaded']['S001'])
+        finally:
+            warehouse.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import os
+import random
+import pandas as pd
+from src.database import StockDataWarehouse
+from src.data.bulk_import import import_dumps
+
+DATES = pd.bdate_range('2024-01-01', periods=12)
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_bulk_import.db'
+        self.dump = 'test_bulk_import.csv'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        rows = []
+        # Date-major like vendor dumps, with lowercase tickers and a time of day
+        for i, date in enumerate(DATES):
+            for j, ticker in enumerate(['aaa', 'bbb', 'ccc']):
+                close = 10.0 * (j + 1) + i / 10
+                rows.append((ticker, f'{date:%Y-%m-%d} 16:00', close, close + 1, close - 1,
+                             close, 1000 + i))
+        df = pd.DataFrame(rows, columns=['Ticker', 'Date', 'Open', 'High', 'Low', 'Close', 'Vol'])
+        df.loc[16, ['Open', 'High', 'Close']] = [100.0, 101.0, 100.0]   # BBB spike
+        df.loc[20, 'Vol'] = 0                                           # CCC zero volume
+        df.loc[30, 'Date'] = 'not a date'
+        df.to_csv(self.dump, index=False)
+
+    def tearDown(self):
+        self.warehouse.close()
+        for path in (self.test_db, self.dump):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _facts(self):
+        return self.warehouse.conn.execute('''
+            SELECT s.symbol, f.date_key, f.close_price, f.volume
+            FROM fact_stock_prices f JOIN dim_stock s ON s.stock_key = f.stock_key
+            ORDER BY s.symbol, f.date_key
+        ''').fetchall()
+
+    def _rejects(self):
+        return self.warehouse.conn.execute(
+            'SELECT stock_key, date_key, reason FROM fact_price_rejects ORDER BY reject_key'
+        ).fetchall()
+
+    def test_streams_chunks_into_the_star_schema(self):
+        stats = import_dumps(self.warehouse, [self.dump], chunk_rows=5,
+                             columns={'Volume': 'Vol'})
+        self.assertEqual((stats['rows'], stats['loaded'], stats['rejected'], stats['skipped']),
+                         (36, 33, 2, 1))
+        self.assertEqual((stats['new_symbols'], stats['loaded_symbols']), (3, ['AAA', 'BBB', 'CCC']))
+        self.assertGreater(stats['rows_per_s'], 0)
+
+        self.assertEqual([self.warehouse.get_stock_by_symbol(s) for s in ('AAA', 'BBB', 'CCC')],
+                         [1, 2, 3])
+        self.assertEqual(self._rejects(), [(2, 20240108, 'outlier_spike'),
+                                           (3, 20240109, 'zero_volume')])
+        self.assertEqual(self.warehouse.conn.execute(
+            'SELECT MIN(date_key), MAX(date_key), COUNT(*) FROM dim_date').fetchone(),
+            (20240101, 20240116, 16))
+        self.assertEqual(self.warehouse.dimensions.date_key('2024-01-16'), 20240116)
+
+    def test_result_does_not_depend_on_chunk_size(self):
+        import_dumps(self.warehouse, [self.dump], chunk_rows=1000, columns={'Volume': 'Vol'})
+        whole = self._facts(), self._rejects()
+        self.warehouse.close()
+        os.remove(self.test_db)
+
+        self.warehouse = StockDataWarehouse(self.test_db)
+        for chunk_rows in (2, 7):
+            import_dumps(self.warehouse, [self.dump], chunk_rows=chunk_rows,
+                         columns={'Volume': 'Vol'})
+            self.assertEqual(self._facts(), whole[0])
+            # Reimports replace facts but quarantine the same rows again
+            self.assertEqual(sorted(self._rejects()[-2:]), whole[1])
+
+    def test_existing_symbols_keep_their_keys(self):
+        stock_key = self.warehouse.add_stock('BBB', 'B Corp', 'Tech')
+        stats = import_dumps(self.warehouse, [self.dump], columns={'Volume': 'Vol'})
+        self.assertEqual(stats['new_symbols'], 2)
+        self.assertEqual(self.warehouse.get_stock_by_symbol('BBB'), stock_key)
+        self.assertIn(('BBB', 'B Corp', 'Tech'), self.warehouse.get_all_stocks())
+        with self.assertRaises(ValueError):
+            import_dumps(self.warehouse, [self.dump], columns={'Volume': 'Shares'})
+
+    def test_zero_volume_repeats_and_late_bars_at_every_chunk_size(self):
+        rng = random.Random(8)
+        rows = []
+        for date in pd.bdate_range('2023-01-02', periods=40):
+            for ticker in ('aaa', 'bbb', 'ccc', 'ddd'):
+                close = round(rng.uniform(10, 12) * (3 if rng.random() < 0.05 else 1), 2)
+                volume = 0 if rng.random() < 0.2 else 1000
+                rows.append((ticker, f'{date:%Y-%m-%d}', close, close, close, close, volume))
+                if rng.random() < 0.05:
+                    # The vendor repeats a bar later in the dump; the last one counts
+                    rows.append((ticker, f'{date:%Y-%m-%d}', close + 1, close + 1, close + 1,
+                                 close + 1, 500))
+            if date.day == 15:
+                rows.append(('aaa', '2023-01-03', 9.0, 9.0, 9.0, 9.0, 100))
+        pd.DataFrame(rows, columns=['Ticker', 'Date', 'Open', 'High', 'Low', 'Close', 'Vol']
+                     ).to_csv(self.dump, index=False)
+
+        results = {}
+        for chunk_rows in (1, 2, 3, 7, 100000):
+            self.warehouse.close()
+            os.remove(self.test_db)
+            self.warehouse = StockDataWarehouse(self.test_db)
+            import_dumps(self.warehouse, [self.dump], chunk_rows=chunk_rows,
+                         columns={'Volume': 'Vol'})
+            results[chunk_rows] = self._facts(), sorted(self._rejects())
+        for chunk_rows, result in results.items():
+            self.assertEqual(result, results[100000], chunk_rows)
+
+        reasons = {reason for _, _, reason in results[100000][1]}
+        self.assertEqual(reasons, {'zero_volume', 'duplicate_date', 'outlier_spike', 'out_of_order'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.database.compact import COMPACT_TABLE, migrate_to_compact, storage_report
+
+class TestCompactStorage(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_compact.db'
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def _load(self, warehouse):
+        warehouse.populate_date_dimension(datetime(2024, 1, 1), datetime(2024, 1, 5))
+        stock_key = warehouse.add_stock('AAPL', 'Apple Inc.')
+        for day in range(1, 6):
+            price = 100.0 + day + 0.1234
+            warehouse.insert_stock_price(20240100 + day, stock_key, price, price, price,
+                                         price, price, 1000 * day)
+        return stock_key
+
+    def test_compact_layout_reads_transparently(self):
+        self.warehouse = StockDataWarehouse(self.test_db, compact=True)
+        self.assertTrue(self.warehouse.compact)
+        self._load(self.warehouse)
+
+        analytics = self.warehouse.get_stock_analytics('AAPL')
+        self.assertEqual(analytics['current_price'], 105.12)
+        self.assertEqual(analytics['chart_data'][0]['close_price'], 101.1234)
+
+    def test_replace_keeps_one_row_per_day(self):
+        self.warehouse = StockDataWarehouse(self.test_db, compact=True)
+        stock_key = self._load(self.warehouse)
+        self.warehouse.insert_stock_price(20240105, stock_key, 1, 1, 1, 2.5, 2.5, 1)
+
+        count = self.warehouse.conn.execute(f'SELECT COUNT(*) FROM {COMPACT_TABLE}').fetchone()[0]
+        self.assertEqual(count, 5)
+        self.assertEqual(self.warehouse.get_stock_analytics('AAPL')['current_price'], 2.5)
+
+    def test_migration_preserves_prices(self):
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self._load(self.warehouse)
+        before = self.warehouse.get_stock_analytics('AAPL')
+
+        self.assertEqual(migrate_to_compact(self.warehouse.conn), 5)
+        report = storage_report(self.warehouse.conn, self.test_db)
+        self.assertEqual(report['layout'], 'compact')
+        self.assertEqual(self.warehouse.get_stock_analytics('AAPL'), before)
+
+        # Reopening detects the existing layout
+        self.warehouse.close()
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.assertTrue(self.warehouse.compact)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import os
+import threading
+from datetime import date, datetime
+from src.database import StockDataWarehouse
+from src.database.dimensions import date_key_of, date_of
+
+class TestDimensionCache(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_dimensions.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.dimensions = self.warehouse.dimensions
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_symbol_and_key_round_trip(self):
+        stock_key = self.warehouse.add_stock('aapl', 'Apple Inc.')
+        self.assertEqual(self.dimensions.stock_key('AAPL'), stock_key)
+        self.assertEqual(self.dimensions.symbol(stock_key), 'AAPL')
+        self.assertEqual(self.warehouse.add_stock('AAPL', 'Apple Inc.'), stock_key)
+        self.assertIsNone(self.dimensions.stock_key('NOPE'))
+
+    def test_loads_lazily_and_sees_other_writers(self):
+        self.assertIsNone(self.dimensions._stock_keys)
+        self.warehouse.add_stock('AAPL', 'Apple Inc.')
+
+        other = StockDataWarehouse(self.test_db)
+        try:
+            msft_key = other.add_stock('MSFT', 'Microsoft')
+        finally:
+            other.close()
+        self.assertEqual(self.warehouse.get_stock_by_symbol('MSFT'), msft_key)
+        self.assertEqual(self.dimensions.symbol(msft_key), 'MSFT')
+
+    def test_symbol_sees_other_writers(self):
+        self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        other = StockDataWarehouse(self.test_db)
+        try:
+            msft_key = other.add_stock('MSFT', 'Microsoft')
+        finally:
+            other.close()
+        # Resolved by key alone, as when rows written elsewhere are read back
+        self.assertEqual(self.dimensions.symbol(msft_key), 'MSFT')
+        self.assertEqual(self.dimensions._stock_keys['MSFT'], msft_key)
+        self.assertIsNone(self.dimensions.symbol(999))
+
+    def test_dates(self):
+        self.warehouse.get_stock_by_symbol('AAPL')
+        self.warehouse.populate_date_dimension(datetime(2024, 2, 27), datetime(2024, 3, 1))
+        self.assertEqual(self.dimensions.date(20240229), '2024-02-29')
+        self.assertEqual(self.dimensions.date_key('2024-03-01'), 20240301)
+        self.assertEqual(self.dimensions.date_key(date(2024, 2, 28)), 20240228)
+        self.assertEqual(date_of(19991231), '1999-12-31')
+        self.assertEqual(date_key_of(datetime(2000, 1, 2, 15, 30)), 20000102)
+
+    def test_concurrent_lookups(self):
+        keys = {f'S{i:03d}': self.warehouse.add_stock(f'S{i:03d}', 'Synthetic') for i in range(50)}
+        self.dimensions.clear()
+        errors = []
+
+        def lookup():
+            for symbol, stock_key in keys.items():
+                if self.dimensions.stock_key(symbol) != stock_key:
+                    errors.append(symbol)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+if __name__ == '__main__':
+    unittest.main()
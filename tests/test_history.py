@@ -0,0 +1,97 @@
+import unittest
+import json
+import os
+import shutil
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.database.retention import archive_history
+from src.web import create_app
+
+TODAY = datetime(2024, 6, 30)
+
+class TestPriceHistory(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_history.db'
+        self.archive_dir = 'test_history_archive'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.warehouse.populate_date_dimension(datetime(2022, 1, 1), TODAY)
+        self.date_keys = [row[0] for row in self.warehouse.conn.execute(
+            'SELECT date_key FROM dim_date WHERE day_of_week < 5 ORDER BY date_key')]
+        stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        self.warehouse.insert_stock_prices([
+            (date_key, stock_key, 1.0, 2.0, 0.5, 1.0 + i / 100, 1.0, 1000 + i)
+            for i, date_key in enumerate(self.date_keys)
+        ])
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _walk(self, limit, **kwargs):
+        bars, cursor, pages = [], None, 0
+        while True:
+            page, cursor = self.warehouse.get_price_history('AAPL', cursor=cursor, limit=limit,
+                                                            **kwargs)
+            bars += page
+            pages += 1
+            if cursor is None:
+                return bars, pages
+
+    def test_cursor_walks_every_bar_once(self):
+        bars, pages = self._walk(100)
+        self.assertEqual([bar[0].replace('-', '') for bar in bars],
+                         [str(date_key) for date_key in self.date_keys])
+        self.assertEqual(pages, -(-len(self.date_keys) // 100))
+        self.assertEqual(bars[0][1:], (1.0, 2.0, 0.5, 1.0, 1.0, 1000))
+
+    def test_date_range_is_inclusive(self):
+        bars, _ = self._walk(7, start='2024-03-01', end='2024-03-29')
+        self.assertEqual(bars[0][0], '2024-03-01')
+        self.assertEqual(bars[-1][0], '2024-03-29')
+        self.assertEqual(len(bars), 21)
+        self.assertIsNone(self.warehouse.get_price_history('MSFT'))
+
+    def test_pages_continue_across_archives(self):
+        before, _ = self._walk(50)
+        archive_history(self.warehouse, self.archive_dir, 365, today=TODAY)
+        after, _ = self._walk(50)
+        self.assertEqual(after, before)
+        self.assertEqual(list(self.warehouse.iter_price_history('AAPL', start='2023-06-01',
+                                                                page_size=1000))[0],
+                         [bar for bar in before if bar[0] >= '2023-06-01'])
+
+    def test_pages_are_index_range_scans(self):
+        plan = ' '.join(row[-1] for row in self.warehouse.conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT date_key, close_price FROM fact_stock_prices
+            WHERE stock_key = 1 AND date_key > 20230101 AND date_key <= 20231231
+            ORDER BY date_key LIMIT 100
+        '''))
+        self.assertIn('idx_fact_stock_date (stock_key=? AND date_key>? AND date_key<?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_endpoint_pages_and_streams(self):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        client = create_app(config).test_client()
+
+        first = client.get('/history/aapl?start=2024-01-01&limit=50').get_json()
+        self.assertEqual(len(first['bars']), 50)
+        self.assertEqual(first['bars'][0]['date'], '2024-01-01')
+        second = client.get(f"/history/aapl?start=2024-01-01&limit=50&cursor={first['next_cursor']}")
+        self.assertEqual(second.get_json()['bars'][0]['date'], '2024-03-11')
+
+        response = client.get('/history/AAPL?start=2024-01-01&format=ndjson&limit=10')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(lines), sum(1 for key in self.date_keys if key >= 20240101))
+        self.assertEqual(lines[-1]['date'], '2024-06-28')
+
+        self.assertEqual(client.get('/history/MSFT').status_code, 404)
+        self.assertEqual(client.get('/history/AAPL?start=yesterday').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cumulative import budgets in milliseconds; IMPORT_BUDGET_SCALE stretches them on slow machines
+BUDGETS_MS = {
+    'src.database': 100,
+    'src.data': 50,
+    'src.web.app': 400,
+}
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance')
+
+def import_profile(module):
+    """Run `python -X importtime -c 'import module'` and return {module: cumulative_us}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.setdefault(name.strip(), int(cumulative))
+    return timings
+
+class TestImportTime(unittest.TestCase):
+    def test_entry_points_skip_heavy_dependencies(self):
+        for module in BUDGETS_MS:
+            timings = import_profile(module)
+            loaded = [name for name in timings if name.split('.')[0] in HEAVY_MODULES]
+            self.assertEqual(loaded, [], f'{module} imports {loaded[:3]} at startup')
+
+    def test_price_load_without_actions_skips_heavy_dependencies(self):
+        script = (
+            'import sys\n'
+            'from src.database import StockDataWarehouse\n'
+            'warehouse = StockDataWarehouse(":memory:")\n'
+            'stock_key = warehouse.add_stock("AAA", "A Corp")\n'
+            'warehouse.insert_stock_prices([(20240102, stock_key, 1.0, 1.0, 1.0, 1.0, 1.0, 10)])\n'
+            'print(sorted(name for name in sys.modules if name.split(".")[0] in %r))\n'
+            % (HEAVY_MODULES,)
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_entry_points_within_budget(self):
+        scale = float(os.getenv('IMPORT_BUDGET_SCALE', '1'))
+        for module, budget_ms in BUDGETS_MS.items():
+            elapsed_ms = import_profile(module)[module] / 1000
+            self.assertLess(elapsed_ms, budget_ms * scale,
+                            f'import {module} took {elapsed_ms:.0f} ms (budget {budget_ms} ms)')
+
+if __name__ == '__main__':
+    unittest.main()
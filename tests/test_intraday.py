@@ -0,0 +1,53 @@
+import unittest
+import os
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.database.intraday import IntradayStore, to_timestamp_key
+
+class TestIntradayStore(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_intraday.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.store = IntradayStore(self.warehouse)
+        self.stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def _bar(self, moment, price):
+        return (to_timestamp_key(moment), price, price, price, price, 100)
+
+    def test_bars_are_partitioned_by_month(self):
+        bars = [
+            self._bar(datetime(2024, 1, 31, 20, 59), 10.0),
+            self._bar(datetime(2024, 2, 1, 14, 30), 11.0),
+            self._bar(datetime(2024, 2, 1, 14, 31), 12.0),
+        ]
+        self.assertEqual(self.store.insert_bars(self.stock_key, 1, bars), 3)
+        self.assertEqual(self.store.get_partitions(), [202401, 202402])
+
+    def test_range_query_spans_partitions_in_order(self):
+        self.store.insert_bars(self.stock_key, 1, [
+            self._bar(datetime(2024, 3, 1, 14, 30), 13.0),
+            self._bar(datetime(2024, 1, 2, 14, 30), 10.0),
+            self._bar(datetime(2024, 2, 1, 14, 30), 11.0),
+        ])
+
+        rows = self.store.get_bars('AAPL', datetime(2024, 1, 15), datetime(2024, 3, 31))
+        self.assertEqual([row[4] for row in rows], [11.0, 13.0])
+        self.assertEqual(self.store.get_partitions(to_timestamp_key(datetime(2024, 2, 10)),
+                                                   to_timestamp_key(datetime(2024, 2, 20))),
+                         [202402])
+
+    def test_intervals_are_kept_apart(self):
+        bar = self._bar(datetime(2024, 1, 2, 14, 30), 10.0)
+        self.store.insert_bars(self.stock_key, 1, [bar])
+        self.store.insert_bars(self.stock_key, 5, [bar])
+
+        rows = self.store.get_bars('AAPL', datetime(2024, 1, 1), datetime(2024, 1, 3), '5m')
+        self.assertEqual(len(rows), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import os
+import shutil
+import sqlite3
+from unittest import mock
+from src.database import StockDataWarehouse
+from src.data.journal import IngestJournal
+
+class TestIngestJournal(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_journal.db'
+        self.journal_dir = 'test_journal'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.journal = IngestJournal(self.journal_dir)
+        self.stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        shutil.rmtree(self.journal_dir, ignore_errors=True)
+
+    def _rows(self, days, price):
+        return [(20240100 + day, self.stock_key, price, price, price, price, price, 100)
+                for day in days]
+
+    def _fact_count(self):
+        return self.warehouse.conn.execute('SELECT COUNT(*) FROM fact_stock_prices').fetchone()[0]
+
+    def test_replay_applies_only_unapplied_segments(self):
+        first = self.journal.append('AAPL', self._rows(range(1, 4), 10.0))
+        self.journal.apply(self.warehouse, first)
+        # Crash after staging the second segment but before committing it
+        self.journal.append('AAPL', self._rows(range(4, 6), 11.0))
+
+        self.assertEqual(len(self.journal.pending(self.warehouse)), 1)
+        self.assertEqual(self.journal.replay(self.warehouse), 2)
+        self.assertEqual(self._fact_count(), 5)
+        self.assertEqual(self.warehouse.get_ingest_checkpoint('AAPL'), 2)
+        self.assertEqual(self.journal.pending(self.warehouse), [])
+
+    def test_replay_commits_staged_corporate_actions(self):
+        split = (self.stock_key, 20240104, 'split', 2.0)
+        # Crash after staging, before the prices and the split commit
+        self.journal.append('AAPL', self._rows(range(1, 6), 10.0), [split])
+        self.assertEqual(self.warehouse.get_corporate_actions(self.stock_key), [])
+
+        self.assertEqual(self.journal.replay(self.warehouse), 5)
+        self.assertEqual([row[1:] for row in self.warehouse.get_corporate_actions(self.stock_key)],
+                         [('split', 2.0)])
+
+    def test_segment_numbers_survive_cleanup(self):
+        self.journal.apply(self.warehouse, self.journal.append('AAPL', self._rows([1], 10.0)))
+        self.journal.append('AAPL', self._rows([2], 10.0))
+
+        self.assertEqual(self.journal.replay(self.warehouse), 1)
+        self.assertEqual(self.warehouse.get_ingest_checkpoint('AAPL'), 2)
+
+    def test_failed_segment_is_applied_before_a_later_one(self):
+        failed = self.journal.append('AAPL', self._rows(range(1, 4), 10.0),
+                                     [(self.stock_key, 20240102, 'dividend', 0.5)])
+        with mock.patch.object(self.warehouse, 'insert_stock_prices',
+                               side_effect=sqlite3.OperationalError('database is locked')):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.journal.apply(self.warehouse, failed)
+
+            # Still failing: the later segment must not jump over the earlier one
+            later = self.journal.append('AAPL', self._rows(range(3, 6), 11.0))
+            with self.assertRaises(sqlite3.OperationalError):
+                self.journal.apply(self.warehouse, later)
+        self.assertEqual(self.journal.pending(self.warehouse), [failed, later])
+
+        self.assertEqual(self.journal.apply(self.warehouse, later), 6)
+        self.assertEqual(self._fact_count(), 5)
+        # The retried earlier segment brings its actions along
+        self.assertEqual(len(self.warehouse.get_corporate_actions(self.stock_key)), 1)
+        # Day 3 comes from the later segment
+        self.assertEqual(self.warehouse.conn.execute(
+            'SELECT close_price FROM fact_stock_prices WHERE date_key = 20240103').fetchone()[0], 11.0)
+        self.assertEqual(self.warehouse.get_ingest_checkpoint('AAPL'), 2)
+
+    def test_pending_does_not_delete_and_compact_does(self):
+        journal = IngestJournal(self.journal_dir, keep_applied=True)
+        journal.apply(self.warehouse, journal.append('AAPL', self._rows([1], 10.0)))
+        staged = self.journal.append('AAPL', self._rows([2], 10.0))
+
+        self.assertEqual(self.journal.pending(self.warehouse), [staged])
+        self.assertEqual(len(os.listdir(self.journal_dir)), 3)   # two segments and SEQUENCE
+        self.assertEqual(self.journal.compact(self.warehouse), 1)
+        self.assertEqual(self.journal.pending(self.warehouse), [staged])
+        self.assertTrue(os.path.exists(staged))
+
+    def test_reapplying_rows_replaces_facts(self):
+        self.warehouse.insert_stock_prices(self._rows(range(1, 4), 10.0))
+        self.warehouse.insert_stock_prices(self._rows(range(1, 4), 12.0))
+
+        self.assertEqual(self._fact_count(), 3)
+        prices = self.warehouse.conn.execute('SELECT DISTINCT close_price FROM fact_stock_prices')
+        self.assertEqual(prices.fetchall(), [(12.0,)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sqlite3
+from datetime import datetime
+from unittest import mock
+from src.database import StockDataWarehouse
+from src.database.maintenance import MaintenanceScheduler, plan_maintenance, run_maintenance
+
+class TestMaintenance(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_maintenance.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.warehouse.populate_date_dimension(datetime(2023, 1, 1), datetime(2024, 12, 31))
+        self.date_keys = [row[0] for row in self.warehouse.conn.execute(
+            'SELECT date_key FROM dim_date ORDER BY date_key')]
+        for i in range(20):
+            self._load(self.warehouse.add_stock(f'S{i:02d}', 'Synthetic'))
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def _load(self, stock_key, price=1.0):
+        self.warehouse.insert_stock_prices([
+            (date_key, stock_key, price, price, price, price, price, 100)
+            for date_key in self.date_keys
+        ])
+
+    def test_new_databases_use_incremental_auto_vacuum(self):
+        self.assertEqual(self.warehouse.conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+
+    def test_analyzes_once_then_only_after_churn(self):
+        report = run_maintenance(self.test_db, detailed=True)
+        self.assertIsNone(report['before']['statistics_drift'])
+        self.assertIn('analyze', report['tasks'])
+        self.assertEqual(report['after']['statistics_drift'], 0.0)
+        self.assertEqual(run_maintenance(self.test_db, detailed=True)['tasks'], ['optimize'])
+
+        for i in range(20, 25):
+            self._load(self.warehouse.add_stock(f'S{i:02d}', 'Synthetic'))
+        self.assertIn('analyze', run_maintenance(self.test_db, detailed=True)['tasks'])
+
+    def test_scheduled_runs_do_not_scan_tables(self):
+        statements = []
+        connect = sqlite3.connect
+
+        def traced(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        run_maintenance(self.test_db)
+        with mock.patch('sqlite3.connect', traced):
+            report = run_maintenance(self.test_db, changes=len(self.date_keys))
+        self.assertEqual(report['tasks'], ['optimize'])
+        self.assertEqual([statement for statement in statements
+                          if 'dbstat' in statement or 'COUNT(' in statement], [])
+        self.assertIsNone(report['before']['fragmentation'])
+        # Churn is weighed against sqlite_stat1's row estimates instead of a recount
+        report = run_maintenance(self.test_db, changes=5 * len(self.date_keys))
+        self.assertIn('analyze', report['tasks'])
+
+    def test_reclaims_free_pages(self):
+        run_maintenance(self.test_db)
+        with self.warehouse.conn:
+            self.warehouse.conn.execute('DELETE FROM fact_stock_prices WHERE stock_key % 2 = 0')
+        report = run_maintenance(self.test_db)
+        self.assertGreater(report['before']['free_ratio'], 0.1)
+        self.assertIn('incremental_vacuum', report['tasks'])
+        self.assertEqual(report['after']['freelist_count'], 0)
+        self.assertLess(report['after']['file_bytes'], report['before']['file_bytes'])
+
+    def test_full_vacuum_converts_old_files(self):
+        path = 'test_maintenance_legacy.db'
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE t (x)')
+        conn.close()
+        try:
+            stats = run_maintenance(path)['after']
+            self.assertEqual(stats['auto_vacuum'], 'none')
+            self.assertNotIn('vacuum', plan_maintenance(stats))
+            report = run_maintenance(path, full_vacuum=True)
+            self.assertIn('vacuum', report['tasks'])
+            self.assertEqual(report['after']['auto_vacuum'], 'incremental')
+        finally:
+            os.remove(path)
+
+    def test_scheduler_counts_churn_from_the_warehouse_connection(self):
+        scheduler = MaintenanceScheduler(self.warehouse, interval=3600)
+        scheduler.run_once()
+        self._load(self.warehouse.get_stock_by_symbol('S00'), price=2.0)
+        self.assertEqual(scheduler.run_once()[self.test_db]['tasks'], ['optimize'])
+
+        for i in range(3):
+            self._load(self.warehouse.get_stock_by_symbol(f'S{i:02d}'), price=3.0)
+        self.assertIn('analyze', scheduler.run_once()[self.test_db]['tasks'])
+
+        scheduler.start()
+        scheduler.stop()
+        self.assertIsNone(scheduler._thread)
+
+if __name__ == '__main__':
+    unittest.main()
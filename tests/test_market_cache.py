@@ -0,0 +1,120 @@
+import unittest
+import os
+import shutil
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.data.cache import CacheMiss, CachedSource
+from src.data.loader import StockDataLoader
+from src.data.sources import SyntheticSource
+
+START, END = datetime(2024, 1, 1), datetime(2024, 6, 28)
+
+class CountingSource(SyntheticSource):
+    """Synthetic data that records every upstream call"""
+
+    def __init__(self, seed=0):
+        super().__init__(seed)
+        self.calls = []
+
+    def info(self, symbol):
+        self.calls.append(('info', symbol))
+        return super().info(symbol)
+
+    def history(self, symbol, start_date, end_date):
+        self.calls.append(('history', symbol))
+        return super().history(symbol, start_date, end_date)
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+class TestMarketCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = 'test_market_cache'
+        self.db_path = 'test_market_cache.db'
+        self.upstream = CountingSource(seed=5)
+        self.clock = Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def _cache(self, **kwargs):
+        return CachedSource(self.upstream, self.cache_dir, clock=self.clock, **kwargs)
+
+    def test_hit_after_miss(self):
+        cache = self._cache()
+        first = cache.history('AAPL', START, END)
+        second = cache.history('aapl', START, END)
+        self.assertTrue(first.equals(second))
+        self.assertEqual(self.upstream.calls, [('history', 'AAPL')])
+        stats = cache.stats()
+        self.assertEqual((stats['miss'], stats['hit'], stats['entries']), (1, 1, 1))
+
+    def test_separate_ttls(self):
+        cache = self._cache(info_ttl=1000, bars_ttl=10)
+        cache.info('AAPL')
+        cache.history('AAPL', START, END)
+        self.clock.now += 60
+        cache.info('AAPL')
+        cache.history('AAPL', START, END)
+        self.assertEqual(self.upstream.calls,
+                         [('info', 'AAPL'), ('history', 'AAPL'), ('history', 'AAPL')])
+        self.assertEqual(cache.stats()['stale'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = self._cache()
+        cache.history('AAA', START, END)
+        cache.max_bytes = cache.stats()['bytes'] * 2.5
+        self.clock.now += 1
+        cache.history('BBB', START, END)
+        self.clock.now += 1
+        cache.history('AAA', START, END)
+        self.clock.now += 1
+        cache.history('CCC', START, END)
+
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.stats()['evicted'], 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'objects'))), 2)
+        self.upstream.calls.clear()
+        cache.history('AAA', START, END)
+        cache.history('BBB', START, END)
+        self.assertEqual(self.upstream.calls, [('history', 'BBB')])
+
+    def test_offline_replays_recording(self):
+        self._cache().history('AAPL', START, END)
+        self.upstream.calls.clear()
+        offline = self._cache(offline=True)
+        self.clock.now += 365 * 24 * 3600
+
+        self.assertEqual(len(offline.history('AAPL', START, END)), 130)
+        window = offline.history('AAPL', datetime(2024, 3, 1), datetime(2024, 3, 31))
+        self.assertEqual(window.index.min(), datetime(2024, 3, 1))
+        self.assertEqual(window.index.max(), datetime(2024, 3, 29))
+        self.assertEqual((offline.stats()['hit'], offline.stats()['replay']), (1, 1))
+        with self.assertRaises(CacheMiss):
+            offline.info('MSFT')
+        self.assertEqual(self.upstream.calls, [])
+
+    def test_loader_runs_offline_from_cache(self):
+        warehouse = StockDataWarehouse(self.db_path)
+        try:
+            online = StockDataLoader(warehouse, source=self._cache())
+            self.assertTrue(online.add_stock_with_data('AAPL', days=30)[0])
+            self.upstream.calls.clear()
+
+            offline = StockDataLoader(warehouse, source=self._cache(offline=True))
+            self.assertTrue(offline.add_stock_with_data('AAPL', days=30)[0])
+            success, message = offline.add_stock_with_data('MSFT', days=30)
+            self.assertFalse(success)
+            self.assertIn('No cached info', message)
+            self.assertEqual(self.upstream.calls, [])
+        finally:
+            warehouse.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+from src.monitoring import MetricsRegistry
+from src.web import create_app
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = self.registry.histogram('query_seconds', 'Query time', buckets=(0.1, 1.0))
+        histogram.observe(0.05, method='a')
+        histogram.observe(0.5, method='a')
+        histogram.observe(5.0, method='a')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE query_seconds histogram', text)
+        self.assertIn('query_seconds_bucket{method="a",le="0.1"} 1', text)
+        self.assertIn('query_seconds_bucket{method="a",le="1.0"} 2', text)
+        self.assertIn('query_seconds_bucket{method="a",le="+Inf"} 3', text)
+        self.assertIn('query_seconds_count{method="a"} 3', text)
+
+    def test_timed_decorator_and_disabled_registry(self):
+        histogram = self.registry.histogram('call_seconds', 'Call time')
+
+        @self.registry.timed(histogram)
+        def work():
+            return 42
+
+        self.assertEqual(work(), 42)
+        self.assertEqual(histogram.count(method='work'), 1)
+
+        self.registry.enabled = False
+        work()
+        self.assertEqual(histogram.count(method='work'), 1)
+
+    def test_counter_escapes_labels(self):
+        counter = self.registry.counter('events_total', 'Events')
+        counter.inc(route='/a"b')
+        counter.inc(2, route='/a"b')
+        self.assertIn('events_total{route="/a\\"b"} 3', self.registry.render())
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_metrics.db'
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_metrics_include_routes_and_queries(self):
+        self.client.get('/stocks')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{method="GET",route="/stocks",status="200"}', text)
+        self.assertIn('warehouse_query_seconds_count{method="get_all_stocks"}', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import os
+from src.database import StockDataWarehouse
+from src.database.portfolio import update_nav
+from src.web import create_app
+
+DATE_KEYS = [20240102, 20240103, 20240104, 20240105, 20240108]
+CLOSES = {'AAA': [10.0, 11.0, 12.0, 13.0, 14.0], 'BBB': [20.0, 21.0, 22.0, None, 24.0]}
+
+class TestPortfolio(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_portfolio.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.stock_keys = {}
+        for symbol, closes in CLOSES.items():
+            self.stock_keys[symbol] = self.warehouse.add_stock(symbol, f'{symbol} Corp')
+            self._bars(symbol, zip(DATE_KEYS, closes))
+        self.portfolio = self.warehouse.add_portfolio('core')
+        self.warehouse.add_transaction(self.portfolio, 'AAA', '2024-01-02', 10, 10.0)
+        self.warehouse.add_transaction(self.portfolio, 'BBB', '2024-01-04', 5, 22.0)
+        self.warehouse.add_transaction(self.portfolio, 'AAA', '2024-01-05', -4, 13.0)
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def _bars(self, symbol, bars):
+        self.warehouse.insert_stock_prices([
+            (date_key, self.stock_keys[symbol], close, close, close, close, close, 100)
+            for date_key, close in bars if close is not None
+        ])
+
+    def _nav(self, portfolio=None):
+        return self.warehouse.conn.execute('''
+            SELECT date_key, market_value, net_invested, positions, priced
+            FROM fact_portfolio_nav WHERE portfolio_key = ? ORDER BY date_key
+        ''', (portfolio or self.portfolio,)).fetchall()
+
+    def _full_nav(self):
+        update_nav(self.warehouse, full=True)
+        return self._nav()
+
+    def test_daily_nav(self):
+        self.assertEqual(update_nav(self.warehouse), {self.portfolio: 5})
+        # BBB has no bar on 2024-01-05 and is valued at its previous close
+        self.assertEqual(self._nav(), [
+            (20240102, 100.0, 100.0, 1, 1),
+            (20240103, 110.0, 100.0, 1, 1),
+            (20240104, 230.0, 210.0, 2, 2),
+            (20240105, 188.0, 158.0, 2, 2),
+            (20240108, 204.0, 158.0, 2, 2),
+        ])
+
+    def test_new_bars_only_value_new_days(self):
+        update_nav(self.warehouse)
+        self._bars('AAA', [(20240109, 15.0)])
+        self._bars('BBB', [(20240109, 25.0)])
+        # The last stored day is revalued along with the new one
+        self.assertEqual(update_nav(self.warehouse, stock_keys=[self.stock_keys['AAA']]),
+                         {self.portfolio: 2})
+        self.assertEqual(self._nav()[-1], (20240109, 215.0, 158.0, 2, 2))
+        self.assertEqual(update_nav(self.warehouse, stock_keys=[999]), {})
+        incremental = self._nav()
+        self.assertEqual(self._full_nav(), incremental)
+
+    def test_backdated_trade_revalues_from_its_date(self):
+        update_nav(self.warehouse)
+        self.warehouse.add_transaction(self.portfolio, 'BBB', '2024-01-03', 1, 21.0)
+        self.assertEqual(update_nav(self.warehouse, [self.portfolio]), {self.portfolio: 4})
+        self.assertEqual(self._nav()[1], (20240103, 131.0, 121.0, 2, 2))
+        incremental = self._nav()
+        self.assertEqual(self._full_nav(), incremental)
+
+    def test_holding_loaded_later_is_revalued(self):
+        self.stock_keys['CCC'] = self.warehouse.add_stock('CCC', 'C Corp')
+        self.warehouse.add_transaction(self.portfolio, 'CCC', '2024-01-03', 2, 5.0)
+        update_nav(self.warehouse)
+        self.assertEqual(self._nav()[1][3:], (2, 1))
+
+        self._bars('CCC', zip(DATE_KEYS, [5.0] * 5))
+        update_nav(self.warehouse, stock_keys=[self.stock_keys['CCC']])
+        self.assertEqual(self._nav()[1], (20240103, 120.0, 110.0, 2, 2))
+        incremental = self._nav()
+        self.assertEqual(self._full_nav(), incremental)
+
+    def test_split_keeps_nav_and_positions(self):
+        update_nav(self.warehouse)
+        before = self._nav()
+        # AAA splits 2:1 on 2024-01-08: the raw close halves and the 6 shares become 12
+        self._bars('AAA', [(20240108, 7.0)])
+        self.warehouse.add_corporate_action(self.stock_keys['AAA'], 20240108, 'split', 2.0)
+        self.assertEqual(update_nav(self.warehouse, [self.portfolio]), {self.portfolio: 1})
+        self.assertEqual(self._nav(), before)
+        self.assertEqual(self._full_nav(), before)
+
+        self.warehouse.add_transaction(self.portfolio, 'AAA', '2024-01-08', 2, 7.0)
+        self._bars('AAA', [(20240109, 7.5)])
+        self._bars('BBB', [(20240109, 24.0)])
+        update_nav(self.warehouse)
+        self.assertEqual(self._nav()[-1], (20240109, 225.0, 172.0, 2, 2))
+        positions = self.warehouse.get_portfolio(self.portfolio)['positions']
+        self.assertEqual([(p['symbol'], p['quantity'], p['market_value']) for p in positions],
+                         [('BBB', 5.0, 120.0), ('AAA', 14.0, 105.0)])
+
+    def test_split_recorded_with_a_load_marks_nav_stale(self):
+        portfolio = self.warehouse.add_portfolio('split')
+        self.warehouse.add_transaction(portfolio, 'AAA', '2024-01-02', 10, 10.0)
+        # Raw bars after a 2:1 split on 2024-01-04 are valued before the split is known
+        self._bars('AAA', zip(DATE_KEYS[2:], [6.0, 6.5, 7.0]))
+        update_nav(self.warehouse, [portfolio])
+        self.assertEqual([day[1] for day in self._nav(portfolio)], [100.0, 110.0, 60.0, 65.0, 70.0])
+
+        # The split arrives with the next load and revalues the days from its ex-date
+        self.warehouse.insert_stock_prices(
+            [(20240109, self.stock_keys['AAA'], 7.5, 7.5, 7.5, 7.5, 7.5, 100)],
+            actions=[(self.stock_keys['AAA'], 20240104, 'split', 2.0)])
+        update_nav(self.warehouse, [portfolio])
+        self.assertEqual([day[1] for day in self._nav(portfolio)],
+                         [100.0, 110.0, 120.0, 130.0, 140.0, 150.0])
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            self.warehouse.add_transaction(self.portfolio, 'ZZZ', '2024-01-02', 1, 1.0)
+        with self.assertRaises(ValueError):
+            self.warehouse.add_transaction(999, 'AAA', '2024-01-02', 1, 1.0)
+        self.assertEqual(self.warehouse.add_portfolio('core'), self.portfolio)
+
+    def test_endpoints(self):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        client = create_app(config).test_client()
+        portfolio_id = client.post('/portfolio', json={'name': 'growth'}).get_json()['portfolio_id']
+        response = client.post(f'/portfolio/{portfolio_id}/transactions',
+                               json={'symbol': 'aaa', 'date': '2024-01-03', 'quantity': 3,
+                                     'price': 11.0})
+        self.assertTrue(response.get_json()['success'])
+        self.assertEqual(client.post(f'/portfolio/{portfolio_id}/transactions',
+                                     json={'symbol': 'AAA', 'date': 'soon'}).status_code, 400)
+
+        portfolio = client.get(f'/portfolio/{portfolio_id}').get_json()
+        self.assertEqual(portfolio['market_value'], 42.0)
+        self.assertEqual(portfolio['positions'], [{
+            'symbol': 'AAA', 'quantity': 3.0, 'net_invested': 33.0, 'close_price': 14.0,
+            'market_value': 42.0
+        }])
+        self.assertEqual([day['date'] for day in portfolio['nav']],
+                         ['2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08'])
+        self.assertEqual(client.get('/portfolio/999').status_code, 404)
+        for days in ('abc', '0'):
+            self.assertEqual(client.get(f'/portfolio/{portfolio_id}?days={days}').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+from src.database import StockDataWarehouse
+from src.web import create_app
+
+class TestSlowQueryLog(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_slow_queries.db'
+        self.warehouse = StockDataWarehouse(self.test_db, slow_query_ms=0)
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def test_records_sql_params_and_plan(self):
+        stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        self.warehouse.get_stock_analytics('AAPL')
+
+        entries = [e for e in self.warehouse.get_slow_queries() if 'LIMIT' in e['sql']]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['params'], (stock_key, 90))
+        self.assertIn('LIMIT 90', entries[0]['expanded_sql'])
+        self.assertTrue(entries[0]['plan'])
+
+    def test_threshold_filters_fast_queries(self):
+        warehouse = StockDataWarehouse('test_slow_threshold.db', slow_query_ms=10000)
+        try:
+            warehouse.get_all_stocks()
+            self.assertEqual(warehouse.get_slow_queries(), [])
+        finally:
+            warehouse.close()
+            os.remove('test_slow_threshold.db')
+
+class TestRequestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_profiling.db'
+
+    def tearDown(self):
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def _client(self, enabled):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+            'PROFILING_ENABLED': enabled,
+        })
+        return create_app(config).test_client()
+
+    def test_profile_summary_when_enabled(self):
+        response = self._client(True).get('/stocks?profile=1')
+        self.assertEqual(response.mimetype, 'text/plain')
+        self.assertIn('function calls', response.get_data(as_text=True))
+
+    def test_profile_ignored_when_disabled(self):
+        client = self._client(False)
+        response = client.get('/stocks', headers={'X-Profile': '1'})
+        self.assertEqual(response.get_json(), {'stocks': []})
+        self.assertEqual(client.get('/debug/slow_queries').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+from datetime import datetime
+from src.database import StockDataWarehouse
+from src.database.retention import archive_history
+
+TODAY = datetime(2024, 6, 30)
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_retention.db'
+        self.archive_dir = 'test_retention_archive'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.warehouse.populate_date_dimension(datetime(2021, 1, 1), TODAY)
+        self.date_keys = [row[0] for row in self.warehouse.conn.execute(
+            'SELECT date_key FROM dim_date WHERE day_of_week < 5 ORDER BY date_key')]
+        self.stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        self.warehouse.insert_stock_prices([
+            (date_key, self.stock_key, 1.0, 2.0, 0.5, 1.0 + i / 100, 1.0, 1000 + i)
+            for i, date_key in enumerate(self.date_keys)
+        ])
+        self.warehouse.add_corporate_action(self.stock_key, 20210301, 'split', 2.0)
+        self.before = {days: self.warehouse.get_stock_analytics('AAPL', days)
+                       for days in (5, 300, 2000)}
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _archive(self):
+        return archive_history(self.warehouse, self.archive_dir, 365, today=TODAY)
+
+    def test_moves_old_rows_into_year_files(self):
+        moved = self._archive()
+        self.assertEqual(sorted(moved), [2021, 2022, 2023])
+        self.assertEqual(sum(moved.values()) + self.warehouse.conn.execute(
+            'SELECT COUNT(*) FROM fact_stock_prices').fetchone()[0], len(self.date_keys))
+        self.assertEqual(self.warehouse.conn.execute(
+            'SELECT MIN(date_key) FROM fact_stock_prices').fetchone()[0], 20230703)
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, 'prices_2022.db')))
+
+        # Old calendar days go too, unless a fact still points at them
+        old_dates = [row[0] for row in self.warehouse.conn.execute(
+            'SELECT date_key FROM dim_date WHERE date_key < 20230630')]
+        self.assertEqual(old_dates, [20210301])
+        self.assertEqual(self._archive(), {})
+
+    def test_queries_read_archives_only_when_needed(self):
+        self._archive()
+        self.assertEqual(self.warehouse.get_stock_analytics('AAPL', 5), self.before[5])
+        self.assertEqual(self.warehouse.archives._attached, [])
+
+        for days in (300, 2000):
+            self.assertEqual(self.warehouse.get_stock_analytics('AAPL', days), self.before[days])
+        self.assertEqual(self.warehouse.get_stock_analytics_many(['AAPL'], 2000),
+                         {'AAPL': self.before[2000]})
+
+    def test_partitions_without_rows_are_ignored(self):
+        self._archive()
+        # As left behind by an earlier run that recorded a year without moving rows
+        with self.warehouse.conn:
+            self.warehouse.conn.execute('''
+                INSERT INTO archive_partitions (year, path, min_date_key, max_date_key, rows)
+                VALUES (2020, 'missing.db', NULL, NULL, 0)
+            ''')
+        self.warehouse.archives.invalidate()
+        self.assertEqual(self.warehouse.get_stock_analytics('AAPL', 2000), self.before[2000])
+        bars, _ = self.warehouse.get_price_history('AAPL', '2020-01-01', limit=3)
+        self.assertEqual(bars[0][0], '2021-01-01')
+
+    def test_other_connections_see_new_archives(self):
+        reader = StockDataWarehouse(self.test_db)
+        try:
+            self.assertEqual(reader.get_stock_analytics('AAPL', 300), self.before[300])
+            self._archive()
+            self.assertEqual(reader.get_stock_analytics('AAPL', 300), self.before[300])
+        finally:
+            reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
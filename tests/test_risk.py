@@ -0,0 +1,160 @@
+import unittest
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from unittest import mock
+import numpy as np
+import pandas as pd
+from src.database import StockDataWarehouse
+from src.database import risk
+from src.database.retention import archive_history
+from src.database.risk import RiskCache, compute_risk
+from src.web import create_app
+
+DATE_KEYS = [int((datetime(2024, 1, 1) + timedelta(days=day)).strftime('%Y%m%d')) for day in range(60)]
+Z = NormalDist().inv_cdf(0.05)
+
+class TestRisk(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_risk.db'
+        self.archive_dir = 'test_risk_archive'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        rng = random.Random(11)
+        self.prices = {}
+        rows = []
+        for symbol in ('SPY', 'AAA', 'BBB'):
+            stock_key = self.warehouse.add_stock(symbol, f'{symbol} Corp')
+            price, bars = 100.0, []
+            for day, date_key in enumerate(DATE_KEYS):
+                price *= 1 + rng.gauss(0, 0.02)
+                if symbol == 'BBB' and 5 <= day <= 8:
+                    continue
+                # AAA splits 2:1 halfway, recorded as a corporate action; the
+                # vendor's adjusted close is left stale and must not be used
+                adjusted = round(price / 2 if symbol == 'AAA' else price, 4)
+                close = adjusted * 2 if symbol == 'AAA' and day < 30 else adjusted
+                bars.append((date_key, adjusted))
+                rows.append((date_key, stock_key, close, close, close, close, close, 1000))
+            self.prices[symbol] = pd.Series([p for _, p in bars], index=[d for d, _ in bars])
+        self.warehouse.add_stock('CCC', 'C Corp')
+        rows.append((DATE_KEYS[-1], 4, 5.0, 5.0, 5.0, 5.0, 5.0, 10))
+        self.warehouse.insert_stock_prices(rows)
+        self.warehouse.add_corporate_action(2, DATE_KEYS[30], 'split', 2.0)
+
+    def tearDown(self):
+        self.warehouse.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _reference(self, symbol, days, window):
+        returns = self.prices[symbol].tail(days + 1).pct_change().dropna()
+        benchmark = self.prices['SPY'].tail(days + 1).pct_change().dropna()
+        quantile = np.percentile(returns, 5)
+        wealth = (1 + returns).cumprod()
+        pairs = pd.concat([returns, benchmark], axis=1, join='inner')
+        return {
+            'volatility': returns.std() * np.sqrt(252),
+            'rolling_volatility': returns.tail(window).std() * np.sqrt(252),
+            'max_drawdown': (1 - wealth / np.maximum.accumulate(np.maximum(wealth, 1))).max(),
+            'var_historical': -quantile,
+            'cvar_historical': -returns[returns <= quantile].mean(),
+            'var_parametric': -(returns.mean() + Z * returns.std()),
+            'cvar_parametric': -(returns.mean() - returns.std() * NormalDist().pdf(Z) / 0.05),
+            'beta': pairs.cov().iloc[0, 1] / pairs.iloc[:, 1].var(),
+            'observations': len(returns),
+        }
+
+    def test_metrics_match_per_symbol_reference(self):
+        results = compute_risk(self.warehouse, ['AAA', 'BBB', 'SPY'], 'SPY', days=40, window=10)
+        for symbol in ('AAA', 'BBB', 'SPY'):
+            for name, expected in self._reference(symbol, 40, 10).items():
+                self.assertAlmostEqual(results[symbol][name], expected, places=5,
+                                       msg=f'{symbol} {name}')
+            self.assertEqual(results[symbol]['as_of'], '2024-02-29')
+        self.assertAlmostEqual(results['SPY']['beta'], 1.0)
+        # The split does not show up as a drawdown
+        self.assertLess(results['AAA']['max_drawdown'], 0.4)
+
+        # BBB's return after its missing days spans the gap
+        gapped = compute_risk(self.warehouse, ['SPY', 'BBB'], 'SPY', days=55)['BBB']
+        reference = self._reference('BBB', 55, 21)
+        for name in ('volatility', 'max_drawdown', 'var_historical', 'beta', 'observations'):
+            self.assertAlmostEqual(gapped[name], reference[name], places=5, msg=name)
+
+        # Chunking only bounds memory; results are the same for any chunk size
+        for chunk_symbols in (1, 2):
+            self.assertEqual(compute_risk(self.warehouse, ['AAA', 'BBB', 'SPY'], 'SPY', days=40,
+                                          window=10, chunk_symbols=chunk_symbols), results)
+
+    def test_windows_continue_into_the_archives(self):
+        hot = compute_risk(self.warehouse, ['AAA', 'BBB', 'SPY'], 'SPY', days=55)
+        archive_history(self.warehouse, self.archive_dir, 20, today=datetime(2024, 2, 29))
+        self.assertLess(self.warehouse.conn.execute(
+            'SELECT COUNT(*) FROM fact_stock_prices WHERE stock_key = 2').fetchone()[0], 30)
+        self.assertEqual(compute_risk(self.warehouse, ['AAA', 'BBB', 'SPY'], 'SPY', days=55), hot)
+
+    def test_universe_and_missing_symbols(self):
+        results = compute_risk(self.warehouse, days=30, series=True)
+        # CCC has a single bar, so no returns
+        self.assertEqual(sorted(results), ['AAA', 'BBB', 'SPY'])
+        self.assertIsNone(results['AAA']['beta'])
+        # 30 returns give 10 full 21-day windows
+        surface = results['BBB']['rolling_volatility_series']
+        self.assertEqual(len(surface), 10)
+        self.assertEqual(surface[-1], {'date': '2024-02-29',
+                                       'value': results['BBB']['rolling_volatility']})
+        self.assertEqual(compute_risk(self.warehouse, ['ZZZ', 'CCC'], 'ZZZ'), {})
+
+    def test_stocks_without_a_symbol_are_left_out(self):
+        symbol = self.warehouse.dimensions.symbol
+        with mock.patch.object(self.warehouse.dimensions, 'symbol',
+                               lambda key: None if key == 3 else symbol(key)):
+            results = compute_risk(self.warehouse, days=30)
+        self.assertEqual(sorted(results), ['AAA', 'SPY'])
+
+    def test_cache_follows_ingest_version(self):
+        cache = RiskCache(max_entries=1)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        version = self.warehouse.get_ingest_version()
+        self.assertEqual([cache.get(version, 'a', compute) for _ in range(3)], [1, 1, 1])
+        self.assertEqual(cache.get(version, 'b', compute), 2)
+        self.assertEqual(cache.get(version, 'a', compute), 3)
+
+        self.warehouse.insert_stock_price(DATE_KEYS[-1], 4, 6.0, 6.0, 6.0, 6.0, 6.0, 10)
+        self.assertEqual(self.warehouse.get_ingest_version(), version + 1)
+        self.assertEqual(cache.get(version + 1, 'a', compute), 4)
+
+    def test_endpoint_recomputes_only_after_a_load(self):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+        })
+        client = create_app(config).test_client()
+        with mock.patch.object(risk, 'compute_risk', wraps=compute_risk) as spy:
+            for _ in range(2):
+                body = client.get('/risk?symbols=aaa,ZZZ&days=40&window=10').get_json()
+            self.assertEqual(spy.call_count, 1)
+            self.assertEqual(body['benchmark'], 'SPY')
+            self.assertEqual(body['missing'], ['ZZZ'])
+            self.assertAlmostEqual(body['risk']['AAA']['beta'],
+                                   self._reference('AAA', 40, 10)['beta'], places=5)
+
+            self.warehouse.insert_stock_prices([(DATE_KEYS[-1], 2, 1.0, 1.0, 1.0, 1.0, 1.0, 1)])
+            refreshed = client.get('/risk?symbols=aaa,ZZZ&days=40&window=10').get_json()
+            self.assertEqual(spy.call_count, 2)
+            self.assertEqual(refreshed['ingest_version'], body['ingest_version'] + 1)
+            self.assertNotEqual(refreshed['risk']['AAA'], body['risk']['AAA'])
+
+        self.assertEqual(sorted(client.get('/risk').get_json()['risk']), ['AAA', 'BBB', 'SPY'])
+        for query in ('confidence=0.1', 'days=x', 'window=50&days=40', 'benchmark=ZZZ'):
+            self.assertEqual(client.get(f'/risk?{query}').status_code, 400, query)
+
+if __name__ == '__main__':
+    unittest.main()
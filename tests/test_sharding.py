@@ -0,0 +1,160 @@
+import unittest
+import glob
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from src.database import StockDataWarehouse
+from src.database.alerts import evaluate_alerts
+from src.database.maintenance import MaintenanceScheduler
+from src.database.retention import archive_history
+from src.database.risk import compute_risk
+from src.database.sharding import ShardedWarehouse, open_warehouse, shard_of
+from src.data.backfill import backfill
+from src.data.sources import SyntheticSource
+
+SYMBOLS = [f'S{i:02d}' for i in range(10)]
+DATE_KEYS = [int((datetime(2024, 1, 1) + timedelta(days=day)).strftime('%Y%m%d')) for day in range(90)]
+
+class TestShardedWarehouse(unittest.TestCase):
+    def setUp(self):
+        self.single_db = 'test_sharding_single.db'
+        self.sharded_db = 'test_sharding.db'
+        self.single = StockDataWarehouse(self.single_db)
+        self.sharded = ShardedWarehouse(self.sharded_db, 3)
+
+    def tearDown(self):
+        self.single.close()
+        self.sharded.close()
+        for path in glob.glob('test_sharding*.db*'):
+            os.remove(path)
+
+    def _load(self, *warehouses):
+        rng = random.Random(5)
+        rows = []
+        for i, symbol in enumerate(SYMBOLS):
+            for warehouse in warehouses:
+                warehouse.add_stock(symbol, f'{symbol} Corp')
+            for day in range(40):
+                close = round(rng.uniform(10, 20), 2)
+                rows.append((DATE_KEYS[day], i + 1, close, close + 1, close - 1, close, close,
+                             rng.randint(1, 1000)))
+        for warehouse in warehouses:
+            warehouse.insert_stock_prices(rows)
+
+    def test_facts_are_split_by_stock_key(self):
+        self._load(self.sharded)
+        for shard, conn in enumerate(self.sharded.shard_conns):
+            stock_keys = [row[0] for row in conn.execute(
+                'SELECT DISTINCT stock_key FROM fact_stock_prices ORDER BY stock_key')]
+            self.assertEqual(stock_keys, [k for k in range(1, 11) if shard_of(k, 3) == shard])
+        self.assertEqual(self.sharded.conn.execute(
+            'SELECT COUNT(*) FROM main.fact_stock_prices').fetchone()[0], 0)
+        self.assertEqual(self.sharded.conn.execute(
+            'SELECT COUNT(*) FROM fact_stock_prices').fetchone()[0], 400)
+
+    def test_queries_match_single_file(self):
+        self._load(self.single, self.sharded)
+        for symbol in ('S00', 'S04', 'NOPE'):
+            self.assertEqual(self.sharded.get_stock_analytics(symbol, 20),
+                             self.single.get_stock_analytics(symbol, 20))
+            self.assertEqual(self.sharded.get_stock_analytics(symbol, 20, since=20240130),
+                             self.single.get_stock_analytics(symbol, 20, since=20240130))
+            self.assertEqual(self.sharded.get_price_history(symbol, limit=15),
+                             self.single.get_price_history(symbol, limit=15))
+        self.assertEqual(self.sharded.get_stock_analytics_many(SYMBOLS + ['NOPE'], 25),
+                         self.single.get_stock_analytics_many(SYMBOLS + ['NOPE'], 25))
+        self.assertEqual(compute_risk(self.sharded, benchmark='S00', days=30, chunk_symbols=4),
+                         compute_risk(self.single, benchmark='S00', days=30, chunk_symbols=4))
+        self.assertEqual(self.sharded.get_ingest_version(), self.single.get_ingest_version())
+
+        # Readers on the catalog connection see every shard through the view
+        for warehouse in (self.single, self.sharded):
+            warehouse.add_alert_rule('S03', 'new_high', 5)
+            warehouse.insert_stock_prices([(20240301, 4, 99.0, 100.0, 98.0, 99.0, 99.0, 10)])
+        self.assertEqual(evaluate_alerts(self.sharded), evaluate_alerts(self.single))
+
+    def test_reopen_uses_recorded_shards(self):
+        self._load(self.sharded)
+        self.sharded.close()
+        with self.assertRaises(ValueError):
+            ShardedWarehouse(self.sharded_db, 4)
+        self.sharded = open_warehouse(self.sharded_db)
+        self.assertEqual(self.sharded.shards, 3)
+        self.assertEqual(self.sharded.get_stock_analytics('S09', 5)['chart_data'][-1]['date'],
+                         '2024-02-09')
+        # A single-file warehouse that already has facts is not silently sharded
+        self._load(self.single)
+        with self.assertRaises(ValueError):
+            ShardedWarehouse(self.single_db, 2)
+
+    def test_archives_are_refused(self):
+        self._load(self.sharded)
+        with self.assertRaises(ValueError):
+            archive_history(self.sharded, 'test_sharding_archive', 10, today=datetime(2024, 6, 30))
+        self.assertFalse(os.path.exists('test_sharding_archive'))
+        self.assertEqual(self.sharded.conn.execute(
+            'SELECT COUNT(*) FROM archive_partitions').fetchone()[0], 0)
+        self.assertEqual(len(self.sharded.get_stock_analytics('S01', 60)['chart_data']), 40)
+
+    def test_backfill_merges_into_shards(self):
+        symbols = [f'B{i:02d}' for i in range(6)]
+        for warehouse in (self.single, self.sharded):
+            backfill(warehouse, symbols, SyntheticSource(seed=2), days=30,
+                     end_date=datetime(2024, 6, 28), workers=1)
+        query = '''
+            SELECT s.symbol, f.date_key, f.close_price FROM fact_stock_prices f
+            JOIN dim_stock s ON s.stock_key = f.stock_key ORDER BY 1, 2
+        '''
+        facts = self.single.conn.execute(query).fetchall()
+        self.assertTrue(facts)
+        self.assertEqual(self.sharded.conn.execute(query).fetchall(), facts)
+
+    def test_copy_prices_joins_the_callers_transaction(self):
+        self._load(self.sharded)
+        version = self.sharded.get_ingest_version()
+        with self.assertRaises(RuntimeError):
+            with self.sharded.conn:
+                self.sharded.conn.execute("INSERT INTO dim_stock (symbol) VALUES ('NEW')")
+                self.sharded.copy_prices('SELECT ?, 1, 1.0, 1.0, 1.0, 1.0, 1.0, 1', (DATE_KEYS[50],))
+                raise RuntimeError('merge failed after the prices')
+        # Nothing of the catalog side was committed partway
+        self.assertIsNone(self.sharded.get_stock_by_symbol('NEW'))
+        self.assertEqual(self.sharded.get_ingest_version(), version)
+
+    def test_maintenance_covers_every_shard(self):
+        self._load(self.sharded)
+        reports = MaintenanceScheduler(self.sharded).run_once()
+        self.assertEqual(list(reports), [self.sharded_db] + self.sharded.shard_paths)
+        for path in self.sharded.shard_paths:
+            self.assertIn('analyze', reports[path]['tasks'], path)
+
+    def test_writers_to_different_shards_run_concurrently(self):
+        self._load(self.sharded)
+        writers = [ShardedWarehouse(self.sharded_db) for _ in range(3)]
+        errors = []
+
+        def write(warehouse, shard):
+            try:
+                # Many small transactions, each on one shard only
+                stock_key = shard or 3
+                for day in range(45):
+                    warehouse.insert_stock_prices([(DATE_KEYS[day + 40], stock_key, 1.0, 1.0, 1.0,
+                                                    1.0, 1.0, 1)])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                warehouse.close()
+
+        threads = [threading.Thread(target=write, args=(warehouse, shard))
+                   for shard, warehouse in enumerate(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.sharded.conn.execute(
+            'SELECT COUNT(*) FROM fact_stock_prices WHERE date_key > 20240209').fetchone()[0], 135)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import threading
+import time
+from src.monitoring import REGISTRY
+from src.web.singleflight import CALLS, SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.enabled = True
+        self.flights = SingleFlight(self.id())
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _slow(self, result):
+        self.calls += 1
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _burst(self, key, result, n=8):
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(self.flights.do(key, lambda: self._slow(result)))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        # Every caller must be waiting on the leader before it finishes
+        deadline = time.monotonic() + 5
+        while CALLS.get(group=self.id(), role='shared') < n - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_one_call(self):
+        result = {'symbol': 'AAPL'}
+        outcomes = self._burst('AAPL', result)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(outcome is result for outcome in outcomes))
+        self.assertEqual(self.flights._calls, {})
+
+    def test_errors_reach_every_waiter(self):
+        error = ValueError('boom')
+        outcomes = self._burst('BAD', error, n=4)
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+
+    def test_finished_calls_are_not_cached(self):
+        self.release.set()
+        self.assertEqual(self.flights.do('A', lambda: self._slow(1)), 1)
+        self.assertEqual(self.flights.do('A', lambda: self._slow(2)), 2)
+        self.assertEqual(self.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import json
+import os
+import sqlite3
+from src.database import StockDataWarehouse
+from src.database.snapshot import SnapshotPublisher, SnapshotReader
+from src.web import create_app
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.test_db = 'test_snapshot.db'
+        self.snapshot = 'test_snapshot.snapshot.db'
+        self.warehouse = StockDataWarehouse(self.test_db)
+        self.stock_key = self.warehouse.add_stock('AAPL', 'Apple Inc.')
+        self.warehouse.insert_stock_prices([
+            (20240102, self.stock_key, 1.0, 1.0, 1.0, 1.0, 1.0, 100),
+        ])
+        self.publisher = SnapshotPublisher(self.warehouse, self.snapshot)
+        self.reader = SnapshotReader(self.snapshot, mmap_size=1 << 20)
+
+    def tearDown(self):
+        self.reader.close()
+        self.warehouse.close()
+        for path in (self.test_db, self.snapshot):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_readers_see_published_state_only(self):
+        self.publisher.publish()
+        snapshot = self.reader.acquire()
+        self.assertEqual(snapshot.get_stock_analytics('AAPL')['current_price'], 1.0)
+
+        self.warehouse.insert_stock_prices([
+            (20240103, self.stock_key, 2.0, 2.0, 2.0, 2.0, 2.0, 100),
+        ])
+        self.assertIs(self.reader.current(), snapshot)
+        self.assertEqual(snapshot.get_stock_analytics('AAPL')['current_price'], 1.0)
+
+        self.publisher.publish()
+        self.assertIsNot(self.reader.current(), snapshot)
+        self.assertEqual(self.reader.current().get_stock_analytics('AAPL')['current_price'], 2.0)
+        # The replaced snapshot stays readable for requests still using it
+        self.assertEqual(snapshot.get_stock_analytics('AAPL')['current_price'], 1.0)
+        self.assertEqual([name for name in os.listdir('.') if name.endswith('.tmp')], [])
+        # The last holder's release closes a replaced snapshot
+        self.reader.release(snapshot)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            snapshot.get_all_stocks()
+
+    def test_pinned_snapshot_outlives_several_publishes(self):
+        self.publisher.publish()
+        with self.reader.pinned() as snapshot:
+            pages = snapshot.iter_price_history('AAPL', page_size=1)
+            self.assertEqual(len(next(pages)), 1)
+            for day in (3, 4):
+                self.warehouse.insert_stock_prices([
+                    (20240100 + day, self.stock_key, 2.0, 2.0, 2.0, 2.0, 2.0, 100),
+                ])
+                self.publisher.publish()
+                self.reader.current()
+            # Still the pinned snapshot: its one bar is done, and it was not closed
+            self.assertEqual(list(pages), [])
+            self.assertEqual(snapshot.get_stock_analytics('AAPL')['current_price'], 1.0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            snapshot.get_all_stocks()
+        self.assertEqual(self.reader.current().get_stock_analytics('AAPL')['current_price'], 2.0)
+
+    def test_snapshot_is_read_only(self):
+        self.publisher.publish()
+        snapshot = self.reader.current()
+        self.assertTrue(snapshot.read_only)
+        with self.assertRaises(sqlite3.OperationalError):
+            snapshot.add_stock('MSFT', 'Microsoft')
+
+    def test_web_reads_come_from_the_snapshot(self):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+            'SNAPSHOT_PATH': self.snapshot,
+        })
+        client = create_app(config).test_client()
+        self.assertEqual(len(client.get('/stocks').get_json()['stocks']), 1)
+
+        self.warehouse.add_stock('MSFT', 'Microsoft')
+        self.assertEqual(len(client.get('/stocks').get_json()['stocks']), 1)
+        self.publisher.publish()
+        self.assertEqual(len(client.get('/stocks').get_json()['stocks']), 2)
+
+    def test_user_writes_are_read_live_without_publishing(self):
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+            'SNAPSHOT_PATH': self.snapshot,
+        })
+        client = create_app(config).test_client()
+        published = os.stat(self.snapshot).st_mtime_ns
+
+        portfolio_id = client.post('/portfolio', json={'name': 'core'}).get_json()['portfolio_id']
+        self.assertEqual(client.get(f'/portfolio/{portfolio_id}').status_code, 200)
+        client.post(f'/portfolio/{portfolio_id}/transactions',
+                    json={'symbol': 'AAPL', 'date': '2024-01-02', 'quantity': 2, 'price': 1.0})
+        self.assertEqual(client.get(f'/portfolio/{portfolio_id}').get_json()['market_value'], 2.0)
+        client.post('/alerts/rules', json={'symbol': 'AAPL', 'rule_type': 'new_high'})
+        self.assertEqual(len(client.get('/alerts/rules').get_json()['rules']), 1)
+        self.assertEqual(os.stat(self.snapshot).st_mtime_ns, published)
+
+    def test_streamed_history_spans_publishes(self):
+        self.warehouse.insert_stock_prices([
+            (20240103, self.stock_key, 2.0, 2.0, 2.0, 2.0, 2.0, 100),
+        ])
+        config = type('TestConfig', (), {
+            'TESTING': True, 'DATABASE_PATH': self.test_db, 'INGEST_JOURNAL_DIR': None,
+            'SNAPSHOT_PATH': self.snapshot,
+        })
+        client = create_app(config).test_client()
+        response = client.get('/history/AAPL?format=ndjson&limit=1', buffered=False)
+        chunks = iter(response.response)
+        first = next(chunks)
+        for _ in range(2):
+            self.warehouse.add_stock(f'NEW{_}', 'New')
+            self.publisher.publish()
+            self.assertEqual(client.get('/stocks').status_code, 200)
+        lines = (first + b''.join(chunks)).decode().splitlines()
+        response.close()
+        self.assertEqual([json.loads(line)['close'] for line in lines], [1.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+import numpy as np
+import pandas as pd
+from src.database import StockDataWarehouse
+from src.data.loader import reject_rows
+from src.data.validation import allows_zero_volume, validate_prices
+
+class TestPriceValidation(unittest.TestCase):
+    def _frame(self, closes, **overrides):
+        dates = pd.date_range('2024-01-01', periods=len(closes))
+        df = pd.DataFrame({
+            'Open': closes, 'High': [c + 1 for c in closes], 'Low': [c - 1 for c in closes],
+            'Close': closes, 'Adj_Close': closes, 'Volume': [1000] * len(closes),
+        }, index=dates)
+        for column, values in overrides.items():
+            df[column] = values
+        return df
+
+    def test_clean_frame_passes(self):
+        clean, rejects, metrics = validate_prices(self._frame([10.0, 10.5, 11.0]))
+        self.assertEqual(len(clean), 3)
+        self.assertTrue(rejects.empty)
+        self.assertEqual(metrics['rejected'], 0)
+
+    def test_reason_codes(self):
+        df = self._frame([10.0, np.nan, 10.2, 10.3, 10.4],
+                         Volume=[1000, 1000, 0, 1000, 1000],
+                         Low=[9.0, 9.0, 9.0, 12.0, 9.0])
+        clean, rejects, metrics = validate_prices(df)
+        self.assertEqual(list(rejects['reason']),
+                         ['missing_price', 'zero_volume', 'high_below_low'])
+        self.assertEqual(metrics['reasons']['zero_volume'], 1)
+        self.assertEqual(metrics['accepted'], 2)
+
+    def test_zero_volume_is_accepted_where_it_is_genuine(self):
+        self.assertEqual([allows_zero_volume(symbol) for symbol in
+                          ('EURUSD=X', '^GSPC', 'vfiax', 'AAPL', 'GOOGL')],
+                         [True, True, True, False, False])
+        df = self._frame([10.0, 10.1, 10.2], Volume=[0, 0, 1000])
+        clean, rejects, _ = validate_prices(df, allow_zero_volume=True)
+        self.assertEqual(len(clean), 3)
+        clean, rejects, _ = validate_prices(df, allow_zero_volume=[True, False, False])
+        self.assertEqual(list(rejects['reason']), ['zero_volume'])
+
+    def test_spike_and_duplicate_date(self):
+        df = self._frame([10.0, 10.1, 30.0, 10.2, 10.3])
+        clean, rejects, metrics = validate_prices(df)
+        self.assertEqual(list(rejects['reason']), ['outlier_spike'])
+
+        df = pd.concat([df.iloc[:2], df.iloc[[1]]])
+        clean, rejects, metrics = validate_prices(df)
+        self.assertEqual(list(rejects['reason']), ['duplicate_date'])
+        self.assertEqual(len(clean), 2)
+
+    def test_groups_do_not_share_neighbours_or_dates(self):
+        # Two symbols back to back: a 10 -> 100 jump between them is not a spike
+        df = pd.concat([self._frame([10.0, 10.1, 10.2]), self._frame([100.0, 101.0, 102.0])])
+        clean, rejects, _ = validate_prices(df, groups=['AAA'] * 3 + ['BBB'] * 3)
+        self.assertEqual(len(clean), 6)
+        clean, rejects, _ = validate_prices(df.iloc[[0, 1, 3]], groups=['AAA'] * 3)
+        self.assertEqual(list(rejects['reason']), ['duplicate_date'])
+
+    def test_level_shift_is_kept(self):
+        clean, rejects, metrics = validate_prices(self._frame([400.0, 404.0, 101.0, 100.0]))
+        self.assertTrue(rejects.empty)
+
+    def test_rejects_are_quarantined(self):
+        test_db = 'test_validation.db'
+        warehouse = StockDataWarehouse(test_db)
+        try:
+            stock_key = warehouse.add_stock('AAPL', 'Apple Inc.')
+            _, rejects, _ = validate_prices(self._frame([10.0, np.nan, 10.2]))
+            warehouse.insert_price_rejects(reject_rows(rejects, stock_key))
+
+            rows = warehouse.get_price_rejects(stock_key)
+            self.assertEqual(rows, [(20240102, None, None, None, None, None, 1000, 'missing_price')])
+        finally:
+            warehouse.close()
+            os.remove(test_db)
+
+if __name__ == '__main__':
+    unittest.main()